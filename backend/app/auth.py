@@ -1,26 +1,146 @@
+import asyncio
 import datetime
-from typing import Optional
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, Optional, TypeVar
 
-import bcrypt
-from jose import JWTError, jwt
+# bcrypt and jose (with cryptography) are imported on first use, not at
+# startup: most processes (API workers until the first sign-in, scripts,
+# tests) never hash a password, and jose's backends are the slowest part of
+# importing the app. See tests/test_startup.py.
+
+T = TypeVar("T")
 
 # ---------- Config (move to env vars in production) ----------
 SECRET_KEY = "CHANGE-ME-use-a-real-secret-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "10000"))
+# How long a worker trusts its copy of a user's token_version. A revocation is
+# immediate in the worker that handled it and reaches the others within this.
+TOKEN_VERSION_TTL_SECONDS = float(os.environ.get("TOKEN_VERSION_TTL_SECONDS", "30"))
+TOKEN_VERSION_CACHE_SIZE = int(os.environ.get("TOKEN_VERSION_CACHE_SIZE", "10000"))
+
 
 # ---------- Password hashing ----------
+# bcrypt is slow on purpose (~0.25 s of CPU at cost 12). Request handlers go
+# through `password_hasher`, a small process pool: a login spike uses at most
+# HASH_WORKERS cores and never ties up the event loop or the threadpool that
+# every other endpoint shares. Once HASH_QUEUE_LIMIT hashes are in flight, new
+# ones are refused with HashQueueFull (503 + Retry-After) instead of queueing
+# without bound. HASH_WORKERS=0 hashes in the default thread pool instead (for
+# scripts, which would otherwise need an `if __name__ == "__main__"` guard).
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))  # applies to new hashes
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+HASH_QUEUE_LIMIT = int(os.environ.get("HASH_QUEUE_LIMIT", str(max(1, HASH_WORKERS) * 8)))
+HASH_RETRY_AFTER_SECONDS = int(os.environ.get("HASH_RETRY_AFTER_SECONDS", "2"))
+
+
 def hash_password(plain: str) -> str:
-    return bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    import bcrypt
+
+    return bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("utf-8")
 
 
 def verify_password(plain: str, hashed: str) -> bool:
+    import bcrypt
+
     return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
 
 
+class HashQueueFull(Exception):
+    """Too many password hashes in flight; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int = HASH_RETRY_AFTER_SECONDS):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Runs hash_password / verify_password in a process pool, with at most
+    `queue_limit` calls in flight (running or waiting for a worker). Used from
+    the event loop only.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+
+    def start(self) -> None:
+        if self._pool is None and self.workers > 0:
+            # spawn: workers must not inherit the server's threads and sockets
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def hash(self, plain: str) -> str:
+        return await self._submit(hash_password, plain)
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self._submit(verify_password, plain, hashed)
+
+    async def _submit(self, fn: Callable[..., T], *args) -> T:
+        if self.in_flight >= self.queue_limit:
+            self.rejected += 1
+            raise HashQueueFull()
+        self.start()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        started = time.monotonic()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool on the next call
+            self.failed += 1
+            self._pool = None
+            raise
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        self.total_seconds += time.monotonic() - started
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.workers) if self.workers else 0,
+            "max_in_flight": self.max_in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "avg_seconds": self.total_seconds / self.completed if self.completed else 0.0,
+        }
+
+
+password_hasher = PasswordHasher()
+
+
 # ---------- JWT ----------
 def create_access_token(data: dict, expires_delta: Optional[datetime.timedelta] = None) -> str:
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.datetime.now(datetime.timezone.utc) + (
         expires_delta or datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -31,7 +151,129 @@ def create_access_token(data: dict, expires_delta: Optional[datetime.timedelta]
 
 def decode_access_token(token: str) -> Optional[dict]:
     """Returns payload dict or None if invalid/expired."""
+    from jose import JWTError, jwt
+
     try:
         return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         return None
+
+
+# ---------- Verified tokens ----------
+# Authenticated requests depend on a Principal built from the token's claims,
+# not on a User row. Verified tokens are cached by their hash, so a client
+# reusing its token skips the HMAC check; revocation is checked against
+# `token_versions`, which only goes to the database once per user per TTL.
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The caller, as proven by a valid access token."""
+
+    user_id: int
+    email: Optional[str]  # None in tokens issued before the claim was added
+    token_version: int
+
+
+def create_user_token(user_id: int, email: str, token_version: int) -> str:
+    return create_access_token(data={"sub": str(user_id), "email": email, "ver": token_version})
+
+
+class TokenCache:
+    """Thread-safe LRU of verified tokens, keyed by SHA-256; entries die with the token."""
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[bytes, tuple[float, Principal]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: bytes, expires_at: float, principal: Principal) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, principal)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class TokenVersions:
+    """
+    Thread-safe LRU of per-user current token_version, each copy trusted for
+    `ttl_seconds`. Versions only grow: a fresh copy is never lowered, so a
+    request that read the version before a revocation cannot undo it here.
+    """
+
+    def __init__(self, ttl_seconds: float = TOKEN_VERSION_TTL_SECONDS, max_entries: int = TOKEN_VERSION_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._versions: OrderedDict[int, tuple[float, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[int]:
+        with self._lock:
+            entry = self._versions.get(user_id)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._versions[user_id]
+                return None
+            self._versions.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id: int, version: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._versions.get(user_id)
+            if entry is not None and entry[0] > now:
+                version = max(version, entry[1])
+            self._versions[user_id] = (now + self.ttl_seconds, version)
+            self._versions.move_to_end(user_id)
+            while len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+
+
+token_cache = TokenCache()
+token_versions = TokenVersions()
+
+
+def principal_from_token(token: str) -> Optional[Principal]:
+    """The token's verified claims, or None if it is invalid or expired. Does not check revocation."""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    principal = token_cache.get(key)
+    if principal is not None:
+        return principal
+
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    try:
+        principal = Principal(
+            user_id=int(payload["sub"]),
+            email=payload.get("email"),
+            token_version=int(payload.get("ver", 0)),
+        )
+        expires_at = float(payload["exp"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    token_cache.set(key, expires_at, principal)
+    return principal
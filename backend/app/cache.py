@@ -0,0 +1,210 @@
+"""
+Per-user read cache for the schedule and stats endpoints.
+
+Entries are the serialized JSON response bodies, keyed on
+(user_id, endpoint, params), so a hit skips the database and the response
+serialization. Write endpoints do not touch the cache directly: they call
+`invalidate_on_commit`, and the invalidation is applied only once the session
+commits (a rolled back write leaves the cache alone).
+
+The default backend is an in-process LRU with a TTL and a byte budget. A
+multi-worker deployment can install a shared store with `set_backend`.
+"""
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# ---------- Config ----------
+CACHE_TTL_SECONDS = float(os.environ.get("CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+SCHEDULE = "schedule"
+SCHEDULE_RANGE = "schedule_range"
+STATS = "stats"
+
+
+def make_key(user_id: int, endpoint: str, **params) -> str:
+    args = "&".join(f"{k}={params[k]}" for k in sorted(params))
+    return f"{user_id}:{endpoint}:{args}"
+
+
+# ---------- Backends ----------
+
+
+class CacheBackend:
+    """Interface for cache stores. Keys always start with '<user_id>:<endpoint>:'."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, user_id: int, value: bytes) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def invalidate_user(self, user_id: int, endpoint: Optional[str] = None) -> None:
+        """Drop every entry of `user_id` (or only those of one endpoint)."""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Thread-safe LRU bounded by total payload bytes, with per-entry TTL."""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, ttl_seconds: float = CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, int, bytes]] = OrderedDict()
+        self._keys_by_user: dict[int, set[str]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _drop(self, key: str) -> None:
+        _, user_id, value = self._entries.pop(key)
+        self._bytes -= len(value)
+        user_keys = self._keys_by_user.get(user_id)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[user_id]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, _, value = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, user_id: int, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, user_id, value)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+                self.invalidations += 1
+
+    def invalidate_user(self, user_id: int, endpoint: Optional[str] = None) -> None:
+        prefix = f"{user_id}:{endpoint}:" if endpoint else f"{user_id}:"
+        with self._lock:
+            for key in [k for k in self._keys_by_user.get(user_id, ()) if k.startswith(prefix)]:
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+_backend: CacheBackend = MemoryCacheBackend()
+
+
+def set_backend(backend: CacheBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+def get_backend() -> CacheBackend:
+    return _backend
+
+
+# ---------- Response helpers ----------
+
+
+def cached_response(key: str) -> Optional[Response]:
+    body = _backend.get(key)
+    if body is None:
+        return None
+    return Response(content=body, media_type="application/json")
+
+
+def store_response(key: str, user_id: int, model: BaseModel) -> Response:
+    body = model.model_dump_json().encode("utf-8")
+    _backend.set(key, user_id, body)
+    return Response(content=body, media_type="application/json")
+
+
+# ---------- Write-through invalidation ----------
+# Pending invalidations live on the session and are applied after commit.
+
+_PENDING = "cache_invalidations"
+
+
+def invalidate_on_commit(
+    db: Session, user_id: int, endpoint: Optional[str] = None, key: Optional[str] = None
+) -> None:
+    """Schedule invalidation of one key, one endpoint, or all of a user's entries."""
+    db.info.setdefault(_PENDING, set()).add((user_id, endpoint, key))
+
+
+def invalidate_day_on_commit(db: Session, user_id: int, day: datetime.date) -> None:
+    """A dose log on `day` changed: that day's schedule, every range and every stats window."""
+    invalidate_on_commit(db, user_id, key=make_key(user_id, SCHEDULE, date=day))
+    invalidate_on_commit(db, user_id, endpoint=SCHEDULE_RANGE)
+    invalidate_on_commit(db, user_id, endpoint=STATS)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session: Session) -> None:
+    for user_id, endpoint, key in session.info.pop(_PENDING, ()):
+        if key is not None:
+            _backend.delete(key)
+        else:
+            _backend.invalidate_user(user_id, endpoint)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session: Session) -> None:
+    session.info.pop(_PENDING, None)
@@ -1,4 +1,5 @@
+from .database import Database, get_database, warm_pool
 from .session import get_db
-from .utils import create_tables, db_check
+from .utils import create_tables, db_check, dialect_insert
 
-__all__ = ["get_db", "create_tables", "db_check"]
\ No newline at end of file
+__all__ = ["Database", "get_database", "get_db", "create_tables", "db_check", "dialect_insert", "warm_pool"]
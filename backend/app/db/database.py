@@ -0,0 +1,140 @@
+"""
+Database handle for the async route handlers.
+
+Handlers are `async def` and hand their ORM work to a `Database`:
+
+    return await db.run(_create_item, payload)          # _create_item(session, payload)
+    return StreamingResponse(db.iterate(pagination.stream_ndjson, stmt))
+
+The services stay plain functions of a sync `Session`; the handle decides
+where they run:
+- DB_ASYNC off (default): a sync Session and the threadpool, one hop per
+  `run` call, the same as a `def` endpoint.
+- DB_ASYNC on: an AsyncSession on aiosqlite / asyncpg, and `run` goes through
+  `AsyncSession.run_sync`. Queries are awaited on the event loop instead of
+  holding a worker thread, so the number of in-flight requests is no longer
+  capped by the threadpool. Python work between queries runs on the loop too,
+  so anything CPU-bound (bcrypt) must be sent elsewhere explicitly.
+
+Startup tasks, migrations and scripts keep using the sync engine.
+"""
+import os
+from contextlib import AsyncExitStack, ExitStack
+from typing import AsyncIterator, Callable, Iterator, TypeVar
+
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db.session import (
+    DATABASE_URL,
+    DB_ASYNC,
+    DB_POOL_WARM,
+    SessionLocal,
+    engine,
+    engine_options,
+    set_sqlite_pragmas,
+)
+from app.metrics import instrument, profiled
+
+T = TypeVar("T")
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_url(url: str) -> str:
+    """Same database through its async driver: sqlite:///x.db -> sqlite+aiosqlite:///x.db"""
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+
+class Database:
+    """Runs sync ORM code against one request's session, in the threadpool."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Call fn(session, *args, **kwargs)."""
+        return await run_in_threadpool(profiled(fn), self.session, *args, **kwargs)
+
+    def iterate(self, fn: Callable[..., Iterator[T]], *args, **kwargs) -> AsyncIterator[T]:
+        """Iterate fn(session, *args, **kwargs) (e.g. a streaming response body)."""
+        return iterate_in_threadpool(fn(self.session, *args, **kwargs))
+
+    async def close(self) -> None:
+        if self.session.in_transaction():
+            await run_in_threadpool(self.session.close)
+        else:
+            self.session.close()  # nothing checked out: no I/O, skip the thread hop
+
+
+class AsyncDatabase(Database):
+    """Runs sync ORM code through an AsyncSession's run_sync: no worker thread per request."""
+
+    def __init__(self, session):  # AsyncSession
+        self.async_session = session
+        self.session = session.sync_session
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        return await self.async_session.run_sync(fn, *args, **kwargs)
+
+    async def iterate(self, fn: Callable[..., Iterator[T]], *args, **kwargs) -> AsyncIterator[T]:
+        # Each step runs in run_sync, so the generator may issue queries lazily
+        iterator = await self.async_session.run_sync(lambda session: iter(fn(session, *args, **kwargs)))
+        done = object()
+        while (item := await self.async_session.run_sync(lambda _: next(iterator, done))) is not done:
+            yield item
+
+    async def close(self) -> None:
+        await self.async_session.close()
+
+
+if DB_ASYNC:
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(async_url(DATABASE_URL), **engine_options(DATABASE_URL))
+    if async_engine.dialect.name == "sqlite":
+        event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+    instrument(async_engine.sync_engine)
+    if hasattr(os, "register_at_fork"):  # see app/db/session.py
+        os.register_at_fork(after_in_child=lambda: async_engine.sync_engine.dispose(close=False))
+
+    # Handlers serialize the returned ORM objects after run() returns, outside
+    # run_sync, so they must not be expired by the commit
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_database() -> AsyncIterator[Database]:
+    """
+    FastAPI dependency: the request's Database, closed after the response is
+    sent. Streaming bodies (db.iterate) read through it while they are sent,
+    so this needs FastAPI >= 0.118, which runs the teardown after the body.
+    """
+    db = AsyncDatabase(AsyncSessionLocal()) if DB_ASYNC else Database(SessionLocal())
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def warm_pool(connections: int = DB_POOL_WARM) -> None:
+    """
+    Open `connections` connections of the handlers' engine at once (connect,
+    PRAGMAs, one query each) and return them to the pool, so the first
+    requests do not pay for connecting.
+    """
+    if DB_ASYNC:
+        async with AsyncExitStack() as stack:
+            for _ in range(connections):
+                conn = await stack.enter_async_context(async_engine.connect())
+                await conn.execute(text("SELECT 1"))
+        return
+
+    def _warm() -> None:
+        with ExitStack() as stack:
+            for _ in range(connections):
+                stack.enter_context(engine.connect()).execute(text("SELECT 1"))
+
+    await run_in_threadpool(_warm)
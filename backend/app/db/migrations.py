@@ -0,0 +1,176 @@
+"""
+Versioned schema changes for databases created by an older version of the models.
+
+`create_all` creates missing tables with all their indexes but never changes a
+table that already exists. Anything else (new or dropped indexes, new columns)
+goes here as a numbered migration. Applied versions are recorded in
+schema_migrations so each one runs once per database.
+
+Migrations also run right after `create_all` has built a fresh database, so
+they must be no-ops when the schema is already current (IF EXISTS,
+checkfirst=True, ...).
+
+schema_fingerprint stores a hash of the models' DDL and the latest migration
+version once create_tables has brought the database up to date; while it
+matches, create_tables has nothing to do and skips create_all's reflection.
+"""
+import hashlib
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    delete,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Dialect, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.models import Base  # registers every model on the metadata
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+)
+
+schema_fingerprint = Table(
+    "schema_fingerprint",
+    _metadata,
+    Column("id", Integer, primary_key=True),  # a single row, id 1
+    Column("fingerprint", String(64), nullable=False),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def _create_model_indexes(conn: Connection) -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+def _hot_query_indexes(conn: Connection) -> None:
+    # Single-column indexes superseded by the composite ones declared on the models
+    for name in (
+        "ix_dose_logs_user_id",
+        "ix_dose_logs_item_id",
+        "ix_dose_logs_scheduled_date",
+        "ix_items_user_id",
+    ):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    _create_model_indexes(conn)
+
+
+def _user_token_version(conn: Connection) -> None:
+    if "token_version" not in {column["name"] for column in inspect(conn).get_columns("users")}:
+        conn.execute(text("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"))
+
+
+def _item_dose_times(conn: Connection) -> None:
+    if "dose_times" not in {column["name"] for column in inspect(conn).get_columns("items")}:
+        column_type = Base.metadata.tables["items"].c.dose_times.type.compile(conn.dialect)
+        conn.execute(text(f"ALTER TABLE items ADD COLUMN dose_times {column_type}"))
+
+
+def _dose_events_keep_item_history(conn: Connection) -> None:
+    # dose_events.item_id was a foreign key with ON DELETE CASCADE, which took
+    # an item's history with it; it is plain data now
+    to_items = [fk for fk in inspect(conn).get_foreign_keys("dose_events") if fk["referred_table"] == "items"]
+    if not to_items:
+        return
+    if conn.dialect.name != "sqlite":
+        for fk in to_items:
+            conn.execute(text(f"ALTER TABLE dose_events DROP CONSTRAINT {fk['name']}"))
+        return
+    # SQLite cannot drop a constraint: rebuild the table, keeping seq
+    table = Base.metadata.tables["dose_events"]
+    columns = ", ".join(column.name for column in table.columns)
+    conn.execute(text("ALTER TABLE dose_events RENAME TO dose_events_old"))
+    for index in table.indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    table.create(bind=conn)
+    conn.execute(text(f"INSERT INTO dose_events ({columns}) SELECT {columns} FROM dose_events_old"))
+    conn.execute(text("DROP TABLE dose_events_old"))
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "Composite indexes for the hot queries", _hot_query_indexes),
+    Migration(2, "users.token_version for access token revocation", _user_token_version),
+    Migration(3, "items.dose_times for dose reminders", _item_dose_times),
+    Migration(4, "dose_events keep the history of deleted items", _dose_events_keep_item_history),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(conn: Connection) -> int:
+    schema_migrations.create(bind=conn, checkfirst=True)
+    return conn.execute(select(func.coalesce(func.max(schema_migrations.c.version), 0))).scalar_one()
+
+
+def migrate(engine: Engine) -> list[int]:
+    """Apply pending migrations in order, each in its own transaction. Returns the versions applied."""
+    with engine.begin() as conn:
+        version = current_version(conn)
+
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        with engine.begin() as conn:
+            migration.apply(conn)
+            conn.execute(
+                insert(schema_migrations).values(
+                    version=migration.version, description=migration.description
+                )
+            )
+        applied.append(migration.version)
+    return applied
+
+
+# ---------- Schema fingerprint ----------
+
+
+def fingerprint(dialect: Dialect) -> str:
+    """Hash of every model table and index as `dialect` would create them, and SCHEMA_VERSION."""
+    ddl = [f"version {SCHEMA_VERSION}"]
+    for table in Base.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            ddl.append(str(CreateIndex(index).compile(dialect=dialect)))
+    return hashlib.sha256("\n".join(ddl).encode("utf-8")).hexdigest()
+
+
+def stored_fingerprint(engine: Engine) -> Optional[str]:
+    """The fingerprint the database was last set up with; None if never recorded."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(schema_fingerprint.c.fingerprint).where(schema_fingerprint.c.id == 1)).scalar()
+    except DBAPIError:  # no schema_fingerprint table: a new database, or one set up before it existed
+        return None
+
+
+def store_fingerprint(engine: Engine, value: str) -> None:
+    with engine.begin() as conn:
+        schema_fingerprint.create(bind=conn, checkfirst=True)
+        conn.execute(delete(schema_fingerprint))
+        conn.execute(insert(schema_fingerprint).values(id=1, fingerprint=value))
@@ -1,11 +1,50 @@
-from sqlalchemy import text
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from app.db.migrations import fingerprint, migrate, store_fingerprint, stored_fingerprint
 from app.db.session import engine
 from app.models.base import Base
 
+def _backfills():
+    from app.services import events, reminders, rollup, sync
+
+    # Tables derived from existing data: filled the first time they are created
+    return {
+        "daily_adherence": rollup.rebuild,
+        "sync_changes": sync.backfill,
+        "dose_reminders": reminders.plan_all,
+        "dose_events": events.backfill,
+    }
+
 def create_tables() -> None:
+    """
+    Bring the database up to the models: create_all, migrations, backfills.
+    One SELECT when the stored schema fingerprint already matches.
+    """
+    current = fingerprint(engine.dialect)
+    if stored_fingerprint(engine) == current:
+        return
+    existing = set(inspect(engine).get_table_names())
     Base.metadata.create_all(bind=engine)
+    # create_all leaves existing tables alone; bring them up to date
+    migrate(engine)
+    pending = [fill for name, fill in _backfills().items() if name not in existing]
+    if pending:
+        with Session(engine) as db:
+            for fill in pending:
+                fill(db)
+            db.commit()
+    store_fingerprint(engine, current)
+
+def dialect_insert(db: Session):
+    """The insert() construct of the session's backend (supports ON CONFLICT)."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
 
 def db_check() -> bool:
     with engine.connect() as conn:
         conn.execute(text("SELECT 1"))
-    return True
\ No newline at end of file
+    return True
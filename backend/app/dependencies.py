@@ -1,31 +1,56 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.auth import decode_access_token
-from app.db import get_db
+from app.auth import Principal, principal_from_token, token_versions
+from app.db import Database, get_database
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def get_current_user(
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _token_version(db: Session, user_id: int) -> int | None:
+    return db.execute(select(User.token_version).where(User.id == user_id)).scalar_one_or_none()
+
+
+async def get_principal(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
+) -> Principal:
+    """
+    Verified caller from the JWT, or 401. Touches the database only when this
+    worker has no fresh copy of the user's token_version (see app/auth.py).
+    """
+    principal = principal_from_token(token)
+    if principal is None:
+        raise _unauthorized("Invalid or expired token")
+
+    current = token_versions.get(principal.user_id)
+    if current is None:
+        current = await db.run(_token_version, principal.user_id)
+        if current is None:
+            raise _unauthorized("User not found")
+        token_versions.set(principal.user_id, current)
+    if principal.token_version != current:
+        raise _unauthorized("Token has been revoked")
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_principal),
+    db: Database = Depends(get_database),
 ) -> User:
-    """Decode JWT and return the User ORM object, or raise 401."""
-    payload = decode_access_token(token)
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    user_id: int | None = payload.get("sub")
-    if user_id is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-
-    user = db.get(User, int(user_id))
+    """The caller's User row, for endpoints that need more than the token claims."""
+    user = await db.run(Session.get, User, principal.user_id)
     if user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        raise _unauthorized("User not found")
     return user
@@ -1,18 +1,31 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from app.db import create_tables, db_check
-from app.routers import auth, dose_logs, items, users
+from app import cache
+from app.auth import HashQueueFull, password_hasher
+from app.db import create_tables, db_check, warm_pool
+from app.db.session import DB_SETUP_ON_STARTUP
+from app.metrics import MetricsMiddleware, metrics
+from app.routers import auth, dose_logs, items, sync, users
+from app.services.reminders import REMINDERS_ENABLED, reminder_scheduler
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    create_tables()
+    if DB_SETUP_ON_STARTUP:
+        create_tables()
+    await warm_pool()
+    password_hasher.start()
+    if REMINDERS_ENABLED:
+        reminder_scheduler.start()
     yield
-    # Shutdown (nothing needed for now)
+    # Shutdown
+    await reminder_scheduler.stop()
+    password_hasher.shutdown()
 
 
 app = FastAPI(
@@ -28,13 +41,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# Outermost: times the whole request, see /metrics
+app.add_middleware(MetricsMiddleware)
+
+# ---------- Errors ----------
+@app.exception_handler(HashQueueFull)
+async def hash_queue_full_handler(request: Request, exc: HashQueueFull):
+    # Auth is overloaded: shed it fast so the other endpoints keep serving
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many sign-in requests, try again shortly"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 
 # ---------- Routers ----------
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(items.router)
 app.include_router(dose_logs.router)
+app.include_router(sync.router)
 
 
 # ---------- Utility endpoints ----------
@@ -46,3 +74,24 @@ def health():
 @app.get("/db-check", tags=["system"])
 def db_check_route():
     return {"ok": db_check()}
+
+
+@app.get("/cache-stats", tags=["system"])
+def cache_stats():
+    return cache.get_backend().stats()
+
+
+@app.get("/hash-stats", tags=["system"])
+def hash_stats():
+    return password_hasher.stats()
+
+
+@app.get("/metrics", tags=["system"], response_class=PlainTextResponse)
+def metrics_route():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/reminder-stats", tags=["system"])
+def reminder_stats():
+    return reminder_scheduler.stats()
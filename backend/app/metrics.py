@@ -0,0 +1,268 @@
+"""
+Per-route request metrics and SQL instrumentation, exposed at /metrics in the
+Prometheus text format.
+
+`MetricsMiddleware` times every request to the end of its response body (so
+streamed exports count in full) and labels it with the route template
+(/logs/stats/{user_id}, not the raw path). `instrument(engine)` hooks the
+engine's cursor events: each statement is counted and timed against the
+request that issued it, including statements run in the threadpool or in
+run_sync, since both inherit the request's context. Statements outside a
+request (startup, the reminder task) are labelled route="background".
+
+Exported:
+- http_request_duration_seconds  histogram  {method, route}
+- http_requests_total            counter    {method, route, status}
+- db_statements_per_request      histogram  {method, route}
+- db_statements_total            counter    {method, route}
+- db_time_seconds_total          counter    {method, route}
+
+Slow request profiling: with PROFILE_SLOW_MS > 0, a PROFILE_SAMPLE_RATE
+fraction of requests runs under cProfile (one at a time: cProfile is per
+thread and does not nest), and the ones slower than the threshold are dumped
+to PROFILE_DIR as .prof files (`python -m pstats file.prof`, snakeviz, ...).
+Work the request hands to the threadpool is profiled in the worker thread and
+merged into the same dump; other requests interleaving on the event loop
+meanwhile show up in it too.
+"""
+import contextvars
+import cProfile
+import datetime
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+T = TypeVar("T")
+
+# ---------- Config ----------
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "0"))  # 0 = profiling off
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0.1"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+BACKGROUND = ("", "background")
+
+
+@dataclass
+class RequestStats:
+    """What one request did so far; shared with the threads it hands work to."""
+
+    statements: int = 0
+    db_seconds: float = 0.0
+    profiles: list = field(default_factory=list)  # cProfile.Profile from worker threads
+    profiling: bool = False
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+# ---------- Registry ----------
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.statements: dict[tuple[str, str], Histogram] = {}
+        self.requests: dict[tuple[str, str, str], int] = {}
+        self.db_statements: dict[tuple[str, str], int] = {}
+        self.db_seconds: dict[tuple[str, str], float] = {}
+
+    def record_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        key = (method, route)
+        with self._lock:
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.statements.setdefault(key, Histogram(STATEMENT_BUCKETS)).observe(stats.statements)
+            status_key = (method, route, str(status))
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            self._add_db(key, stats.statements, stats.db_seconds)
+
+    def record_background_statement(self, seconds: float) -> None:
+        with self._lock:
+            self._add_db(BACKGROUND, 1, seconds)
+
+    def _add_db(self, key: tuple[str, str], statements: int, seconds: float) -> None:
+        self.db_statements[key] = self.db_statements.get(key, 0) + statements
+        self.db_seconds[key] = self.db_seconds.get(key, 0.0) + seconds
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        with self._lock:
+            lines: list[str] = []
+            _histogram(lines, "http_request_duration_seconds", "Request latency to the last body byte", self.latency)
+            _counter(lines, "http_requests_total", "Requests by final status", self.requests, ("method", "route", "status"))
+            _histogram(lines, "db_statements_per_request", "SQL statements issued per request", self.statements)
+            _counter(lines, "db_statements_total", "SQL statements executed", self.db_statements, ("method", "route"))
+            _counter(lines, "db_time_seconds_total", "Time spent in SQL statements", self.db_seconds, ("method", "route"))
+            return "\n".join(lines) + "\n"
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values) if value)
+    return "{" + pairs + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram(lines: list[str], name: str, help_text: str, series: dict[tuple, Histogram]) -> None:
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, hist in sorted(series.items()):
+        for bound, count in zip(hist.buckets, hist.counts):
+            lines.append(f"{name}_bucket{_labels(('method', 'route', 'le'), (*key, f'{bound:g}'))} {count}")
+        lines.append(f"{name}_bucket{_labels(('method', 'route', 'le'), (*key, '+Inf'))} {hist.total}")
+        lines.append(f"{name}_sum{_labels(('method', 'route'), key)} {hist.sum:.6f}")
+        lines.append(f"{name}_count{_labels(('method', 'route'), key)} {hist.total}")
+
+
+def _counter(lines: list[str], name: str, help_text: str, series: dict[tuple, float], names: tuple) -> None:
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for key, value in sorted(series.items()):
+        formatted = f"{value:.6f}" if isinstance(value, float) else str(value)
+        lines.append(f"{name}{_labels(names, key)} {formatted}")
+
+
+metrics = Metrics()
+
+
+# ---------- SQL instrumentation ----------
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_started"].pop()
+    elapsed = time.perf_counter() - started
+    stats = _current.get()
+    if stats is None:
+        metrics.record_background_statement(elapsed)
+    else:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get("metrics_started"):
+        context.connection.info["metrics_started"].pop()
+
+
+def instrument(engine: Engine) -> None:
+    """Count and time the statements `engine` (a sync Engine) executes."""
+    if METRICS_ENABLED and not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+# ---------- Profiling ----------
+
+_profile_lock = threading.Lock()  # one profiled request at a time
+
+
+def profiled(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap `fn` for a worker thread: profiled too if the calling request is."""
+    stats = _current.get()
+    if stats is None or not stats.profiling:
+        return fn
+
+    def run(*args, **kwargs):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            stats.profiles.append(profile)
+
+    return run
+
+
+def _dump_profile(profile: cProfile.Profile, stats: RequestStats, method: str, route: str, seconds: float) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    merged = pstats.Stats(profile)
+    for worker_profile in stats.profiles:
+        merged.add(worker_profile)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    path = os.path.join(PROFILE_DIR, f"{stamp}-{method}-{slug}-{seconds * 1000:.0f}ms.prof")
+    merged.dump_stats(path)
+    return path
+
+
+# ---------- Middleware ----------
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed bodies are timed to the end."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        profile = None
+        if PROFILE_SLOW_MS > 0 and random.random() < PROFILE_SAMPLE_RATE and _profile_lock.acquire(blocking=False):
+            profile = cProfile.Profile()
+            stats.profiling = True
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - started
+            _current.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            if profile is not None:
+                profile.disable()
+                try:
+                    if seconds * 1000 >= PROFILE_SLOW_MS:
+                        _dump_profile(profile, stats, method, route_path, seconds)
+                finally:
+                    _profile_lock.release()
+            metrics.record_request(method, route_path, status, seconds, stats)
@@ -2,3 +2,9 @@ from app.models.base import Base  # noqa: F401
 from app.models.user import User  # noqa: F401
 from app.models.item import Item  # noqa: F401
 from app.models.dose_log import DoseLog  # noqa: F401
+from app.models.daily_adherence import DailyAdherence  # noqa: F401
+from app.models.streak_state import StreakState  # noqa: F401
+from app.models.sync_change import SyncChange  # noqa: F401
+from app.models.dose_reminder import DoseReminder  # noqa: F401
+from app.models.dose_event import DoseEvent  # noqa: F401
+from app.models.dose_snapshot import DoseSnapshot  # noqa: F401
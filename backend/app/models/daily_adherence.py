@@ -0,0 +1,33 @@
+import datetime
+
+from sqlalchemy import Date, ForeignKey, Index, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class DailyAdherence(Base):
+    """
+    Per item, per day rollup of dose_logs. Maintained by app.services.rollup
+    on every dose log / item write; rebuildable from dose_logs at any time.
+    """
+
+    __tablename__ = "daily_adherence"
+
+    __table_args__ = (
+        Index("ix_daily_adherence_user_date", "user_id", "date"),
+    )
+
+    item_id: Mapped[int] = mapped_column(
+        ForeignKey("items.id", ondelete="CASCADE"), primary_key=True
+    )
+    date: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+
+    taken: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    skipped: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # doses_per_day if the item is active and scheduled on `date`, else 0
+    expected: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -0,0 +1,47 @@
+import datetime
+
+from sqlalchemy import Date, DateTime, ForeignKey, Index, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class DoseEvent(Base):
+    """
+    Append-only history of every dose log change, the write model behind
+    dose_logs: each writer appends its events in the same transaction as the
+    dose_logs change, and app.services.events can rebuild dose_logs from
+    them (see there). Never updated or deleted, except with the user (ON
+    DELETE CASCADE). item_id is plain data, not a foreign key, so an item's
+    history outlives the item; replay leaves out logs of deleted items.
+    """
+
+    __tablename__ = "dose_events"
+
+    __table_args__ = (
+        # A user's history in order: audit listing and replay
+        Index("ix_dose_events_user_seq", "user_id", "seq"),
+        # One dose's history (audit listing by item)
+        Index("ix_dose_events_item_dose", "item_id", "scheduled_date", "dose_index"),
+        # AUTOINCREMENT: seq is the replay order and never goes backwards
+        {"sqlite_autoincrement": True},
+    )
+
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    item_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    # The dose_logs row the event applies to (not a foreign key: "undone" deletes it)
+    log_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    scheduled_date: Mapped[datetime.date] = mapped_column(Date, nullable=False)
+    dose_index: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)  # taken | skipped | undone | reason_changed
+    skip_reason: Mapped[str | None] = mapped_column(String(120), nullable=True)
+
+    # For the event that creates a log, the log's timestamp
+    recorded_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
@@ -1,6 +1,6 @@
 import datetime
 
-from sqlalchemy import Date, DateTime, ForeignKey, Integer, String, UniqueConstraint, func
+from sqlalchemy import Date, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
@@ -12,18 +12,23 @@ class DoseLog(Base):
     # Prevent duplicate logs for the same item/date/dose_index
     __table_args__ = (
         UniqueConstraint("item_id", "scheduled_date", "dose_index", name="uq_item_date_dose"),
+        # A user's logs by day, in (scheduled_date, timestamp, id) order: the
+        # schedule, history listing, keyset pagination and export. Its user_id
+        # prefix also serves ON DELETE CASCADE from users, and uq_item_date_dose
+        # serves the one from items.
+        Index("ix_dose_logs_user_date_ts_id", "user_id", "scheduled_date", "timestamp", "id"),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
     user_id: Mapped[int] = mapped_column(
-        ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
     item_id: Mapped[int] = mapped_column(
-        ForeignKey("items.id", ondelete="CASCADE"), index=True, nullable=False
+        ForeignKey("items.id", ondelete="CASCADE"), nullable=False
     )
 
-    scheduled_date: Mapped[datetime.date] = mapped_column(Date, index=True, nullable=False)
+    scheduled_date: Mapped[datetime.date] = mapped_column(Date, nullable=False)
     dose_index: Mapped[int] = mapped_column(Integer, nullable=False, default=1)  # 1..doses_per_day
 
     status: Mapped[str] = mapped_column(String(20), nullable=False)  # "taken" | "skipped"
@@ -33,5 +38,5 @@ class DoseLog(Base):
 
     skip_reason: Mapped[str | None] = mapped_column(String(120), nullable=True)
 
-    user: Mapped["User"] = relationship("User", back_populates="dose_logs")
-    item: Mapped["Item"] = relationship("Item", back_populates="dose_logs")
+    user: Mapped["User"] = relationship("User", back_populates="dose_logs", lazy="raise")
+    item: Mapped["Item"] = relationship("Item", back_populates="dose_logs", lazy="raise")
@@ -0,0 +1,38 @@
+import datetime
+
+from sqlalchemy import Date, DateTime, ForeignKey, Index, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class DoseReminder(Base):
+    """
+    One upcoming, not yet logged dose of an item with dose times. Maintained
+    by app.services.reminders: planned a rolling REMINDER_HORIZON_HOURS ahead,
+    deleted when the dose is logged, marked sent when delivered.
+    """
+
+    __tablename__ = "dose_reminders"
+
+    __table_args__ = (
+        # Pending reminders (sent_at IS NULL) in due order: "due in the next
+        # minute" is a range read. Sent ones are purged by sent_at range.
+        Index("ix_dose_reminders_sent_due", "sent_at", "due_at"),
+        Index("ix_dose_reminders_user", "user_id"),
+    )
+
+    # Same natural key as the dose log that settles it
+    item_id: Mapped[int] = mapped_column(
+        ForeignKey("items.id", ondelete="CASCADE"), primary_key=True
+    )
+    scheduled_date: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+    dose_index: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+
+    # Server-local wall clock, like date.today() elsewhere
+    due_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+    sent_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, nullable=True)
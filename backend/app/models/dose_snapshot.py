@@ -0,0 +1,26 @@
+import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer, LargeBinary, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class DoseSnapshot(Base):
+    """
+    A user's dose_logs as folded from dose_events up to `seq`, so a replay
+    of that user starts here instead of at the first event. Written by
+    app.services.events; safe to delete (replay then starts from scratch).
+    """
+
+    __tablename__ = "dose_snapshots"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    seq: Mapped[int] = mapped_column(Integer, nullable=False)  # last event folded in
+    logs: Mapped[int] = mapped_column(Integer, nullable=False)  # rows in `data`
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # zlib-compressed JSON rows
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
@@ -1,14 +1,16 @@
-from sqlalchemy import Boolean, ForeignKey, Integer, String
+from sqlalchemy import JSON, Boolean, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.models.base import Base
 
 class Item(Base):
     __tablename__ = "items"
 
+    # A user's (active) items; also serves ON DELETE CASCADE from users
+    __table_args__ = (Index("ix_items_user_active", "user_id", "active"),)
+
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.id", ondelete="CASCADE"),
-        index=True,
         nullable=False
     )
 
@@ -18,11 +20,16 @@ class Item(Base):
     schedule_days: Mapped[int] = mapped_column(Integer, nullable=False, default=127)
     notes: Mapped[str | None] = mapped_column(String(255), nullable=True)
     active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
+    # "HH:MM" per dose (dose_index 1 = first entry); None = no reminders
+    dose_times: Mapped[list[str] | None] = mapped_column(JSON(none_as_null=True), nullable=True)
 
-    user: Mapped["User"] = relationship("User", back_populates="items")
+    # lazy="raise" and passive_deletes: see User
+    user: Mapped["User"] = relationship("User", back_populates="items", lazy="raise")
 
     dose_logs: Mapped[list["DoseLog"]] = relationship(
         "DoseLog",
         back_populates="item",
-        cascade="all, delete-orphan"
-    )
\ No newline at end of file
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise",
+    )
@@ -0,0 +1,29 @@
+import datetime
+
+from sqlalchemy import Date, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class StreakState(Base):
+    """
+    Persisted perfect-day streak per user, evaluated up to last_evaluated_date.
+    Maintained by app.services.streaks; safe to delete (it is recomputed).
+    """
+
+    __tablename__ = "streak_states"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    current_streak: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    longest_streak: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Longest run that ended on or before last_break_date
+    longest_before_run: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # NULL = state is stale, recompute from the start of history
+    last_evaluated_date: Mapped[datetime.date | None] = mapped_column(Date, nullable=True)
+    # Most recent non-perfect scheduled day <= last_evaluated_date (NULL = none seen)
+    last_break_date: Mapped[datetime.date | None] = mapped_column(Date, nullable=True)
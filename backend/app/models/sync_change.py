@@ -0,0 +1,34 @@
+import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class SyncChange(Base):
+    """
+    Append-only change feed for offline sync. Every Item / DoseLog write adds
+    a row; `seq` is the cursor clients resume from.
+    """
+
+    __tablename__ = "sync_changes"
+
+    __table_args__ = (
+        Index("ix_sync_changes_user_seq", "user_id", "seq"),
+        # AUTOINCREMENT: never reuse a seq, even after the newest row is deleted
+        {"sqlite_autoincrement": True},
+    )
+
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    entity: Mapped[str] = mapped_column(String(20), nullable=False)  # "item" | "dose_log"
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    op: Mapped[str] = mapped_column(String(10), nullable=False)  # "upsert" | "delete"
+
+    changed_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
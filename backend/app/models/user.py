@@ -1,4 +1,4 @@
-from sqlalchemy import String
+from sqlalchemy import Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.models.base import Base
 
@@ -8,15 +8,24 @@ class User(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
+    # Stamped into access tokens as "ver"; bumping it revokes every token issued before
+    token_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
+    # Relationships never load implicitly (lazy="raise"): query what a handler
+    # needs, or ask for it with selectinload(). Deletes leave the children to
+    # ON DELETE CASCADE (passive_deletes) instead of loading them first.
     items: Mapped[list["Item"]] = relationship(
         "Item",
         back_populates="user",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise",
     )
 
     dose_logs: Mapped[list["DoseLog"]] = relationship(
         "DoseLog",
         back_populates="user",
-        cascade="all, delete-orphan"
-    )
\ No newline at end of file
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise",
+    )
@@ -0,0 +1,55 @@
+"""
+Fast JSON for the large list endpoints.
+
+A handler that returns models (or ORM objects) has FastAPI validate every one
+of them again against its response_model before dumping it, and for a page
+of thousands of dose logs that is most of the request's CPU time. The list
+endpoints instead select exactly the response schema's columns (`columns_for`)
+and hand the rows, as plain dicts, to `FastJSONResponse`, which encodes them
+with orjson in one call. Returning a Response skips FastAPI's validation; the
+rows come straight from typed, constrained columns, so there is nothing left
+to check. The route keeps its response_model for the OpenAPI schema.
+
+The output is byte for byte what the response_model would have produced:
+columns are selected in the schema's field order, and orjson writes dates,
+datetimes and None the way Pydantic does (OPT_UTC_Z for "Z" on UTC).
+"""
+from typing import Any, Iterable, Sequence
+
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import ColumnElement, Table
+from sqlalchemy.engine import Row
+from starlette.responses import JSONResponse
+
+_OPTIONS = orjson.OPT_UTC_Z
+
+
+def columns_for(schema: type[BaseModel], table: Table) -> list[ColumnElement]:
+    """`table`'s columns for the fields of `schema`, in field order."""
+    return [table.c[name] for name in schema.model_fields]
+
+
+def row_dicts(rows: Iterable[Row], schema: type[BaseModel]) -> list[dict]:
+    """
+    Rows of a select that starts with columns_for(schema) as dicts of those
+    fields (columns after them, like a sort key, are left out).
+    """
+    fields = tuple(schema.model_fields)
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=_OPTIONS)
+
+
+def dumps_lines(rows: Sequence[dict]) -> bytes:
+    """NDJSON: one object per line."""
+    return b"".join(orjson.dumps(row, option=_OPTIONS | orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson; for trusted rows from `row_dicts`."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
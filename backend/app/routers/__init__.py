@@ -1,4 +1,5 @@
 from . import users
 from . import items
 from . import dose_logs
-from . import auth
\ No newline at end of file
+from . import auth
+from . import sync
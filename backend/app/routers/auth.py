@@ -1,41 +1,92 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import Row, exists, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.auth import create_access_token, hash_password, verify_password
-from app.db import get_db
+from app.auth import Principal, create_user_token, password_hasher, token_versions
+from app.db import Database, get_database
+from app.dependencies import get_principal
 from app.models.user import User
 from app.schemas.auth import LoginRequest, TokenResponse
 from app.schemas.user import UserCreate, UserOut
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+# bcrypt runs in the hashing process pool (app/auth.py), never inside db.run:
+# when DB_ASYNC is on, db.run is on the event loop. The lookups before it end
+# their transaction, so no pooled connection is held while a hash is queued
+# (up to HASH_QUEUE_LIMIT of them, more than the pool has connections).
+
+
+def _email_taken(db: Session, email: str) -> bool:
+    taken = db.scalar(select(exists().where(User.email == email)))
+    db.rollback()  # read only: returns the connection to the pool
+    return taken
+
+
+def _credentials(db: Session, email: str) -> Row | None:
+    """(id, email, password_hash, token_version) of the account, None if there is none."""
+    row = db.execute(
+        select(User.id, User.email, User.password_hash, User.token_version).where(User.email == email)
+    ).first()
+    db.rollback()  # read only: returns the connection to the pool
+    return row
+
+
+def _add_user(db: Session, email: str, password_hash: str) -> User | None:
+    """The new user, None if the email was registered while the password was hashed."""
+    user = User(email=email, password_hash=password_hash)
+    db.add(user)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    db.refresh(user)
+    return user
+
 
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register(payload: UserCreate, db: Session = Depends(get_db)):
+async def register(payload: UserCreate, db: Database = Depends(get_database)):
     """Create a new user account. Returns the user (without token)."""
-    existing = db.query(User).filter(User.email == payload.email).first()
-    if existing:
+    if await db.run(_email_taken, payload.email):
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
 
-    user = User(
-        email=payload.email,
-        password_hash=hash_password(payload.password),
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    password_hash = await password_hasher.hash(payload.password)
+    user = await db.run(_add_user, payload.email, password_hash)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
     return user
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
+async def login(payload: LoginRequest, db: Database = Depends(get_database)):
     """Authenticate with email + password, receive a JWT."""
-    user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+    user = await db.run(_credentials, payload.email)
+    if not user or not await password_hasher.verify(payload.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
         )
 
-    token = create_access_token(data={"sub": str(user.id)})
+    token = create_user_token(user.id, user.email, user.token_version)
     return TokenResponse(access_token=token)
+
+
+@router.post("/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_tokens(principal: Principal = Depends(get_principal), db: Database = Depends(get_database)):
+    """Sign out everywhere: every access token issued so far for this user stops working."""
+    version = await db.run(_bump_token_version, principal.user_id)
+    token_versions.set(principal.user_id, version)
+
+
+def _bump_token_version(db: Session, user_id: int) -> int:
+    # One statement: concurrent revocations each add one, none is lost
+    version = db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(token_version=User.token_version + 1)
+        .returning(User.token_version)
+    ).scalar_one()
+    db.commit()
+    return version
@@ -1,38 +1,44 @@
 import datetime
-from typing import Optional
+from typing import Iterator, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import and_, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, func, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.db import get_db
+from app import cache
+from app.db import Database, dialect_insert, get_database
+from app.models.dose_event import DoseEvent
 from app.models.dose_log import DoseLog
 from app.models.item import Item
 from app.models.user import User
+from app.responses import FastJSONResponse, columns_for, row_dicts
 from app.schemas.dose_log import (
     AdherenceStats,
+    CohortStatsRequest,
     DailySchedule,
+    DoseEventOut,
+    DoseLogBulkCreate,
+    DoseLogBulkResponse,
     DoseLogCreate,
     DoseLogOut,
-    ItemAdherence,
     ScheduleItem,
+    ScheduleRange,
+    ScheduleRangeColumnar,
+    ScheduleRangeItem,
 )
+from app.services import dose_writes, events, export, pagination, reminders, rollup, streaks, sync
+from app.services.adherence import compute_adherence_stats, iter_cohort_stats
+from app.services.schedule import is_scheduled, iter_scheduled_dates
 
 router = APIRouter(prefix="/logs", tags=["logs"])
 
-# ---------- Bitmask helpers ----------
-# Mon=1  Tue=2  Wed=4  Thu=8  Fri=16  Sat=32  Sun=64
-# Python weekday(): Mon=0 .. Sun=6
-WEEKDAY_BITS = {0: 1, 1: 2, 2: 4, 3: 8, 4: 16, 5: 32, 6: 64}
+# Handlers are async and hand the ORM work to the request's Database (see
+# app/db/database.py); the _functions below each handler take the sync Session.
 
 
-def _is_scheduled(schedule_days: int, target_date: datetime.date) -> bool:
-    bit = WEEKDAY_BITS[target_date.weekday()]
-    return bool(schedule_days & bit)
-
-
-def _verify_user(user_id: int, db: Session) -> None:
+def _verify_user(db: Session, user_id: int) -> None:
     if not db.get(User, user_id):
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -47,13 +53,17 @@ def _verify_user(user_id: int, db: Session) -> None:
     response_model=DoseLogOut,
     status_code=status.HTTP_201_CREATED,
 )
-def create_dose_log(
+async def create_dose_log(
     item_id: int,
     payload: DoseLogCreate,
     user_id: int = Query(..., description="Owner user_id (will come from JWT later)"),
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
 ):
     """Mark a dose as taken or skipped for a given item, date, and dose_index."""
+    return await db.run(_create_dose_log, item_id, payload, user_id)
+
+
+def _create_dose_log(db: Session, item_id: int, payload: DoseLogCreate, user_id: int) -> DoseLogOut:
     # Validate item exists and belongs to user
     item = db.get(Item, item_id)
     if not item:
@@ -72,94 +82,292 @@ def create_dose_log(
     if payload.status == "taken" and payload.skip_reason:
         raise HTTPException(status_code=422, detail="skip_reason is only valid when status is 'skipped'")
 
-    log = DoseLog(
-        user_id=user_id,
-        item_id=item_id,
-        scheduled_date=payload.scheduled_date,
-        dose_index=payload.dose_index,
-        status=payload.status,
-        skip_reason=payload.skip_reason,
-    )
-
-    try:
-        db.add(log)
-        db.commit()
-        db.refresh(log)
-    except IntegrityError:
-        db.rollback()
-        # Duplicate — return existing log
-        existing = (
-            db.query(DoseLog)
-            .filter(
-                DoseLog.item_id == item_id,
-                DoseLog.scheduled_date == payload.scheduled_date,
-                DoseLog.dose_index == payload.dose_index,
-            )
-            .first()
+    # One statement: a duplicate inserts nothing and returns no row, and the
+    # row returned carries the server-side timestamp, so no refresh follows
+    insert = dialect_insert(db)
+    row = db.execute(
+        insert(DoseLog)
+        .values(
+            user_id=user_id,
+            item_id=item_id,
+            scheduled_date=payload.scheduled_date,
+            dose_index=payload.dose_index,
+            status=payload.status,
+            skip_reason=payload.skip_reason,
+        )
+        .on_conflict_do_nothing(index_elements=["item_id", "scheduled_date", "dose_index"])
+        .returning(*columns_for(DoseLogOut, DoseLog.__table__))
+    ).first()
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Log already exists for this item/date/dose_index",
         )
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Log already exists for this item/date/dose_index",
+    log = DoseLogOut(**row._mapping)
+
+    events.append(
+        db,
+        [
+            events.event(
+                user_id, log.id, item_id, log.scheduled_date, log.dose_index, log.status, log.skip_reason,
+                created=True,
             )
-        raise  # unexpected integrity error
-
+        ],
+    )
+    rollup.add_counts(
+        db, item, log.scheduled_date, taken=int(log.status == "taken"), skipped=int(log.status == "skipped")
+    )
+    streaks.mark_changed(db, user_id, log.scheduled_date)
+    if item.dose_times:
+        reminders.discard(db, [(item_id, log.scheduled_date, log.dose_index)])
+    cache.invalidate_day_on_commit(db, user_id, log.scheduled_date)
+    sync.record(db, user_id, sync.DOSE_LOG, log.id, sync.UPSERT)
+    db.commit()
     return log
 
 
-@router.get("/by-user/{user_id}", response_model=list[DoseLogOut])
-def list_logs_for_user(
+@router.post("/bulk", response_model=DoseLogBulkResponse)
+async def create_dose_logs_bulk(
+    payload: DoseLogBulkCreate,
+    user_id: int = Query(..., description="Owner user_id (will come from JWT later)"),
+    db: Database = Depends(get_database),
+):
+    """
+    Mark many doses at once (e.g. "all morning meds taken", or an offline
+    backlog). One item lookup and one multi-row upsert; invalid entries are
+    reported per entry and do not fail the rest of the batch.
+    """
+    return await db.run(_create_dose_logs_bulk, payload, user_id)
+
+
+def _create_dose_logs_bulk(db: Session, payload: DoseLogBulkCreate, user_id: int) -> DoseLogBulkResponse:
+    results = dose_writes.upsert_dose_logs(db, user_id, payload.entries, payload.on_conflict)
+    db.commit()
+
+    counts = {s: 0 for s in ("created", "updated", "skipped", "error")}
+    for result in results:
+        counts[result.status] += 1
+    return DoseLogBulkResponse(
+        created=counts["created"],
+        updated=counts["updated"],
+        skipped=counts["skipped"],
+        errors=counts["error"],
+        results=results,
+    )
+
+
+@router.get("/by-user/{user_id}", response_model=list[DoseLogOut], response_class=FastJSONResponse)
+async def list_logs_for_user(
     user_id: int,
     start: Optional[datetime.date] = Query(None, description="Start date (inclusive)"),
     end: Optional[datetime.date] = Query(None, description="End date (inclusive)"),
     item_id: Optional[int] = Query(None, description="Filter by specific item"),
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        le=pagination.MAX_PAGE_SIZE,
+        description=f"Page size (default {pagination.DEFAULT_PAGE_SIZE} with a cursor); without either, every log",
+    ),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    fmt: Literal["json", "ndjson"] = Query(
+        "json", alias="format", description="ndjson streams every remaining row instead of one page"
+    ),
+    db: Database = Depends(get_database),
 ):
-    """Fetch all dose logs for a user, optionally filtered by date range and item."""
-    _verify_user(user_id, db)
+    """
+    Fetch a user's dose logs, newest first, optionally filtered by date range and item.
+    Without limit or cursor, every log in one response (as before paging). With
+    either, one page; when more rows follow, the X-Next-Cursor header holds the
+    cursor for the next request.
+    """
+    stmt = await db.run(_logs_query, user_id, start, end, item_id, cursor)
 
-    query = db.query(DoseLog).filter(DoseLog.user_id == user_id)
+    if fmt == "ndjson":
+        return StreamingResponse(db.iterate(pagination.stream_ndjson, stmt), media_type="application/x-ndjson")
 
-    if start:
-        query = query.filter(DoseLog.scheduled_date >= start)
-    if end:
-        query = query.filter(DoseLog.scheduled_date <= end)
+    if limit is None and cursor is not None:
+        limit = pagination.DEFAULT_PAGE_SIZE
+    logs, next_cursor = await db.run(_logs_page, stmt, limit)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor is not None else None
+    return FastJSONResponse(logs, headers=headers)
+
+
+def _logs_query(
+    db: Session,
+    user_id: int,
+    start: Optional[datetime.date],
+    end: Optional[datetime.date],
+    item_id: Optional[int],
+    cursor: Optional[str],
+) -> Select:
+    _verify_user(db, user_id)
+    try:
+        return pagination.logs_after(db, user_id, start, end, item_id, cursor)
+    except pagination.InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _logs_page(db: Session, stmt: Select, limit: Optional[int]) -> tuple[list[dict], Optional[str]]:
+    """One page of DoseLogOut-shaped dicts (see app/responses.py; every row if no limit) and the next cursor."""
+    if limit is None:
+        return row_dicts(db.execute(stmt).all(), DoseLogOut), None
+    rows = db.execute(stmt.limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = pagination.encode_cursor(db, rows[-1])
+    return row_dicts(rows, DoseLogOut), next_cursor
+
+
+@router.get("/events/{user_id}", response_model=list[DoseEventOut], response_class=FastJSONResponse)
+async def list_dose_events(
+    user_id: int,
+    after: int = Query(0, ge=0, description="X-Next-Cursor from the previous page (an event seq)"),
+    item_id: Optional[int] = Query(None, description="Filter by specific item"),
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE, description="Page size"),
+    db: Database = Depends(get_database),
+):
+    """
+    A user's dose history, oldest first: every taken / skipped / undone /
+    reason_changed event, including for logs that no longer exist.
+    """
+    rows, next_cursor = await db.run(_dose_events_page, user_id, after, item_id, limit)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor is not None else None
+    return FastJSONResponse(rows, headers=headers)
+
+
+def _dose_events_page(
+    db: Session, user_id: int, after: int, item_id: Optional[int], limit: int
+) -> tuple[list[dict], Optional[str]]:
+    _verify_user(db, user_id)
+    stmt = select(*columns_for(DoseEventOut, DoseEvent.__table__)).where(
+        DoseEvent.user_id == user_id, DoseEvent.seq > after
+    )
     if item_id:
-        query = query.filter(DoseLog.item_id == item_id)
+        stmt = stmt.where(DoseEvent.item_id == item_id)
+    rows = db.execute(stmt.order_by(DoseEvent.seq).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1].seq)
+    return row_dicts(rows, DoseEventOut), next_cursor
+
+
+@router.get("/export/{user_id}")
+async def export_history(
+    user_id: int,
+    request: Request,
+    kind: Literal["doses", "daily"] = Query(
+        "doses", description="doses: every log with its item name; daily: per item per day adherence"
+    ),
+    fmt: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    start: Optional[datetime.date] = Query(None, description="Start date (inclusive)"),
+    end: Optional[datetime.date] = Query(None, description="End date (inclusive)"),
+    db: Database = Depends(get_database),
+):
+    """
+    Stream a user's full history as a download. Rows are fetched in batches and
+    written as they arrive; the body is gzipped on the fly when the client
+    accepts gzip.
+    """
+    await db.run(_verify_user, user_id)
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="adherence-{user_id}-{kind}.{fmt}"',
+        "Vary": "Accept-Encoding",
+    }
+    compress = export.accepts_gzip(request.headers.get("accept-encoding", ""))
+    if compress:
+        headers["Content-Encoding"] = "gzip"
 
-    return query.order_by(DoseLog.scheduled_date.desc(), DoseLog.timestamp.desc()).all()
+    body = db.iterate(_export_body, user_id, kind, fmt, start, end, compress)
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+def _export_body(
+    db: Session,
+    user_id: int,
+    kind: str,
+    fmt: str,
+    start: Optional[datetime.date],
+    end: Optional[datetime.date],
+    compress: bool,
+) -> Iterator[bytes]:
+    if kind == "doses":
+        rows, columns = export.iter_dose_rows(db, user_id, start, end), export.DOSE_COLUMNS
+    else:
+        rows, columns = export.iter_daily_rows(db, user_id, start, end), export.DAILY_COLUMNS
+
+    body = export.to_csv(rows, columns) if fmt == "csv" else export.to_ndjson(rows, columns)
+    return export.gzipped(body) if compress else body
 
 
 @router.delete("/{log_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_dose_log(log_id: int, db: Session = Depends(get_db)):
+async def delete_dose_log(log_id: int, db: Database = Depends(get_database)):
     """Remove a log entry (undo a mark)."""
+    await db.run(_delete_dose_log, log_id)
+
+
+def _delete_dose_log(db: Session, log_id: int) -> None:
     log = db.get(DoseLog, log_id)
     if not log:
         raise HTTPException(status_code=404, detail="Log not found")
+    item = db.get(Item, log.item_id)
     db.delete(log)
+    events.append(
+        db, [events.event(log.user_id, log.id, log.item_id, log.scheduled_date, log.dose_index, events.UNDONE)]
+    )
+    rollup.add_counts(
+        db, item, log.scheduled_date, taken=-int(log.status == "taken"), skipped=-int(log.status == "skipped")
+    )
+    streaks.mark_changed(db, log.user_id, log.scheduled_date)
+    reminders.refresh_days(db, item, [log.scheduled_date])
+    cache.invalidate_day_on_commit(db, log.user_id, log.scheduled_date)
+    sync.record(db, log.user_id, sync.DOSE_LOG, log.id, sync.DELETE)
     db.commit()
-    return
 
 
 @router.patch("/{log_id}", response_model=DoseLogOut)
-def update_dose_log(
+async def update_dose_log(
     log_id: int,
     status_val: Optional[str] = Query(None, alias="status", pattern="^(taken|skipped)$"),
     skip_reason: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
 ):
     """Update a log's status (e.g. change from taken to skipped)."""
+    return await db.run(_update_dose_log, log_id, status_val, skip_reason)
+
+
+def _update_dose_log(
+    db: Session, log_id: int, status_val: Optional[str], skip_reason: Optional[str]
+) -> DoseLog:
     log = db.get(DoseLog, log_id)
     if not log:
         raise HTTPException(status_code=404, detail="Log not found")
 
+    old_status, old_reason = log.status, log.skip_reason
     if status_val is not None:
         log.status = status_val
     if skip_reason is not None:
         log.skip_reason = skip_reason if skip_reason else None
     if log.status == "taken":
         log.skip_reason = None  # clear skip_reason when marking taken
-
+    if (log.status, log.skip_reason) == (old_status, old_reason):
+        return log
+
+    if log.status != old_status:
+        kind = log.status
+        taken = int(log.status == "taken") - int(old_status == "taken")
+        rollup.add_counts(db, db.get(Item, log.item_id), log.scheduled_date, taken=taken, skipped=-taken)
+        streaks.mark_changed(db, log.user_id, log.scheduled_date)
+    else:
+        kind = events.REASON_CHANGED  # no derived data depends on the reason
+    events.append(
+        db, [events.event(log.user_id, log.id, log.item_id, log.scheduled_date, log.dose_index, kind, log.skip_reason)]
+    )
+    cache.invalidate_day_on_commit(db, log.user_id, log.scheduled_date)
+    sync.record(db, log.user_id, sync.DOSE_LOG, log.id, sync.UPSERT)
     db.commit()
     db.refresh(log)
     return log
@@ -171,19 +379,29 @@ def update_dose_log(
 
 
 @router.get("/schedule/{user_id}", response_model=DailySchedule)
-def get_daily_schedule(
+async def get_daily_schedule(
     user_id: int,
     date: Optional[datetime.date] = Query(None, description="Date (defaults to today)"),
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
 ):
     """
     Returns the list of active items scheduled for the given day,
     along with completion status from dose_logs.
     """
-    _verify_user(user_id, db)
-
     target_date = date or datetime.date.today()
 
+    key = cache.make_key(user_id, cache.SCHEDULE, date=target_date)
+    cached = cache.cached_response(key)
+    if cached is not None:
+        return cached
+
+    schedule = await db.run(_daily_schedule, user_id, target_date)
+    return cache.store_response(key, user_id, schedule)
+
+
+def _daily_schedule(db: Session, user_id: int, target_date: datetime.date) -> DailySchedule:
+    _verify_user(db, user_id)
+
     # Fetch all active items for this user
     items = (
         db.query(Item)
@@ -192,7 +410,7 @@ def get_daily_schedule(
     )
 
     # Filter to items scheduled for this day of the week
-    scheduled_items = [i for i in items if _is_scheduled(i.schedule_days, target_date)]
+    scheduled_items = [i for i in items if is_scheduled(i.schedule_days, target_date)]
 
     # Fetch logs for this date in one query
     logs = (
@@ -231,145 +449,150 @@ def get_daily_schedule(
     return DailySchedule(date=target_date, items=result_items)
 
 
-# ================================================================
-# Adherence stats endpoint
-# ================================================================
+MAX_SCHEDULE_RANGE_DAYS = 62  # a month view padded to whole weeks fits
 
 
-@router.get("/stats/{user_id}", response_model=AdherenceStats)
-def get_adherence_stats(
+@router.get("/schedule/{user_id}/range", response_model=ScheduleRange | ScheduleRangeColumnar)
+async def get_schedule_range(
     user_id: int,
-    days: int = Query(7, ge=1, le=365, description="Number of past days to compute stats over"),
-    db: Session = Depends(get_db),
+    start: datetime.date = Query(..., description="First day (inclusive)"),
+    end: datetime.date = Query(..., description="Last day (inclusive)"),
+    fmt: Literal["days", "columnar"] = Query(
+        "days", alias="format", description="columnar: one array of daily taken counts per item"
+    ),
+    db: Database = Depends(get_database),
 ):
     """
-    Compute adherence statistics for a user over the last N days.
-    Returns per-item breakdown, overall %, and streak info.
+    The daily schedule for every day in [start, end] (week and month views),
+    from one item query and one log query.
     """
-    _verify_user(user_id, db)
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days + 1 > MAX_SCHEDULE_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_SCHEDULE_RANGE_DAYS} days")
 
-    end_date = datetime.date.today()
-    start_date = end_date - datetime.timedelta(days=days - 1)
+    key = cache.make_key(user_id, cache.SCHEDULE_RANGE, start=start, end=end, format=fmt)
+    cached = cache.cached_response(key)
+    if cached is not None:
+        return cached
+
+    schedule = await db.run(_schedule_range, user_id, start, end, fmt == "columnar")
+    return cache.store_response(key, user_id, schedule)
+
+
+def _schedule_range(
+    db: Session, user_id: int, start: datetime.date, end: datetime.date, columnar: bool
+) -> ScheduleRange | ScheduleRangeColumnar:
+    _verify_user(db, user_id)
 
-    # Get all active items
     items = (
         db.query(Item)
         .filter(Item.user_id == user_id, Item.active == True)  # noqa: E712
         .all()
     )
 
-    # Get all logs in range
-    logs = (
-        db.query(DoseLog)
-        .filter(
-            DoseLog.user_id == user_id,
-            DoseLog.scheduled_date >= start_date,
-            DoseLog.scheduled_date <= end_date,
+    # Taken doses per (item, day), counted in SQL
+    taken = {
+        (item_id, day): count
+        for item_id, day, count in db.execute(
+            select(DoseLog.item_id, DoseLog.scheduled_date, func.count())
+            .where(
+                DoseLog.user_id == user_id,
+                DoseLog.scheduled_date >= start,
+                DoseLog.scheduled_date <= end,
+                DoseLog.status == "taken",
+            )
+            .group_by(DoseLog.item_id, DoseLog.scheduled_date)
         )
-        .all()
-    )
+    }
 
-    # Index logs: (item_id, date) -> list of logs
-    log_index: dict[tuple[int, datetime.date], list[DoseLog]] = {}
-    for log in logs:
-        key = (log.item_id, log.scheduled_date)
-        log_index.setdefault(key, []).append(log)
-
-    total_expected = 0
-    total_taken = 0
-    total_skipped = 0
-
-    item_stats: list[ItemAdherence] = []
+    n_days = (end - start).days + 1
+    if columnar:
+        rows = []
+        for item in items:
+            completed: list[Optional[int]] = [None] * n_days
+            for day in iter_scheduled_dates(item.schedule_days, start, end):
+                completed[(day - start).days] = taken.get((item.id, day), 0)
+            rows.append(
+                ScheduleRangeItem(
+                    id=item.id,
+                    name=item.name,
+                    type=item.type,
+                    doses_per_day=item.doses_per_day,
+                    notes=item.notes,
+                    completed_doses=completed,
+                )
+            )
+        return ScheduleRangeColumnar(start_date=start, end_date=end, items=rows)
 
+    days = [
+        DailySchedule(date=start + datetime.timedelta(days=i), items=[]) for i in range(n_days)
+    ]
     for item in items:
-        item_expected = 0
-        item_taken = 0
-        item_skipped = 0
-
-        current_date = start_date
-        while current_date <= end_date:
-            if _is_scheduled(item.schedule_days, current_date):
-                item_expected += item.doses_per_day
-                day_logs = log_index.get((item.id, current_date), [])
-                item_taken += sum(1 for l in day_logs if l.status == "taken")
-                item_skipped += sum(1 for l in day_logs if l.status == "skipped")
-            current_date += datetime.timedelta(days=1)
-
-        item_missed = max(0, item_expected - item_taken - item_skipped)
-        pct = (item_taken / item_expected * 100) if item_expected > 0 else 0.0
-
-        item_stats.append(
-            ItemAdherence(
-                item_id=item.id,
-                item_name=item.name,
-                expected=item_expected,
-                taken=item_taken,
-                skipped=item_skipped,
-                missed=item_missed,
-                adherence_pct=round(pct, 1),
+        for day in iter_scheduled_dates(item.schedule_days, start, end):
+            taken_count = taken.get((item.id, day), 0)
+            days[(day - start).days].items.append(
+                ScheduleItem(
+                    id=item.id,
+                    name=item.name,
+                    type=item.type,
+                    doses_per_day=item.doses_per_day,
+                    notes=item.notes,
+                    completed_doses=taken_count,
+                    expected_doses=item.doses_per_day,
+                    completed=taken_count >= item.doses_per_day,
+                )
             )
-        )
+    return ScheduleRange(start_date=start, end_date=end, days=days)
 
-        total_expected += item_expected
-        total_taken += item_taken
-        total_skipped += item_skipped
 
-    overall_pct = (total_taken / total_expected * 100) if total_expected > 0 else 0.0
+# ================================================================
+# Adherence stats endpoint
+# ================================================================
 
-    # Compute streaks (days where ALL scheduled doses were taken)
-    current_streak, longest_streak = _compute_streaks(items, log_index, end_date)
 
-    return AdherenceStats(
-        user_id=user_id,
-        start_date=start_date,
-        end_date=end_date,
-        overall_adherence_pct=round(overall_pct, 1),
-        items=item_stats,
-        current_streak=current_streak,
-        longest_streak=longest_streak,
-    )
+@router.get("/stats/{user_id}", response_model=AdherenceStats)
+async def get_adherence_stats(
+    user_id: int,
+    days: int = Query(7, ge=1, le=365, description="Number of past days to compute stats over"),
+    db: Database = Depends(get_database),
+):
+    """
+    Compute adherence statistics for a user over the last N days.
+    Returns per-item breakdown, overall %, and streak info.
+    """
+    key = cache.make_key(user_id, cache.STATS, end=datetime.date.today(), days=days)
+    cached = cache.cached_response(key)
+    if cached is not None:
+        return cached
 
+    stats = await db.run(_adherence_stats, user_id, days)
+    return cache.store_response(key, user_id, stats)
 
-def _compute_streaks(
-    items: list[Item],
-    log_index: dict[tuple[int, datetime.date], list[DoseLog]],
-    end_date: datetime.date,
-) -> tuple[int, int]:
+
+def _adherence_stats(db: Session, user_id: int, days: int) -> AdherenceStats:
+    _verify_user(db, user_id)
+    stats = compute_adherence_stats(db, user_id, days)
+    try:
+        db.commit()  # persist the advanced streak state
+    except IntegrityError:
+        # Another request (or worker) stored this user's first state meanwhile;
+        # it was computed from the same data, so the stats stand
+        db.rollback()
+    return stats
+
+
+@router.post("/stats/cohort")
+async def get_cohort_stats(payload: CohortStatsRequest, db: Database = Depends(get_database)):
     """
-    A 'perfect day' = every scheduled dose was taken (status='taken').
-    Walks backwards from end_date to compute current and longest streaks.
+    Adherence stats for many users in one call (all users if user_ids is
+    omitted): one AdherenceStats object per line, in user id order, streamed
+    as each chunk of users is computed. Unknown user ids are left out.
     """
-    current_streak = 0
-    longest_streak = 0
-    streak = 0
-    still_current = True
+    body = db.iterate(_cohort_stats_body, payload.user_ids, payload.days)
+    return StreamingResponse(body, media_type="application/x-ndjson")
 
-    # Walk back up to 365 days
-    for i in range(365):
-        day = end_date - datetime.timedelta(days=i)
-        day_perfect = True
-        day_has_items = False
 
-        for item in items:
-            if _is_scheduled(item.schedule_days, day):
-                day_has_items = True
-                day_logs = log_index.get((item.id, day), [])
-                taken_count = sum(1 for l in day_logs if l.status == "taken")
-                if taken_count < item.doses_per_day:
-                    day_perfect = False
-                    break
-
-        if not day_has_items:
-            # No items scheduled this day — doesn't break streak, but doesn't extend it
-            continue
-
-        if day_perfect:
-            streak += 1
-            if still_current:
-                current_streak = streak
-            longest_streak = max(longest_streak, streak)
-        else:
-            still_current = False
-            streak = 0
-
-    return current_streak, longest_streak
+def _cohort_stats_body(db: Session, user_ids: Optional[list[int]], days: int) -> Iterator[bytes]:
+    for chunk in iter_cohort_stats(db, user_ids, days):
+        yield b"".join(stats.model_dump_json().encode("utf-8") + b"\n" for stats in chunk)
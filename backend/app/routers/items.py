@@ -1,73 +1,117 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.db import get_db
+from app import cache
+from app.db import Database, get_database
 from app.models.item import Item
 from app.models.user import User
+from app.responses import FastJSONResponse, columns_for, row_dicts
 from app.schemas.item import ItemCreate, ItemUpdate, ItemOut
+from app.services import reminders, rollup, streaks, sync
 
 router = APIRouter(prefix="/items", tags=["items"])
 
 
 # ---- helpers ----
 
-def _get_item_or_404(item_id: int, db: Session) -> Item:
+def _get_item_or_404(db: Session, item_id: int) -> Item:
     item = db.get(Item, item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     return item
 
 
-def _verify_user_exists(user_id: int, db: Session) -> None:
+def _verify_user_exists(db: Session, user_id: int) -> None:
     if not db.get(User, user_id):
         raise HTTPException(status_code=404, detail="User not found")
 
 
+def _check_dose_times(item: Item) -> None:
+    if item.dose_times is not None and len(item.dose_times) != item.doses_per_day:
+        raise HTTPException(status_code=422, detail="dose_times must have one entry per dose (doses_per_day)")
+
+
 # ---- endpoints ----
+# Handlers are async and hand the ORM work to the request's Database (see app/db/database.py)
 
 @router.post("/", response_model=ItemOut, status_code=status.HTTP_201_CREATED)
-def create_item(payload: ItemCreate, db: Session = Depends(get_db)):
-    _verify_user_exists(payload.user_id, db)
+async def create_item(payload: ItemCreate, db: Database = Depends(get_database)):
+    return await db.run(_create_item, payload)
+
+
+def _create_item(db: Session, payload: ItemCreate) -> Item:
+    _verify_user_exists(db, payload.user_id)
     item = Item(**payload.model_dump())
+    _check_dose_times(item)
     db.add(item)
+    db.flush()
+    streaks.invalidate(db, item.user_id)
+    if item.dose_times:
+        reminders.plan_item(db, item)
+    sync.record(db, item.user_id, sync.ITEM, item.id, sync.UPSERT)
+    cache.invalidate_on_commit(db, item.user_id)
     db.commit()
     db.refresh(item)
     return item
 
 
 # IMPORTANT: /by-user/ declared ABOVE /{item_id} to avoid route shadowing
-@router.get("/by-user/{user_id}", response_model=list[ItemOut])
-def list_items_for_user(
+@router.get("/by-user/{user_id}", response_model=list[ItemOut], response_class=FastJSONResponse)
+async def list_items_for_user(
     user_id: int,
     active_only: bool = False,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
 ):
-    _verify_user_exists(user_id, db)
-    query = db.query(Item).filter(Item.user_id == user_id)
+    return FastJSONResponse(await db.run(_list_items_for_user, user_id, active_only))
+
+
+def _list_items_for_user(db: Session, user_id: int, active_only: bool) -> list[dict]:
+    """ItemOut-shaped dicts, straight from the columns (see app/responses.py)."""
+    _verify_user_exists(db, user_id)
+    stmt = select(*columns_for(ItemOut, Item.__table__)).where(Item.user_id == user_id)
     if active_only:
-        query = query.filter(Item.active == True)  # noqa: E712
-    return query.all()
+        stmt = stmt.where(Item.active == True)  # noqa: E712
+    return row_dicts(db.execute(stmt), ItemOut)
 
 
 @router.get("/{item_id}", response_model=ItemOut)
-def get_item(item_id: int, db: Session = Depends(get_db)):
-    return _get_item_or_404(item_id, db)
+async def get_item(item_id: int, db: Database = Depends(get_database)):
+    return await db.run(_get_item_or_404, item_id)
 
 
 @router.patch("/{item_id}", response_model=ItemOut)
-def update_item(item_id: int, payload: ItemUpdate, db: Session = Depends(get_db)):
-    item = _get_item_or_404(item_id, db)
+async def update_item(item_id: int, payload: ItemUpdate, db: Database = Depends(get_database)):
+    return await db.run(_update_item, item_id, payload)
+
+
+def _update_item(db: Session, item_id: int, payload: ItemUpdate) -> Item:
+    item = _get_item_or_404(db, item_id)
     data = payload.model_dump(exclude_unset=True)
     for k, v in data.items():
         setattr(item, k, v)
+    cache.invalidate_on_commit(db, item.user_id)
+    sync.record(db, item.user_id, sync.ITEM, item.id, sync.UPSERT)
+    _check_dose_times(item)
+    if data.keys() & {"doses_per_day", "schedule_days", "active"}:
+        rollup.refresh_expected(db, item)
+        streaks.invalidate(db, item.user_id)
+    if data.keys() & {"doses_per_day", "schedule_days", "active", "dose_times"}:
+        reminders.plan_item(db, item)
     db.commit()
     db.refresh(item)
     return item
 
 
 @router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_item(item_id: int, db: Session = Depends(get_db)):
-    item = _get_item_or_404(item_id, db)
+async def delete_item(item_id: int, db: Database = Depends(get_database)):
+    await db.run(_delete_item, item_id)
+
+
+def _delete_item(db: Session, item_id: int) -> None:
+    item = _get_item_or_404(db, item_id)
     db.delete(item)
+    streaks.invalidate(db, item.user_id)
+    sync.record(db, item.user_id, sync.ITEM, item.id, sync.DELETE)
+    cache.invalidate_on_commit(db, item.user_id)
     db.commit()
-    return
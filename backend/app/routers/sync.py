@@ -0,0 +1,89 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.db import Database, get_database
+from app.models.user import User
+from app.schemas.dose_log import DoseLogBulkEntry, DoseLogBulkResult
+from app.schemas.sync import SyncPage, SyncPush, SyncPushResponse
+from app.services import dose_writes, sync
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+def _verify_user(db: Session, user_id: int) -> None:
+    if not db.get(User, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+
+
+@router.get("", response_model=SyncPage)
+async def pull_changes(
+    user_id: int = Query(..., description="Owner user_id (will come from JWT later)"),
+    since: int = Query(0, ge=0, description="Cursor from the previous page (0 = from the beginning)"),
+    limit: int = Query(500, ge=1, le=5000, description="Max change-feed entries per page"),
+    db: Database = Depends(get_database),
+):
+    """
+    Rows changed after `since`, plus tombstones for deleted rows.
+    Keep calling with the returned cursor while has_more is true.
+    """
+    return await db.run(_pull_changes, user_id, since, limit)
+
+
+def _pull_changes(db: Session, user_id: int, since: int, limit: int) -> SyncPage:
+    _verify_user(db, user_id)
+    return sync.changes_since(db, user_id, since, limit)
+
+
+@router.post("/push", response_model=SyncPushResponse)
+async def push_changes(
+    payload: SyncPush,
+    user_id: int = Query(..., description="Owner user_id (will come from JWT later)"),
+    db: Database = Depends(get_database),
+):
+    """
+    Apply a batch of offline dose log changes. Ops address logs by
+    item/date/dose_index, upserts overwrite, and deleting a missing log is a
+    no-op, so replaying the same batch is safe. When a batch touches the same
+    log more than once, the last op wins.
+    """
+    return await db.run(_push_changes, payload, user_id)
+
+
+def _push_changes(db: Session, payload: SyncPush, user_id: int) -> SyncPushResponse:
+    _verify_user(db, user_id)
+    ops = payload.ops
+
+    last_op: dict[tuple, int] = {}
+    for index, op in enumerate(ops):
+        last_op[(op.item_id, op.scheduled_date, op.dose_index)] = index
+
+    results: list[DoseLogBulkResult] = []
+    for index, op in enumerate(ops):
+        winner = last_op[(op.item_id, op.scheduled_date, op.dose_index)]
+        results.append(
+            DoseLogBulkResult(index=index, status="skipped", detail=f"Superseded by op {winner}")
+        )
+
+    upserts = [index for index in last_op.values() if ops[index].op == "upsert"]
+    deletes = [index for index in last_op.values() if ops[index].op == "delete"]
+
+    if upserts:
+        entries = [
+            DoseLogBulkEntry(
+                item_id=ops[index].item_id,
+                scheduled_date=ops[index].scheduled_date,
+                dose_index=ops[index].dose_index,
+                status=ops[index].status,
+                skip_reason=ops[index].skip_reason,
+            )
+            for index in upserts
+        ]
+        for index, result in zip(upserts, dose_writes.upsert_dose_logs(db, user_id, entries, "overwrite")):
+            results[index] = result.model_copy(update={"index": index})
+    if deletes:
+        keys = [(ops[index].item_id, ops[index].scheduled_date, ops[index].dose_index) for index in deletes]
+        for index, result in zip(deletes, dose_writes.delete_dose_logs(db, user_id, keys)):
+            results[index] = result.model_copy(update={"index": index})
+
+    db.commit()
+    return SyncPushResponse(results=results)
@@ -1,41 +1,65 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import exists, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.auth import hash_password
-from app.db import get_db
-from app.dependencies import get_current_user
+from app.auth import Principal, password_hasher
+from app.db import Database, get_database
+from app.dependencies import get_principal
 from app.models.user import User
 from app.schemas.user import UserCreate, UserOut
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
+# As in app/routers/auth.py: no connection is held while the password is hashed
+
+
+def _email_taken(db: Session, email: str) -> bool:
+    taken = db.scalar(select(exists().where(User.email == email)))
+    db.rollback()  # read only: returns the connection to the pool
+    return taken
+
+
+def _add_user(db: Session, email: str, password_hash: str) -> User | None:
+    """The new user, None if the email was registered while the password was hashed."""
+    user = User(email=email, password_hash=password_hash)
+    db.add(user)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    db.refresh(user)
+    return user
+
+
 @router.post("/", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def create_user(payload: UserCreate, db: Session = Depends(get_db)):
+async def create_user(payload: UserCreate, db: Database = Depends(get_database)):
     """Create user (public endpoint — same as /auth/register)."""
-    existing = db.query(User).filter(User.email == payload.email).first()
-    if existing:
+    if await db.run(_email_taken, payload.email):
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already exists")
 
-    user = User(
-        email=payload.email,
-        password_hash=hash_password(payload.password),
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    password_hash = await password_hasher.hash(payload.password)
+    user = await db.run(_add_user, payload.email, password_hash)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already exists")
     return user
 
 
 @router.get("/me", response_model=UserOut)
-def get_current_user_profile(current_user: User = Depends(get_current_user)):
+async def get_current_user_profile(
+    principal: Principal = Depends(get_principal), db: Database = Depends(get_database)
+):
     """Return the currently authenticated user's profile."""
-    return current_user
+    if principal.email is not None:
+        return UserOut(id=principal.user_id, email=principal.email)
+    return await db.run(Session.get, User, principal.user_id)
 
 
 @router.get("/{user_id}", response_model=UserOut)
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.get(User, user_id)
+async def get_user(user_id: int, db: Database = Depends(get_database)):
+    user = await db.run(Session.get, User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -3,8 +3,18 @@ from .item import ItemCreate, ItemUpdate, ItemOut
 from .dose_log import (
     DoseLogCreate,
     DoseLogOut,
+    DoseLogBulkCreate,
+    DoseLogBulkEntry,
+    DoseLogBulkResponse,
+    DoseLogBulkResult,
+    DoseEventOut,
     DailySchedule,
     ScheduleItem,
+    ScheduleRange,
+    ScheduleRangeColumnar,
+    ScheduleRangeItem,
     AdherenceStats,
+    CohortStatsRequest,
     ItemAdherence,
-)
\ No newline at end of file
+)
+from .sync import SyncPage, SyncPush, SyncPushOp, SyncPushResponse
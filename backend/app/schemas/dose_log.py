@@ -13,6 +13,35 @@ class DoseLogCreate(BaseModel):
     skip_reason: Optional[str] = Field(default=None, max_length=120)
 
 
+class DoseLogBulkEntry(DoseLogCreate):
+    """One entry of POST /logs/bulk"""
+
+    item_id: int
+
+
+class DoseLogBulkCreate(BaseModel):
+    """Body for POST /logs/bulk"""
+
+    entries: list[DoseLogBulkEntry] = Field(min_length=1, max_length=1000)
+    # What to do when a log already exists for the item/date/dose_index
+    on_conflict: Literal["skip", "overwrite"] = "skip"
+
+
+class DoseLogBulkResult(BaseModel):
+    index: int  # position in the request's entries
+    status: Literal["created", "updated", "deleted", "skipped", "error"]
+    log_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class DoseLogBulkResponse(BaseModel):
+    created: int
+    updated: int
+    skipped: int
+    errors: int
+    results: list[DoseLogBulkResult]
+
+
 class DoseLogOut(BaseModel):
     id: int
     user_id: int
@@ -27,6 +56,20 @@ class DoseLogOut(BaseModel):
         from_attributes = True
 
 
+class DoseEventOut(BaseModel):
+    """One entry of a user's dose history (GET /logs/events/{user_id})"""
+
+    seq: int
+    user_id: int
+    log_id: int
+    item_id: int
+    scheduled_date: datetime.date
+    dose_index: int
+    kind: Literal["taken", "skipped", "undone", "reason_changed"]
+    skip_reason: Optional[str]
+    recorded_at: datetime.datetime
+
+
 # ---------- Schedule / "today" response ----------
 
 
@@ -48,6 +91,33 @@ class DailySchedule(BaseModel):
     items: list[ScheduleItem]
 
 
+class ScheduleRange(BaseModel):
+    """Week / month view: one DailySchedule per day in [start_date, end_date]."""
+
+    start_date: datetime.date
+    end_date: datetime.date
+    days: list[DailySchedule]
+
+
+class ScheduleRangeItem(BaseModel):
+    """One item across the range; completed_doses[i] is for start_date + i days."""
+
+    id: int
+    name: str
+    type: str
+    doses_per_day: int
+    notes: Optional[str]
+    completed_doses: list[Optional[int]]  # taken doses, None where not scheduled
+
+
+class ScheduleRangeColumnar(BaseModel):
+    """Same data as ScheduleRange, one row per item instead of per day."""
+
+    start_date: datetime.date
+    end_date: datetime.date
+    items: list[ScheduleRangeItem]
+
+
 # ---------- Adherence stats ----------
 
 
@@ -69,3 +139,11 @@ class AdherenceStats(BaseModel):
     items: list[ItemAdherence]
     current_streak: int
     longest_streak: int
+
+
+class CohortStatsRequest(BaseModel):
+    """Body for POST /logs/stats/cohort"""
+
+    # None = every user
+    user_ids: Optional[list[int]] = Field(default=None, max_length=10000)
+    days: int = Field(default=7, ge=1, le=365)
@@ -1,5 +1,8 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Literal
+from typing import Annotated, Optional, Literal
+
+# Local wall-clock time of one dose, 24h "HH:MM"
+DoseTime = Annotated[str, Field(pattern=r"^([01][0-9]|2[0-3]):[0-5][0-9]$")]
 
 
 class ItemBase(BaseModel):
@@ -10,6 +13,8 @@ class ItemBase(BaseModel):
     schedule_days: int = Field(ge=0, le=127, default=127)
     notes: Optional[str] = Field(default=None, max_length=255)
     active: bool = True
+    # One time per dose (enables reminders); must match doses_per_day
+    dose_times: Optional[list[DoseTime]] = Field(default=None, max_length=24)
 
 
 class ItemCreate(ItemBase):
@@ -24,6 +29,7 @@ class ItemUpdate(BaseModel):
     schedule_days: Optional[int] = Field(default=None, ge=0, le=127)
     notes: Optional[str] = Field(default=None, max_length=255)
     active: Optional[bool] = None
+    dose_times: Optional[list[DoseTime]] = Field(default=None, max_length=24)
 
 
 class ItemOut(ItemBase):
@@ -0,0 +1,39 @@
+import datetime
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from app.schemas.dose_log import DoseLogBulkResult, DoseLogOut
+from app.schemas.item import ItemOut
+
+
+class SyncPage(BaseModel):
+    """Response of GET /sync"""
+
+    cursor: int  # pass back as `since` for the next page
+    has_more: bool
+    items: list[ItemOut]
+    dose_logs: list[DoseLogOut]
+    deleted_items: list[int]
+    deleted_dose_logs: list[int]
+
+
+class SyncPushOp(BaseModel):
+    """One offline change, addressed by item/date/dose_index so replays are idempotent."""
+
+    op: Literal["upsert", "delete"]
+    item_id: int
+    scheduled_date: datetime.date
+    dose_index: int = Field(ge=1, default=1)
+    status: Literal["taken", "skipped"] = "taken"
+    skip_reason: Optional[str] = Field(default=None, max_length=120)
+
+
+class SyncPush(BaseModel):
+    """Body for POST /sync/push"""
+
+    ops: list[SyncPushOp] = Field(min_length=1, max_length=1000)
+
+
+class SyncPushResponse(BaseModel):
+    results: list[DoseLogBulkResult]
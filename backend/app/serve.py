@@ -0,0 +1,87 @@
+"""
+Production launcher: schema setup once, then one uvicorn worker per core.
+
+    python -m app.serve [--workers 4] [--host 0.0.0.0] [--port 8000]
+
+`uvicorn app.main:app --workers N` has every worker run create_tables in its
+startup, so N processes race over create_all, the migrations and the
+backfills. The launcher runs create_tables once, in this process, and starts
+the workers with DB_SETUP_ON_STARTUP=0.
+
+Workers share nothing. uvicorn spawns them (no fork), so each imports the app
+and builds its own engine and pool, and opens DB_POOL_WARM connections before
+it accepts requests. Forking servers (gunicorn --preload) are covered as well:
+the engines drop inherited connections in the child (see app/db/session.py).
+
+Per-process state, set here for every worker unless already in the
+environment:
+- WEB_CONCURRENCY: worker count (--workers), default one per core
+- HASH_WORKERS: the bcrypt pools split half the cores between the workers
+  instead of each taking half
+- CACHE_MAX_BYTES: 0 (response cache off) with more than one worker. The
+  default cache is in-process, so a write handled by one worker could not
+  invalidate another worker's copy; install a shared backend
+  (app.cache.set_backend) to cache across workers.
+
+/metrics, /cache-stats and /hash-stats report the worker that answers. With
+REMINDERS_ENABLED every worker polls; dispatch claims each reminder with an
+UPDATE, so none is sent twice.
+"""
+import argparse
+import os
+
+import uvicorn
+
+
+def _cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))  # the cores this process may use (containers, taskset)
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_workers() -> int:
+    return int(os.environ.get("WEB_CONCURRENCY", str(_cores())))
+
+
+def worker_environment(workers: int) -> dict[str, str]:
+    """Environment for the workers; the defaults only where not set already."""
+    defaults = {"HASH_WORKERS": str(max(1, _cores() // 2 // workers))}
+    if workers > 1:
+        defaults["CACHE_MAX_BYTES"] = "0"
+    env = {name: value for name, value in defaults.items() if name not in os.environ}
+    env["DB_SETUP_ON_STARTUP"] = "0"
+    return env
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API with schema setup once and N workers.")
+    parser.add_argument(
+        "--workers", type=int, default=default_workers(), help="default: WEB_CONCURRENCY or one per core"
+    )
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    # Before the app is imported: its config is read at import, here (a single
+    # worker runs in this process) and in the spawned workers, which inherit it
+    os.environ.update(worker_environment(args.workers))
+
+    from app.db import create_tables
+    from app.db.session import engine
+
+    create_tables()
+    engine.dispose()  # no connections held while the workers start
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
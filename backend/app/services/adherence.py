@@ -0,0 +1,396 @@
+"""
+Adherence statistics for a user over the last N days.
+
+`compute_adherence_stats` is what the API serves: it reads the per item, per
+day daily_adherence rollup (see app.services.rollup) and derives the expected
+dose counts from the schedule_days bitmask, so the cost no longer depends on
+how many doses were logged.
+
+`compute_adherence_stats_reference` is the original item x day walk over full
+DoseLog rows. It is kept as the readable definition of the numbers and is what
+the rollup path is checked against.
+
+`iter_cohort_stats` gives the rollup path's numbers for many users at once
+(care-team dashboards), chunked by user and vectorized with NumPy. NumPy is
+imported by the cohort functions themselves, so the API process loads it on
+the first cohort request rather than at startup.
+"""
+import datetime
+import os
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.daily_adherence import DailyAdherence
+from app.models.dose_log import DoseLog
+from app.models.item import Item
+from app.models.user import User
+from app.schemas.dose_log import AdherenceStats, ItemAdherence
+from app.services import streaks
+from app.services.schedule import WEEKDAY_BITS, count_scheduled_days, is_scheduled
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def _active_items(db: Session, user_id: int) -> list[Item]:
+    return (
+        db.query(Item)
+        .filter(Item.user_id == user_id, Item.active == True)  # noqa: E712
+        .all()
+    )
+
+
+def _build_stats(
+    user_id: int,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    item_stats: list[ItemAdherence],
+    current_streak: int,
+    longest_streak: int,
+) -> AdherenceStats:
+    total_expected = sum(s.expected for s in item_stats)
+    total_taken = sum(s.taken for s in item_stats)
+    overall_pct = (total_taken / total_expected * 100) if total_expected > 0 else 0.0
+
+    return AdherenceStats(
+        user_id=user_id,
+        start_date=start_date,
+        end_date=end_date,
+        overall_adherence_pct=round(overall_pct, 1),
+        items=item_stats,
+        current_streak=current_streak,
+        longest_streak=longest_streak,
+    )
+
+
+def _item_adherence(item: Item, expected: int, taken: int, skipped: int) -> ItemAdherence:
+    missed = max(0, expected - taken - skipped)
+    pct = (taken / expected * 100) if expected > 0 else 0.0
+    return ItemAdherence(
+        item_id=item.id,
+        item_name=item.name,
+        expected=expected,
+        taken=taken,
+        skipped=skipped,
+        missed=missed,
+        adherence_pct=round(pct, 1),
+    )
+
+
+# ================================================================
+# Rollup path
+# ================================================================
+
+
+def compute_adherence_stats(
+    db: Session,
+    user_id: int,
+    days: int,
+    end_date: datetime.date | None = None,
+) -> AdherenceStats:
+    """Adherence stats from the daily_adherence rollup (O(items x days) rows)."""
+    end_date = end_date or datetime.date.today()
+    start_date = end_date - datetime.timedelta(days=days - 1)
+
+    items = _active_items(db, user_id)
+
+    # Pre-aggregated rows: at most one per item per day. expected > 0 means the
+    # item is active and scheduled that day; logs on other days never count.
+    rows = db.execute(
+        select(DailyAdherence.item_id, DailyAdherence.taken, DailyAdherence.skipped)
+        .where(
+            DailyAdherence.user_id == user_id,
+            DailyAdherence.date >= start_date,
+            DailyAdherence.date <= end_date,
+            DailyAdherence.expected > 0,
+        )
+    ).all()
+
+    active_ids = {item.id for item in items}
+    taken_by_item: dict[int, int] = {}
+    skipped_by_item: dict[int, int] = {}
+    for item_id, taken, skipped in rows:
+        if item_id not in active_ids:
+            continue
+        taken_by_item[item_id] = taken_by_item.get(item_id, 0) + taken
+        skipped_by_item[item_id] = skipped_by_item.get(item_id, 0) + skipped
+
+    item_stats = [
+        _item_adherence(
+            item,
+            expected=count_scheduled_days(item.schedule_days, start_date, end_date) * item.doses_per_day,
+            taken=taken_by_item.get(item.id, 0),
+            skipped=skipped_by_item.get(item.id, 0),
+        )
+        for item in items
+    ]
+
+    # Streaks span the whole history, not just the requested window
+    current_streak, longest_streak = streaks.get_streaks(db, user_id, items, end_date)
+    return _build_stats(user_id, start_date, end_date, item_stats, current_streak, longest_streak)
+
+
+# ================================================================
+# Cohort path (many users per call)
+# ================================================================
+
+# Users per chunk: bounds the size of the users x days streak matrix
+COHORT_CHUNK_USERS = int(os.environ.get("COHORT_CHUNK_USERS", "500"))
+
+
+def iter_cohort_stats(
+    db: Session,
+    user_ids: Optional[list[int]],
+    days: int,
+    end_date: datetime.date | None = None,
+) -> Iterator[list[AdherenceStats]]:
+    """
+    compute_adherence_stats for many users (all of them if `user_ids` is None),
+    in user id order, one list per chunk. Unknown ids are skipped.
+
+    Works on COHORT_CHUNK_USERS users at a time with four queries per chunk
+    (users, active items, windowed taken/skipped per item, completed items per
+    day) instead of several per user. Expected doses are weekday counts times
+    schedule bits; streaks are evaluated over a users x days NumPy matrix.
+    Read-only: the persisted StreakState is neither used nor advanced.
+    """
+    import numpy as np
+
+    end_date = end_date or datetime.date.today()
+    start_date = end_date - datetime.timedelta(days=days - 1)
+
+    # Days of each weekday inside the window
+    window_weekdays = np.array(
+        [count_scheduled_days(WEEKDAY_BITS[w], start_date, end_date) for w in range(7)], dtype=np.int64
+    )
+
+    for chunk in _user_chunks(db, user_ids):
+        yield _cohort_chunk(db, chunk, start_date, end_date, window_weekdays)
+
+
+def _user_chunks(db: Session, user_ids: Optional[list[int]]) -> Iterator[list[int]]:
+    if user_ids is not None:
+        wanted = sorted(set(user_ids))
+        for i in range(0, len(wanted), COHORT_CHUNK_USERS):
+            chunk = db.scalars(
+                select(User.id).where(User.id.in_(wanted[i:i + COHORT_CHUNK_USERS])).order_by(User.id)
+            ).all()
+            if chunk:
+                yield list(chunk)
+        return
+
+    after = 0
+    while True:
+        chunk = db.scalars(
+            select(User.id).where(User.id > after).order_by(User.id).limit(COHORT_CHUNK_USERS)
+        ).all()
+        if not chunk:
+            return
+        yield list(chunk)
+        after = chunk[-1]
+
+
+def _cohort_chunk(
+    db: Session,
+    user_ids: list[int],
+    start_date: datetime.date,
+    end_date: datetime.date,
+    window_weekdays: "np.ndarray",
+) -> list[AdherenceStats]:
+    import numpy as np
+
+    row_of = {user_id: row for row, user_id in enumerate(user_ids)}
+
+    items = db.execute(
+        select(Item.id, Item.user_id, Item.name, Item.schedule_days, Item.doses_per_day)
+        .where(Item.user_id.in_(user_ids), Item.active == True)  # noqa: E712
+        .order_by(Item.user_id, Item.id)
+    ).all()
+
+    totals = {
+        item_id: (taken, skipped)
+        for item_id, taken, skipped in db.execute(
+            select(DailyAdherence.item_id, func.sum(DailyAdherence.taken), func.sum(DailyAdherence.skipped))
+            .where(
+                DailyAdherence.user_id.in_(user_ids),
+                DailyAdherence.date >= start_date,
+                DailyAdherence.date <= end_date,
+                DailyAdherence.expected > 0,
+            )
+            .group_by(DailyAdherence.item_id)
+        )
+    }
+
+    # items x 7 schedule bits (Mon..Sun)
+    masks = np.array([item.schedule_days for item in items], dtype=np.int64)
+    bits = (masks[:, None] >> np.arange(7)) & 1
+    doses = np.array([item.doses_per_day for item in items], dtype=np.int64)
+    expected = (bits @ window_weekdays) * doses
+
+    # users x 7: active items scheduled on each weekday
+    per_weekday = np.zeros((len(user_ids), 7), dtype=np.int64)
+    np.add.at(per_weekday, np.array([row_of[item.user_id] for item in items], dtype=np.intp), bits)
+    current, longest = _cohort_streaks(db, user_ids, per_weekday, end_date)
+
+    by_user: dict[int, list[ItemAdherence]] = {user_id: [] for user_id in user_ids}
+    for item, item_expected in zip(items, expected.tolist()):
+        taken, skipped = totals.get(item.id, (0, 0))
+        by_user[item.user_id].append(_item_adherence(item, item_expected, taken, skipped))
+
+    return [
+        _build_stats(user_id, start_date, end_date, by_user[user_id], int(current[row]), int(longest[row]))
+        for row, user_id in enumerate(user_ids)
+    ]
+
+
+def _cohort_streaks(
+    db: Session,
+    user_ids: list[int],
+    per_weekday: "np.ndarray",
+    end_date: datetime.date,
+) -> tuple["np.ndarray", "np.ndarray"]:
+    """
+    (current, longest) perfect-day streaks over each user's whole history, as
+    in streaks.get_streaks. A day is scheduled when some active item is, and
+    perfect when every item scheduled that day was fully taken.
+    """
+    import numpy as np
+
+    rows = db.execute(
+        select(DailyAdherence.user_id, DailyAdherence.date, func.count())
+        .where(
+            DailyAdherence.user_id.in_(user_ids),
+            DailyAdherence.date <= end_date,
+            DailyAdherence.expected > 0,
+            DailyAdherence.taken >= DailyAdherence.expected,
+        )
+        .group_by(DailyAdherence.user_id, DailyAdherence.date)
+    ).all()
+    zeros = np.zeros(len(user_ids), dtype=np.int64)
+    if not rows:
+        return zeros, zeros
+
+    # Nothing before the first fully taken item-day can be perfect
+    first_day = min(day for _, day, _ in rows)
+    n_days = (end_date - first_day).days + 1
+    row_of = {user_id: row for row, user_id in enumerate(user_ids)}
+
+    completed = np.zeros((len(user_ids), n_days), dtype=np.int32)
+    completed[
+        [row_of[user_id] for user_id, _, _ in rows],
+        [(day - first_day).days for _, day, _ in rows],
+    ] = [count for _, _, count in rows]
+
+    required = per_weekday[:, (first_day.weekday() + np.arange(n_days)) % 7]
+    scheduled = required > 0
+    perfect = scheduled & (completed >= required)
+    broken = scheduled & ~perfect
+
+    # Streak on each day = perfect days so far minus perfect days up to the
+    # last break; unscheduled days carry it over unchanged
+    runs = np.cumsum(perfect, axis=1)
+    streak = runs - np.maximum.accumulate(np.where(broken, runs, 0), axis=1)
+    return streak[:, -1], streak.max(axis=1)
+
+
+# ================================================================
+# Reference implementation (pure Python over full rows)
+# ================================================================
+
+
+def compute_adherence_stats_reference(
+    db: Session,
+    user_id: int,
+    days: int,
+    end_date: datetime.date | None = None,
+) -> AdherenceStats:
+    """
+    Original item x day walk. Slow; tests/test_adherence.py checks the rollup
+    and cohort paths against it.
+
+    Its streaks only see logs inside the window (and at most 365 days), so
+    they match the rollup path only while the user's history fits in `days`.
+    """
+    end_date = end_date or datetime.date.today()
+    start_date = end_date - datetime.timedelta(days=days - 1)
+
+    items = _active_items(db, user_id)
+
+    # Get all logs in range
+    logs = (
+        db.query(DoseLog)
+        .filter(
+            DoseLog.user_id == user_id,
+            DoseLog.scheduled_date >= start_date,
+            DoseLog.scheduled_date <= end_date,
+        )
+        .all()
+    )
+
+    # Index logs: (item_id, date) -> list of logs
+    log_index: dict[tuple[int, datetime.date], list[DoseLog]] = {}
+    for log in logs:
+        key = (log.item_id, log.scheduled_date)
+        log_index.setdefault(key, []).append(log)
+
+    item_stats: list[ItemAdherence] = []
+
+    for item in items:
+        item_expected = 0
+        item_taken = 0
+        item_skipped = 0
+
+        current_date = start_date
+        while current_date <= end_date:
+            if is_scheduled(item.schedule_days, current_date):
+                item_expected += item.doses_per_day
+                day_logs = log_index.get((item.id, current_date), [])
+                item_taken += sum(1 for l in day_logs if l.status == "taken")
+                item_skipped += sum(1 for l in day_logs if l.status == "skipped")
+            current_date += datetime.timedelta(days=1)
+
+        item_stats.append(_item_adherence(item, item_expected, item_taken, item_skipped))
+
+    current_streak, longest_streak = _compute_streaks_reference(items, log_index, end_date)
+    return _build_stats(user_id, start_date, end_date, item_stats, current_streak, longest_streak)
+
+
+def _compute_streaks_reference(
+    items: list[Item],
+    log_index: dict[tuple[int, datetime.date], list[DoseLog]],
+    end_date: datetime.date,
+) -> tuple[int, int]:
+    current_streak = 0
+    longest_streak = 0
+    streak = 0
+    still_current = True
+
+    for i in range(365):
+        day = end_date - datetime.timedelta(days=i)
+        day_perfect = True
+        day_has_items = False
+
+        for item in items:
+            if is_scheduled(item.schedule_days, day):
+                day_has_items = True
+                day_logs = log_index.get((item.id, day), [])
+                taken_count = sum(1 for l in day_logs if l.status == "taken")
+                if taken_count < item.doses_per_day:
+                    day_perfect = False
+                    break
+
+        if not day_has_items:
+            continue
+
+        if day_perfect:
+            streak += 1
+            if still_current:
+                current_streak = streak
+            longest_streak = max(longest_streak, streak)
+        else:
+            still_current = False
+            streak = 0
+
+    return current_streak, longest_streak
@@ -0,0 +1,266 @@
+"""
+Set-based dose log writes shared by POST /logs/bulk and POST /sync/push.
+
+Both functions validate against one item lookup, write with one statement,
+append their dose events, and keep the derived data (rollup, streak state,
+reminders, response cache, sync feed) in step. They do not commit.
+"""
+import datetime
+from typing import Optional, Sequence
+
+from sqlalchemy import Date, Integer, String, and_, column, delete, select, update, values
+from sqlalchemy.orm import Session, aliased
+
+from app import cache
+from app.db import dialect_insert
+from app.models.dose_log import DoseLog
+from app.models.item import Item
+from app.schemas.dose_log import DoseLogBulkEntry, DoseLogBulkResult
+from app.services import events, reminders, rollup, streaks, sync
+
+DoseKey = tuple[int, datetime.date, int]  # (item_id, scheduled_date, dose_index)
+
+
+def _load_items(db: Session, item_ids: set[int]) -> dict[int, Item]:
+    return {item.id: item for item in db.scalars(select(Item).where(Item.id.in_(item_ids)))}
+
+
+def _key_error(key: DoseKey, item: Optional[Item], user_id: int) -> Optional[str]:
+    if item is None:
+        return "Item not found"
+    if item.user_id != user_id:
+        return "Item does not belong to this user"
+    if key[2] > item.doses_per_day:
+        return f"dose_index {key[2]} exceeds item's doses_per_day ({item.doses_per_day})"
+    return None
+
+
+def _entry_error(entry: DoseLogBulkEntry, item: Optional[Item], user_id: int) -> Optional[str]:
+    """Same checks as create_dose_log, as a message instead of an HTTP error."""
+    error = _key_error((entry.item_id, entry.scheduled_date, entry.dose_index), item, user_id)
+    if error is None and entry.status == "taken" and entry.skip_reason:
+        error = "skip_reason is only valid when status is 'skipped'"
+    return error
+
+
+def _select_by_keys(log, keys: Sequence[DoseKey], *columns):
+    """
+    Select `columns` of the logs (`log`: DoseLog or an alias of it) matching
+    `keys`, as a join against a VALUES list: one uq_item_date_dose lookup per
+    key. SQLite plans a row-value IN over several keys as a full index scan.
+    """
+    key_rows = values(
+        column("item_id", Integer), column("scheduled_date", Date), column("dose_index", Integer), name="dose_keys"
+    ).data(list(keys)).cte()
+    return (
+        select(*columns)
+        .select_from(key_rows)
+        .join(
+            log,
+            and_(
+                log.item_id == key_rows.c.item_id,
+                log.scheduled_date == key_rows.c.scheduled_date,
+                log.dose_index == key_rows.c.dose_index,
+            ),
+        )
+    )
+
+
+def _overwrite(db: Session, rows: Sequence[tuple], changed) -> dict[DoseKey, int]:
+    """
+    Set status and skip_reason of the existing logs in `rows` ((*key, status,
+    skip_reason) each) where `changed(new)` holds; returns key -> log id of
+    the rows it updated. One UPDATE ... FROM a VALUES list.
+    """
+    if not rows:
+        return {}
+    new = values(
+        column("item_id", Integer),
+        column("scheduled_date", Date),
+        column("dose_index", Integer),
+        column("status", String),
+        column("skip_reason", String),
+        name="new_logs",
+    ).data(list(rows)).cte()
+    updated = db.execute(
+        update(DoseLog)
+        .where(
+            DoseLog.item_id == new.c.item_id,
+            DoseLog.scheduled_date == new.c.scheduled_date,
+            DoseLog.dose_index == new.c.dose_index,
+            changed(new),
+        )
+        .values(status=new.c.status, skip_reason=new.c.skip_reason)
+        .returning(DoseLog.id, DoseLog.item_id, DoseLog.scheduled_date, DoseLog.dose_index)
+        .execution_options(synchronize_session=False)
+    )
+    return {tuple(key): log_id for log_id, *key in updated}
+
+
+def _days_by_item(keys: Sequence[DoseKey]) -> dict[int, set[datetime.date]]:
+    days_by_item: dict[int, set[datetime.date]] = {}
+    for item_id, day, _ in keys:
+        days_by_item.setdefault(item_id, set()).add(day)
+    return days_by_item
+
+
+def _days_changed(db: Session, user_id: int, items: dict[int, Item], keys: Sequence[DoseKey]) -> None:
+    for item_id, days in _days_by_item(keys).items():
+        rollup.refresh_days(db, items[item_id], days)
+        for day in days:
+            cache.invalidate_day_on_commit(db, user_id, day)
+    if keys:
+        streaks.mark_changed(db, user_id, min(key[1] for key in keys))
+
+
+def upsert_dose_logs(
+    db: Session,
+    user_id: int,
+    entries: Sequence[DoseLogBulkEntry],
+    on_conflict: str = "skip",
+) -> list[DoseLogBulkResult]:
+    """
+    Insert `entries` with one multi-row INSERT ... ON CONFLICT DO NOTHING on
+    uq_item_date_dose. With "overwrite", the logs that already existed are then
+    updated where the entry differs: one UPDATE for status changes, one for
+    skip reason changes. Each statement reports what it wrote, so created and
+    updated hold even against concurrent writers, and a log the entry leaves
+    as it was gets no event and no derived-data work.
+    Returns one result per entry, in order.
+    """
+    items = _load_items(db, {entry.item_id for entry in entries})
+
+    results: list[Optional[DoseLogBulkResult]] = [None] * len(entries)
+    valid: dict[DoseKey, int] = {}  # key -> entry index
+    for index, entry in enumerate(entries):
+        error = _entry_error(entry, items.get(entry.item_id), user_id)
+        key = (entry.item_id, entry.scheduled_date, entry.dose_index)
+        if error is None and key in valid:
+            error = f"Duplicate of entry {valid[key]}"
+        if error is not None:
+            results[index] = DoseLogBulkResult(index=index, status="error", detail=error)
+        else:
+            valid[key] = index
+
+    # key -> log id
+    created: dict[DoseKey, int] = {}
+    status_changed: dict[DoseKey, int] = {}
+    reason_changed: dict[DoseKey, int] = {}
+    unchanged: dict[DoseKey, int] = {}
+    if valid:
+        insert = dialect_insert(db)
+        stmt = insert(DoseLog).values(
+            [
+                {
+                    "user_id": user_id,
+                    "item_id": entries[index].item_id,
+                    "scheduled_date": entries[index].scheduled_date,
+                    "dose_index": entries[index].dose_index,
+                    "status": entries[index].status,
+                    "skip_reason": entries[index].skip_reason,
+                }
+                for index in valid.values()
+            ]
+        )
+        stmt = stmt.on_conflict_do_nothing(index_elements=["item_id", "scheduled_date", "dose_index"])
+        stmt = stmt.returning(DoseLog.id, DoseLog.item_id, DoseLog.scheduled_date, DoseLog.dose_index)
+        for log_id, *key in db.execute(stmt):
+            created[tuple(key)] = log_id
+
+    if on_conflict == "overwrite":
+        rows = [
+            (*key, entries[index].status, entries[index].skip_reason)
+            for key, index in valid.items()
+            if key not in created
+        ]
+        status_changed = _overwrite(db, rows, lambda new: DoseLog.status != new.c.status)
+        # Taken entries carry no reason: a taken log that kept its status already has none
+        reason_changed = _overwrite(
+            db,
+            [row for row in rows if row[3] == "skipped" and row[:3] not in status_changed],
+            lambda new: and_(DoseLog.status == new.c.status, DoseLog.skip_reason.is_distinct_from(new.c.skip_reason)),
+        )
+        rest = [row[:3] for row in rows if row[:3] not in status_changed and row[:3] not in reason_changed]
+        if rest:
+            found = db.execute(
+                _select_by_keys(DoseLog, rest, DoseLog.id, DoseLog.item_id, DoseLog.scheduled_date, DoseLog.dose_index)
+            )
+            unchanged = {tuple(key): log_id for log_id, *key in found}
+    updated = {**status_changed, **reason_changed, **unchanged}
+
+    for key, index in valid.items():
+        if key in created:
+            results[index] = DoseLogBulkResult(index=index, status="created", log_id=created[key])
+        elif key in updated:
+            results[index] = DoseLogBulkResult(index=index, status="updated", log_id=updated[key])
+        elif on_conflict == "overwrite":
+            # Deleted by another request between the INSERT and the UPDATEs
+            results[index] = DoseLogBulkResult(index=index, status="skipped", detail="Log was deleted meanwhile")
+        else:
+            results[index] = DoseLogBulkResult(
+                index=index, status="skipped", detail="Log already exists for this item/date/dose_index"
+            )
+
+    logged = [(key, log_id, True) for key, log_id in created.items()]
+    logged += [(key, log_id, False) for key, log_id in status_changed.items()]
+    events.append(
+        db,
+        [
+            events.event(
+                user_id, log_id, *key, entries[valid[key]].status, entries[valid[key]].skip_reason, created=is_new
+            )
+            for key, log_id, is_new in logged
+        ]
+        + [
+            events.event(user_id, log_id, *key, events.REASON_CHANGED, entries[valid[key]].skip_reason)
+            for key, log_id in reason_changed.items()
+        ],
+    )
+    # No derived data depends on the reason; cached log listings do
+    _days_changed(db, user_id, items, [*created, *status_changed])
+    for _, day, _ in reason_changed:
+        cache.invalidate_day_on_commit(db, user_id, day)
+    reminders.discard(db, list(created))
+    sync.record_many(
+        db, user_id, sync.DOSE_LOG, [*created.values(), *status_changed.values(), *reason_changed.values()], sync.UPSERT
+    )
+    return results
+
+
+def delete_dose_logs(db: Session, user_id: int, keys: Sequence[DoseKey]) -> list[DoseLogBulkResult]:
+    """Delete logs by natural key with one DELETE. Missing logs are 'skipped'."""
+    items = _load_items(db, {key[0] for key in keys})
+
+    results: list[Optional[DoseLogBulkResult]] = [None] * len(keys)
+    valid: dict[DoseKey, int] = {}
+    for index, key in enumerate(keys):
+        error = _key_error(key, items.get(key[0]), user_id)
+        if error is not None:
+            results[index] = DoseLogBulkResult(index=index, status="error", detail=error)
+        else:
+            valid[key] = index
+
+    deleted: dict[DoseKey, int] = {}
+    if valid:
+        match = aliased(DoseLog)
+        rows = db.execute(
+            delete(DoseLog)
+            .where(DoseLog.id.in_(_select_by_keys(match, valid, match.id)))
+            .returning(DoseLog.id, DoseLog.item_id, DoseLog.scheduled_date, DoseLog.dose_index)
+            .execution_options(synchronize_session=False)
+        )
+        for log_id, *key in rows:
+            deleted[tuple(key)] = log_id
+
+    for key, index in valid.items():
+        if key in deleted:
+            results[index] = DoseLogBulkResult(index=index, status="deleted", log_id=deleted[key])
+        else:
+            results[index] = DoseLogBulkResult(index=index, status="skipped", detail="Log not found")
+
+    events.append(db, [events.event(user_id, log_id, *key, events.UNDONE) for key, log_id in deleted.items()])
+    _days_changed(db, user_id, items, list(deleted))
+    for item_id, days in _days_by_item(list(deleted)).items():
+        reminders.refresh_days(db, items[item_id], days)
+    sync.record_many(db, user_id, sync.DOSE_LOG, deleted.values(), sync.DELETE)
+    return results
@@ -0,0 +1,359 @@
+"""
+Append-only dose event stream and its dose_logs projection.
+
+Every dose log write appends what happened to dose_events, in the same
+transaction:
+
+- taken / skipped: a log was created, or its status set (bulk overwrite,
+  PATCH); carries the skip reason
+- reason_changed: only the skip reason changed
+- undone: the log was deleted
+
+dose_events is the record of truth and dose_logs its projection. Writers keep
+the projection in step inline, so reads and their indexes are unchanged, and
+the derived data follows the events' deltas (a status change moves one count
+in the rollup, a reason change touches no derived data at all).
+
+`rebuild` replays the stream into dose_logs (then rebuilds the rollup and
+drops the streak state): events are read in (user_id, seq) order in batches
+of EVENT_REPLAY_BATCH_SIZE and folded one user at a time, so memory holds one
+user's logs, and the result is inserted in batches. A user's replay starts
+from their snapshot in dose_snapshots when there is one; `snapshot_due`
+refreshes the snapshots of users with SNAPSHOT_MIN_EVENTS new events.
+Deleting an item deletes its dose_logs but not its events: a replay leaves
+out logs whose item no longer exists, whether they come from events or from
+a snapshot taken before the delete.
+
+    python -m app.services.events rebuild [--user-id 3]
+    python -m app.services.events snapshot [--min-events 1000]   # e.g. nightly
+    python -m app.services.events verify [--user-id 3]           # projection == replay?
+"""
+import argparse
+import datetime
+import itertools
+import os
+import sys
+import zlib
+from operator import attrgetter
+from typing import Iterable, Iterator, Optional, Sequence
+
+import orjson
+from sqlalchemy import String, column, delete, func, insert, select, table, type_coerce
+from sqlalchemy.orm import Session
+
+from app import cache
+from app.models.dose_event import DoseEvent
+from app.models.dose_log import DoseLog
+from app.models.dose_snapshot import DoseSnapshot
+from app.models.item import Item
+from app.models.streak_state import StreakState
+from app.services import rollup, sync
+
+TAKEN = "taken"
+SKIPPED = "skipped"
+UNDONE = "undone"
+REASON_CHANGED = "reason_changed"
+
+EVENT_REPLAY_BATCH_SIZE = int(os.environ.get("EVENT_REPLAY_BATCH_SIZE", "10000"))
+SNAPSHOT_MIN_EVENTS = int(os.environ.get("SNAPSHOT_MIN_EVENTS", "1000"))
+
+# A projected log, as a list in this column order
+_LOG_COLUMNS = ("id", "user_id", "item_id", "scheduled_date", "dose_index", "status", "timestamp", "skip_reason")
+# dose_logs without column types: replayed values are inserted as read, with no bind processing
+_LOG_TABLE = table("dose_logs", *(column(name) for name in _LOG_COLUMNS))
+
+State = dict[int, list]  # log id -> projected log
+
+
+# ---------- Appending ----------
+
+
+def event(
+    user_id: int,
+    log_id: int,
+    item_id: int,
+    scheduled_date: datetime.date,
+    dose_index: int,
+    kind: str,
+    skip_reason: Optional[str] = None,
+    created: bool = False,
+) -> dict:
+    """
+    One dose_events row for `append`. created: the event creates the log, and
+    records the log's own stored timestamp (so a replay reproduces it exactly).
+    """
+    if created:
+        recorded_at = select(DoseLog.timestamp).where(DoseLog.id == log_id).scalar_subquery()
+    else:
+        recorded_at = func.now()
+    return {
+        "user_id": user_id,
+        "log_id": log_id,
+        "item_id": item_id,
+        "scheduled_date": scheduled_date,
+        "dose_index": dose_index,
+        "kind": kind,
+        "skip_reason": skip_reason,
+        "recorded_at": recorded_at,
+    }
+
+
+def append(db: Session, events: Sequence[dict]) -> None:
+    """Append `events` (from `event`, in order) with one INSERT."""
+    if events:
+        sync.lock_feeds(db, (row["user_id"] for row in events))  # read by seq, like the sync feed
+        db.execute(insert(DoseEvent).values(list(events)))
+
+
+def backfill(db: Session) -> None:
+    """Seed the stream from existing dose_logs: one status event per log."""
+    db.execute(
+        insert(DoseEvent).from_select(
+            ["user_id", "item_id", "log_id", "scheduled_date", "dose_index", "kind", "skip_reason", "recorded_at"],
+            select(
+                DoseLog.user_id,
+                DoseLog.item_id,
+                DoseLog.id,
+                DoseLog.scheduled_date,
+                DoseLog.dose_index,
+                DoseLog.status,
+                DoseLog.skip_reason,
+                DoseLog.timestamp,
+            ).order_by(DoseLog.id),
+        )
+    )
+
+
+# ---------- Folding ----------
+
+
+def _is_sqlite(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def _stored(db: Session, col):
+    """
+    A date/datetime column as replay reads it: on SQLite the stored text, which
+    is folded and written back untouched instead of parsed and formatted again.
+    """
+    if _is_sqlite(db):
+        return type_coerce(col, String)
+    return col
+
+
+def _event_columns(db: Session) -> tuple:
+    return (
+        DoseEvent.seq,
+        DoseEvent.user_id,
+        DoseEvent.item_id,
+        DoseEvent.log_id,
+        _stored(db, DoseEvent.scheduled_date).label("scheduled_date"),
+        DoseEvent.dose_index,
+        DoseEvent.kind,
+        DoseEvent.skip_reason,
+        _stored(db, DoseEvent.recorded_at).label("recorded_at"),
+    )
+
+
+def _fold(state: State, events: Iterable[tuple]) -> None:
+    """Apply event rows (in _event_columns order) to `state`."""
+    for _, user_id, item_id, log_id, scheduled_date, dose_index, kind, skip_reason, recorded_at in events:
+        if kind == UNDONE:
+            state.pop(log_id, None)
+            continue
+        log = state.get(log_id)
+        if kind == REASON_CHANGED:
+            if log is not None:
+                log[7] = skip_reason
+        elif log is None:
+            state[log_id] = [log_id, user_id, item_id, scheduled_date, dose_index, kind, recorded_at, skip_reason]
+        else:
+            log[5] = kind
+            log[7] = skip_reason
+
+
+def _encode(state: State) -> bytes:
+    rows = [[log[0], log[2], log[3], log[4], log[5], log[6], log[7]] for log in state.values()]
+    return zlib.compress(orjson.dumps(rows))
+
+
+def _decode(user_id: int, data: bytes, parse: bool) -> State:
+    """parse: dates and timestamps back to objects (they stay text on SQLite, see _stored)."""
+    state: State = {}
+    for log_id, item_id, day, dose_index, status, timestamp, skip_reason in orjson.loads(zlib.decompress(data)):
+        if parse:
+            day = datetime.date.fromisoformat(day)
+            timestamp = datetime.datetime.fromisoformat(timestamp)
+        state[log_id] = [log_id, user_id, item_id, day, dose_index, status, timestamp, skip_reason]
+    return state
+
+
+def _snapshot_state(db: Session, user_id: int) -> tuple[int, State]:
+    snapshot = db.get(DoseSnapshot, user_id)
+    if snapshot is None:
+        return 0, {}
+    return snapshot.seq, _decode(user_id, snapshot.data, parse=not _is_sqlite(db))
+
+
+def _live(state: State, item_ids: set[int]) -> State:
+    """`state` without the logs of deleted items (their events outlive them)."""
+    return {log_id: log for log_id, log in state.items() if log[2] in item_ids}
+
+
+def _replayed(db: Session, user_id: Optional[int] = None) -> Iterator[tuple[int, int, State]]:
+    """
+    (user_id, last seq, state) per user with events or a snapshot: snapshot +
+    later events, minus the logs of items deleted since.
+    """
+    items = select(Item.id)
+    if user_id is not None:
+        items = items.where(Item.user_id == user_id)
+    item_ids = set(db.scalars(items))
+
+    after = func.coalesce(DoseSnapshot.seq, 0)
+    stmt = (
+        select(*_event_columns(db))
+        .outerjoin(DoseSnapshot, DoseSnapshot.user_id == DoseEvent.user_id)
+        .where(DoseEvent.seq > after)
+        .order_by(DoseEvent.user_id, DoseEvent.seq)
+    )
+    snapshots = select(DoseSnapshot.user_id)
+    if user_id is not None:
+        stmt = stmt.where(DoseEvent.user_id == user_id)
+        snapshots = snapshots.where(DoseSnapshot.user_id == user_id)
+    pending = set(db.scalars(snapshots))  # users with a snapshot not replayed yet
+
+    current, seq, state = None, 0, {}
+    # Core rows through the session's connection: no ORM result processing
+    result = db.connection().execute(
+        stmt, execution_options={"stream_results": True, "yield_per": EVENT_REPLAY_BATCH_SIZE}
+    )
+    for batch in result.partitions():
+        for user, rows in itertools.groupby(batch, key=attrgetter("user_id")):
+            rows = list(rows)
+            if user != current:
+                if current is not None:
+                    yield current, seq, _live(state, item_ids)
+                current = user
+                pending.discard(user)
+                seq, state = _snapshot_state(db, user)
+            _fold(state, rows)
+            seq = rows[-1].seq
+    if current is not None:
+        yield current, seq, _live(state, item_ids)
+    for user in sorted(pending):
+        seq, state = _snapshot_state(db, user)
+        yield user, seq, _live(state, item_ids)
+
+
+# ---------- Rebuild, snapshots, verify ----------
+
+
+def rebuild(db: Session, user_id: Optional[int] = None) -> int:
+    """Replace dose_logs (one user's or all) with the replayed stream. Returns logs written."""
+    clear = delete(DoseLog)
+    streak_states = delete(StreakState)
+    if user_id is not None:
+        clear = clear.where(DoseLog.user_id == user_id)
+        streak_states = streak_states.where(StreakState.user_id == user_id)
+    db.execute(clear)
+
+    # The projected rows go to the driver's executemany as they are: no ORM bulk
+    # path (which splits a batch by the keys each row sets) and no per-row
+    # parameter processing
+    conn = db.connection()
+    compiled = _LOG_TABLE.insert().compile(dialect=conn.dialect)
+    written = 0
+    batch: list = []
+
+    def flush() -> None:
+        rows = batch if compiled.positional else [dict(zip(_LOG_COLUMNS, log)) for log in batch]
+        conn.exec_driver_sql(str(compiled), rows)
+
+    for user, _, state in _replayed(db, user_id):
+        batch.extend(tuple(log) for log in state.values())
+        if len(batch) >= EVENT_REPLAY_BATCH_SIZE:
+            flush()
+            written += len(batch)
+            batch = []
+        cache.invalidate_on_commit(db, user)
+    if batch:
+        flush()
+        written += len(batch)
+
+    rollup.rebuild(db, user_id)
+    db.execute(streak_states)  # recomputed on the next read
+    return written
+
+
+def snapshot(db: Session, user_id: int) -> int:
+    """Write the user's snapshot at their latest event. Returns the logs in it."""
+    for user, seq, state in _replayed(db, user_id):
+        db.merge(DoseSnapshot(user_id=user, seq=seq, logs=len(state), data=_encode(state)))
+        return len(state)
+    return 0
+
+
+def snapshot_due(db: Session, min_events: int = SNAPSHOT_MIN_EVENTS) -> int:
+    """Snapshot every user with at least `min_events` events since their last snapshot. Returns users."""
+    users = db.scalars(
+        select(DoseEvent.user_id)
+        .outerjoin(DoseSnapshot, DoseSnapshot.user_id == DoseEvent.user_id)
+        .where(DoseEvent.seq > func.coalesce(DoseSnapshot.seq, 0))
+        .group_by(DoseEvent.user_id)
+        .having(func.count() >= min_events)
+    ).all()
+    for user in users:
+        snapshot(db, user)
+        db.commit()
+    return len(users)
+
+
+def verify(db: Session, user_id: Optional[int] = None) -> list[int]:
+    """Users whose dose_logs differ from the replayed stream."""
+    columns = [DoseLog.__table__.c[name] for name in _LOG_COLUMNS]
+    columns[3] = _stored(db, columns[3])
+    columns[6] = _stored(db, columns[6])
+    replayed_users = set()
+    differing = []
+    for user, _, state in _replayed(db, user_id):
+        replayed_users.add(user)
+        projected = {tuple(row) for row in db.execute(select(*columns).where(DoseLog.user_id == user))}
+        if projected != {tuple(log) for log in state.values()}:
+            differing.append(user)
+    with_logs = select(DoseLog.user_id).distinct()
+    if user_id is not None:
+        with_logs = with_logs.where(DoseLog.user_id == user_id)
+    differing += sorted(set(db.scalars(with_logs)) - replayed_users)
+    return differing
+
+
+def main() -> None:
+    from app.db.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Replay, snapshot or verify the dose event stream.")
+    parser.add_argument("command", choices=["rebuild", "snapshot", "verify"])
+    parser.add_argument("--user-id", type=int, default=None, help="Only this user")
+    parser.add_argument("--min-events", type=int, default=SNAPSHOT_MIN_EVENTS, help="snapshot: events since the last one")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.command == "rebuild":
+            written = rebuild(db, args.user_id)
+            db.commit()
+            print(f"dose_logs rebuilt: {written} rows")
+        elif args.command == "snapshot":
+            if args.user_id is not None:
+                logs = snapshot(db, args.user_id)
+                db.commit()
+                print(f"snapshot of user {args.user_id}: {logs} logs")
+            else:
+                print(f"snapshots written: {snapshot_due(db, args.min_events)} users")
+        else:
+            differing = verify(db, args.user_id)
+            print(f"users whose dose_logs differ from their events: {differing or 'none'}")
+            sys.exit(1 if differing else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Streaming export of a user's history as CSV or NDJSON, optionally gzipped.
+
+Rows are pulled with stream_results/yield_per and written out in ~64 KB
+chunks, so memory stays flat no matter how many years of history are
+exported.
+
+Two kinds of export:
+- "doses": every DoseLog row with its item's name, oldest first
+- "daily": one row per active item per scheduled day, with the same
+  expected/taken/skipped/missed numbers as GET /logs/stats (read from the
+  daily_adherence rollup)
+"""
+import csv
+import datetime
+import io
+import json
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.daily_adherence import DailyAdherence
+from app.models.dose_log import DoseLog
+from app.models.item import Item
+from app.services.schedule import WEEKDAY_BITS
+
+BATCH_SIZE = 2000
+CHUNK_BYTES = 64 * 1024
+
+DOSE_COLUMNS = [
+    "id", "item_id", "item_name", "scheduled_date", "dose_index", "status", "timestamp", "skip_reason",
+]
+DAILY_COLUMNS = ["date", "item_id", "item_name", "expected", "taken", "skipped", "missed"]
+
+_ONE_DAY = datetime.timedelta(days=1)
+
+
+def iter_dose_rows(
+    db: Session,
+    user_id: int,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+) -> Iterator[tuple]:
+    stmt = (
+        select(
+            DoseLog.id,
+            DoseLog.item_id,
+            Item.name,
+            DoseLog.scheduled_date,
+            DoseLog.dose_index,
+            DoseLog.status,
+            DoseLog.timestamp,
+            DoseLog.skip_reason,
+        )
+        .join(Item, Item.id == DoseLog.item_id)
+        .where(DoseLog.user_id == user_id)
+        .order_by(DoseLog.scheduled_date, DoseLog.timestamp, DoseLog.id)
+    )
+    if start:
+        stmt = stmt.where(DoseLog.scheduled_date >= start)
+    if end:
+        stmt = stmt.where(DoseLog.scheduled_date <= end)
+
+    result = db.execute(stmt, execution_options={"stream_results": True, "yield_per": BATCH_SIZE})
+    for row in result:
+        yield tuple(row)
+
+
+def iter_daily_rows(
+    db: Session,
+    user_id: int,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+) -> Iterator[tuple]:
+    end = end or datetime.date.today()
+    if start is None:
+        start = db.execute(
+            select(DailyAdherence.date)
+            .where(DailyAdherence.user_id == user_id)
+            .order_by(DailyAdherence.date)
+            .limit(1)
+        ).scalar()
+        if start is None:
+            return
+
+    items = db.scalars(
+        select(Item).where(Item.user_id == user_id, Item.active == True).order_by(Item.id)  # noqa: E712
+    ).all()
+    by_weekday = [
+        [item for item in items if item.schedule_days & WEEKDAY_BITS[weekday]] for weekday in range(7)
+    ]
+
+    counts = iter(
+        db.execute(
+            select(DailyAdherence.date, DailyAdherence.item_id, DailyAdherence.taken, DailyAdherence.skipped)
+            .where(
+                DailyAdherence.user_id == user_id,
+                DailyAdherence.date >= start,
+                DailyAdherence.date <= end,
+                DailyAdherence.expected > 0,
+            )
+            .order_by(DailyAdherence.date, DailyAdherence.item_id),
+            execution_options={"stream_results": True, "yield_per": BATCH_SIZE},
+        )
+    )
+    pending = next(counts, None)
+
+    day = start
+    while day <= end:
+        day_counts: dict[int, tuple[int, int]] = {}
+        while pending is not None and pending.date <= day:
+            day_counts[pending.item_id] = (pending.taken, pending.skipped)
+            pending = next(counts, None)
+
+        for item in by_weekday[day.weekday()]:
+            taken, skipped = day_counts.get(item.id, (0, 0))
+            expected = item.doses_per_day
+            yield (day, item.id, item.name, expected, taken, skipped, max(0, expected - taken - skipped))
+        day += _ONE_DAY
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _chunked(pieces: Iterable[str]) -> Iterator[bytes]:
+    buffer: list[str] = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def to_csv(rows: Iterable[tuple], columns: list[str]) -> Iterator[bytes]:
+    def lines() -> Iterator[str]:
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+        yield out.getvalue()
+
+    return _chunked(lines())
+
+
+def to_ndjson(rows: Iterable[tuple], columns: list[str]) -> Iterator[bytes]:
+    return _chunked(
+        json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in rows
+    )
+
+
+def gzipped(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a byte stream into a single gzip member as it is produced."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows a gzip response: gzip (or x-gzip)
+    listed with a q-value above 0, or else "*" with one. "gzip;q=0" refuses
+    it; a header naming only other codings ("identity") does not accept it.
+    """
+    qualities: dict[str, float] = {}
+    for element in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in element.split(";"))
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0  # malformed: not an acceptance
+        qualities[coding.lower()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
@@ -0,0 +1,100 @@
+"""
+Keyset pagination over a user's dose logs, newest first.
+
+Order is (scheduled_date, timestamp, id) DESC and a cursor is the sort key of
+the last row returned, so each page is an index range scan starting right
+after the previous one instead of an OFFSET that re-reads everything before
+it. Backed by ix_dose_logs_user_date_ts_id.
+
+SQLite keeps `timestamp` as text and server_default=now() writes it without
+microseconds, while bound datetimes are rendered with them; comparing the two
+would put a row before itself. On SQLite the sort key therefore uses the raw
+stored text on both sides of the comparison.
+"""
+import base64
+import datetime
+import json
+import os
+from typing import Iterator, Optional
+
+from sqlalchemy import Select, String, select, tuple_, type_coerce
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app.models.dose_log import DoseLog
+from app.responses import columns_for, dumps_lines, row_dicts
+from app.schemas.dose_log import DoseLogOut
+
+DEFAULT_PAGE_SIZE = int(os.environ.get("LOGS_PAGE_SIZE", "500"))
+MAX_PAGE_SIZE = 5000
+STREAM_BATCH_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _is_sqlite(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def _sort_ts(db: Session):
+    if _is_sqlite(db):
+        return type_coerce(DoseLog.timestamp, String)
+    return DoseLog.timestamp
+
+
+def encode_cursor(db: Session, row: Row) -> str:
+    """Cursor pointing just after `row` (a row of `logs_after`)."""
+    ts = row.sort_ts if _is_sqlite(db) else row.sort_ts.isoformat()
+    raw = json.dumps([row.scheduled_date.isoformat(), ts, row.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(db: Session, cursor: str) -> tuple:
+    try:
+        day, ts, log_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        day = datetime.date.fromisoformat(day)
+        if not _is_sqlite(db):
+            ts = datetime.datetime.fromisoformat(ts)
+        return day, ts, int(log_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+def logs_after(
+    db: Session,
+    user_id: int,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    item_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> Select:
+    """Ordered select of the user's logs after `cursor`: DoseLogOut's columns, then `sort_ts`."""
+    sort_ts = _sort_ts(db)
+    stmt = select(*columns_for(DoseLogOut, DoseLog.__table__), sort_ts.label("sort_ts")).where(
+        DoseLog.user_id == user_id
+    )
+
+    if start:
+        stmt = stmt.where(DoseLog.scheduled_date >= start)
+    if end:
+        stmt = stmt.where(DoseLog.scheduled_date <= end)
+    if item_id:
+        stmt = stmt.where(DoseLog.item_id == item_id)
+    if cursor:
+        stmt = stmt.where(
+            tuple_(DoseLog.scheduled_date, sort_ts, DoseLog.id) < tuple_(*_decode_cursor(db, cursor))
+        )
+
+    return stmt.order_by(DoseLog.scheduled_date.desc(), sort_ts.desc(), DoseLog.id.desc())
+
+
+def stream_ndjson(db: Session, stmt: Select) -> Iterator[bytes]:
+    """
+    Yield the rows of `stmt` as newline-delimited JSON, one chunk per batch.
+    Rows come from a streaming cursor, so memory does not grow with the result.
+    """
+    result = db.execute(stmt, execution_options={"stream_results": True, "yield_per": STREAM_BATCH_SIZE})
+    for batch in result.partitions():
+        yield dumps_lines(row_dicts(batch, DoseLogOut))
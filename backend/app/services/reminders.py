@@ -0,0 +1,353 @@
+"""
+Dose reminders: a time-ordered table of upcoming, unlogged doses.
+
+dose_reminders holds one row per dose of an item with dose_times, planned
+REMINDER_HORIZON_HOURS ahead. It is indexed on (sent_at, due_at), so the
+dispatcher's "pending and due before T" is a range read of the index, however
+many items there are. Writers keep it in step inside their transaction, like
+the rollup:
+
+- a dose is logged (create, bulk, sync push): `discard` deletes its row by
+  primary key, O(log n)
+- a log is deleted: `refresh_days` plans that day again
+- an item's times, schedule or active flag change: `plan_item`
+
+`ReminderScheduler` runs in the API process when REMINDERS_ENABLED is set: it
+extends the horizon every REMINDER_PLAN_INTERVAL_SECONDS and hands due
+reminders to the installed `ReminderSink` (a logger by default; `MemorySink`
+collects them, for tests and local runs). A reminder is claimed by setting
+sent_at in one UPDATE, so several workers never deliver the same one. The
+claim is committed before the sink is called, so no lock is held during
+delivery; if the sink raises, the claim is released and the reminders are
+retried on the next poll.
+
+All times are the server's local wall clock, as date.today() is elsewhere.
+"""
+import asyncio
+import datetime
+import logging
+import os
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Sequence
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Date, DateTime, Integer, column, delete, exists, select, tuple_, update, values
+from sqlalchemy.orm import Session
+
+from app.db import dialect_insert
+from app.db.session import SessionLocal
+from app.models.dose_log import DoseLog
+from app.models.dose_reminder import DoseReminder
+from app.models.item import Item
+from app.services.schedule import iter_scheduled_dates
+
+logger = logging.getLogger(__name__)
+
+# ---------- Config ----------
+REMINDERS_ENABLED = os.environ.get("REMINDERS_ENABLED", "").lower() in ("1", "true", "yes")
+REMINDER_HORIZON_HOURS = int(os.environ.get("REMINDER_HORIZON_HOURS", "48"))
+REMINDER_POLL_SECONDS = float(os.environ.get("REMINDER_POLL_SECONDS", "30"))
+REMINDER_PLAN_INTERVAL_SECONDS = float(os.environ.get("REMINDER_PLAN_INTERVAL_SECONDS", "3600"))
+# Reminders more than this late (dispatcher was down) are dropped, not sent
+REMINDER_GRACE_MINUTES = int(os.environ.get("REMINDER_GRACE_MINUTES", "60"))
+REMINDER_BATCH_SIZE = int(os.environ.get("REMINDER_BATCH_SIZE", "500"))
+
+DoseKey = tuple[int, datetime.date, int]  # (item_id, scheduled_date, dose_index)
+
+_PLAN_BATCH_SIZE = 500
+_PLANNED_COLUMNS = [
+    ("item_id", Integer), ("scheduled_date", Date), ("dose_index", Integer), ("user_id", Integer), ("due_at", DateTime),
+]
+
+
+# ---------- Sinks ----------
+
+
+@dataclass(frozen=True)
+class DueReminder:
+    user_id: int
+    item_id: int
+    item_name: str
+    scheduled_date: datetime.date
+    dose_index: int
+    due_at: datetime.datetime
+
+
+class ReminderSink:
+    """Delivery channel (push, SMS, ...). Raise to have the batch retried."""
+
+    def send(self, reminders: list[DueReminder]) -> None:
+        raise NotImplementedError
+
+
+class LogSink(ReminderSink):
+    def send(self, reminders: list[DueReminder]) -> None:
+        for reminder in reminders:
+            logger.info(
+                "reminder user=%s item=%s (%s) dose=%s due=%s",
+                reminder.user_id, reminder.item_id, reminder.item_name, reminder.dose_index, reminder.due_at,
+            )
+
+
+class MemorySink(ReminderSink):
+    """Keeps what it was sent; for tests and local runs."""
+
+    def __init__(self):
+        self.sent: list[DueReminder] = []
+
+    def send(self, reminders: list[DueReminder]) -> None:
+        self.sent.extend(reminders)
+
+
+_sink: ReminderSink = LogSink()
+
+
+def set_sink(sink: ReminderSink) -> None:
+    global _sink
+    _sink = sink
+
+
+def get_sink() -> ReminderSink:
+    return _sink
+
+
+# ---------- Planning ----------
+
+
+def _horizon(now: datetime.datetime) -> datetime.datetime:
+    return now + datetime.timedelta(hours=REMINDER_HORIZON_HOURS)
+
+
+def _candidates(
+    item: Item, start: datetime.datetime, end: datetime.datetime, days: Optional[set[datetime.date]] = None
+) -> Iterator[tuple]:
+    """_PLANNED_COLUMNS rows for the item's doses due in [start, end] (only on `days` if given)."""
+    if not item.active or not item.dose_times or len(item.dose_times) != item.doses_per_day:
+        return
+    times = [datetime.time.fromisoformat(t) for t in item.dose_times]
+    for day in iter_scheduled_dates(item.schedule_days, start.date(), end.date()):
+        if days is not None and day not in days:
+            continue
+        for dose_index, dose_time in enumerate(times, start=1):
+            due_at = datetime.datetime.combine(day, dose_time)
+            if start <= due_at <= end:
+                yield item.id, day, dose_index, item.user_id, due_at
+
+
+def _insert_pending(db: Session, rows: Iterable[tuple]) -> None:
+    """Insert reminder rows, skipping doses already logged or already planned."""
+    batch: list[tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= _PLAN_BATCH_SIZE:
+            _insert_batch(db, batch)
+            batch = []
+    if batch:
+        _insert_batch(db, batch)
+
+
+def _insert_batch(db: Session, rows: list[tuple]) -> None:
+    planned = values(*(column(name, type_) for name, type_ in _PLANNED_COLUMNS), name="planned").data(rows).cte()
+    logged = exists().where(
+        DoseLog.item_id == planned.c.item_id,
+        DoseLog.scheduled_date == planned.c.scheduled_date,
+        DoseLog.dose_index == planned.c.dose_index,
+    )
+    insert = dialect_insert(db)
+    stmt = insert(DoseReminder).from_select([name for name, _ in _PLANNED_COLUMNS], select(planned).where(~logged))
+    db.execute(stmt.on_conflict_do_nothing(index_elements=["item_id", "scheduled_date", "dose_index"]))
+
+
+def plan_item(db: Session, item: Item, now: Optional[datetime.datetime] = None) -> None:
+    """
+    The item's times, schedule or active flag changed: re-plan its pending
+    reminders, from REMINDER_GRACE_MINUTES ago (doses still unlogged that
+    the dispatcher has not sent yet) to the horizon.
+    """
+    now = now or datetime.datetime.now()
+    db.execute(delete(DoseReminder).where(DoseReminder.item_id == item.id, DoseReminder.sent_at.is_(None)))
+    start = now - datetime.timedelta(minutes=REMINDER_GRACE_MINUTES)
+    _insert_pending(db, _candidates(item, start, _horizon(now)))
+
+
+def refresh_days(
+    db: Session, item: Item, days: Iterable[datetime.date], now: Optional[datetime.datetime] = None
+) -> None:
+    """Logs of `item` on `days` were deleted: plan those doses again if still ahead."""
+    now = now or datetime.datetime.now()
+    db.flush()  # the deleted logs must not hide their doses
+    _insert_pending(db, _candidates(item, now, _horizon(now), set(days)))
+
+
+def _has_key(keys: Sequence[DoseKey], name: str):
+    """DoseReminder's primary key is one of `keys`."""
+    key_rows = values(
+        column("item_id", Integer), column("scheduled_date", Date), column("dose_index", Integer), name=name
+    ).data(list(keys)).cte()
+    return tuple_(DoseReminder.item_id, DoseReminder.scheduled_date, DoseReminder.dose_index).in_(
+        select(key_rows.c.item_id, key_rows.c.scheduled_date, key_rows.c.dose_index)
+    )
+
+
+def discard(db: Session, keys: Sequence[DoseKey]) -> None:
+    """These doses were logged: drop their reminders (a primary key delete each)."""
+    if not keys:
+        return
+    db.execute(delete(DoseReminder).where(_has_key(keys, "logged_keys")))
+
+
+def plan_all(db: Session, now: Optional[datetime.datetime] = None) -> None:
+    """Extend every item's reminders to the horizon and purge old rows. Idempotent."""
+    now = now or datetime.datetime.now()
+    items = db.scalars(
+        select(Item)
+        .where(Item.active == True, Item.dose_times.is_not(None))  # noqa: E712
+        .execution_options(yield_per=_PLAN_BATCH_SIZE)
+    )
+    _insert_pending(db, (row for item in items for row in _candidates(item, now, _horizon(now))))
+
+    cutoff = now - datetime.timedelta(minutes=REMINDER_GRACE_MINUTES)
+    db.execute(delete(DoseReminder).where(DoseReminder.sent_at < cutoff))
+    db.execute(delete(DoseReminder).where(DoseReminder.sent_at.is_(None), DoseReminder.due_at < cutoff))
+
+
+# ---------- Delivery ----------
+
+
+def dispatch_due(db: Session, now: Optional[datetime.datetime] = None) -> int:
+    """Deliver every reminder due by now to the sink, in batches. Returns how many were sent."""
+    now = now or datetime.datetime.now()
+    earliest = now - datetime.timedelta(minutes=REMINDER_GRACE_MINUTES)
+    sent = 0
+    while True:
+        pending_due = (DoseReminder.sent_at.is_(None), DoseReminder.due_at >= earliest, DoseReminder.due_at <= now)
+        batch = (
+            select(DoseReminder.item_id, DoseReminder.scheduled_date, DoseReminder.dose_index)
+            .where(*pending_due)
+            .order_by(DoseReminder.due_at)
+            .limit(REMINDER_BATCH_SIZE)
+        )
+        # Claim: only rows still unsent are updated, so no reminder is sent twice
+        claimed = db.execute(
+            update(DoseReminder)
+            .where(
+                *pending_due,
+                tuple_(DoseReminder.item_id, DoseReminder.scheduled_date, DoseReminder.dose_index).in_(batch),
+            )
+            .values(sent_at=now)
+            .returning(
+                DoseReminder.user_id,
+                DoseReminder.item_id,
+                DoseReminder.scheduled_date,
+                DoseReminder.dose_index,
+                DoseReminder.due_at,
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+        if not claimed:
+            db.commit()
+            return sent
+
+        names = dict(
+            db.execute(select(Item.id, Item.name).where(Item.id.in_({row.item_id for row in claimed}))).all()
+        )
+        reminders = sorted(
+            (
+                DueReminder(
+                    user_id=row.user_id,
+                    item_id=row.item_id,
+                    item_name=names.get(row.item_id, ""),
+                    scheduled_date=row.scheduled_date,
+                    dose_index=row.dose_index,
+                    due_at=row.due_at,
+                )
+                for row in claimed
+            ),
+            key=lambda reminder: reminder.due_at,
+        )
+        # Commit the claim first: a sink's network round trip must not hold
+        # the database write lock (or the rows' locks) that dose writes need
+        db.commit()
+        try:
+            _sink.send(reminders)
+        except Exception:
+            _release(db, [(row.item_id, row.scheduled_date, row.dose_index) for row in claimed], now)
+            raise
+        sent += len(reminders)
+        if len(claimed) < REMINDER_BATCH_SIZE:
+            return sent
+
+
+def _release(db: Session, keys: list[DoseKey], claimed_at: datetime.datetime) -> None:
+    """Undo a claim whose delivery failed: the reminders are pending again."""
+    db.rollback()
+    db.execute(
+        update(DoseReminder)
+        .where(DoseReminder.sent_at == claimed_at, _has_key(keys, "claimed_keys"))
+        .values(sent_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+class ReminderScheduler:
+    """Background task of the API process: plan ahead, then poll for due reminders."""
+
+    def __init__(
+        self,
+        poll_seconds: float = REMINDER_POLL_SECONDS,
+        plan_interval_seconds: float = REMINDER_PLAN_INTERVAL_SECONDS,
+    ):
+        self.poll_seconds = poll_seconds
+        self.plan_interval_seconds = plan_interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._last_plan: Optional[datetime.datetime] = None
+        self.sent = 0
+        self.failed = 0
+        self.last_run: Optional[datetime.datetime] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def run_once(self, now: Optional[datetime.datetime] = None) -> int:
+        now = now or datetime.datetime.now()
+        with SessionLocal() as db:
+            if self._last_plan is None or (now - self._last_plan).total_seconds() >= self.plan_interval_seconds:
+                plan_all(db, now)
+                db.commit()
+                self._last_plan = now
+            sent = dispatch_due(db, now)
+        self.sent += sent
+        self.last_run = now
+        return sent
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await run_in_threadpool(self.run_once)
+            except Exception:
+                self.failed += 1
+                logger.exception("reminder dispatch failed")
+            await asyncio.sleep(self.poll_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": REMINDERS_ENABLED,
+            "running": self._task is not None,
+            "sent": self.sent,
+            "failed": self.failed,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
+
+
+reminder_scheduler = ReminderScheduler()
@@ -0,0 +1,171 @@
+"""
+Maintenance of the daily_adherence rollup table.
+
+Routers call these helpers inside the same transaction as the dose log / item
+write, so the rollup commits (or rolls back) together with the change.
+
+Backfill / repair from existing logs:
+
+    python -m app.services.rollup            # every user
+    python -m app.services.rollup --user-id 3
+"""
+import argparse
+import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.db import dialect_insert
+from app.models.daily_adherence import DailyAdherence
+from app.models.dose_log import DoseLog
+from app.models.item import Item
+from app.services.schedule import is_scheduled, weekday_bit_expr
+
+
+def _expected_for(item: Item, day: datetime.date) -> int:
+    if item.active and is_scheduled(item.schedule_days, day):
+        return item.doses_per_day
+    return 0
+
+
+def _expected_expr(date_col, dialect_name: str):
+    """SQL version of _expected_for against the items table."""
+    bit = weekday_bit_expr(date_col, dialect_name)
+    return case(
+        (and_(Item.active == True, Item.schedule_days.op("&")(bit) != 0), Item.doses_per_day),  # noqa: E712
+        else_=0,
+    )
+
+
+def refresh_days(db: Session, item: Item, days: Iterable[datetime.date]) -> None:
+    """Recount the rollup rows of `item` for `days` from dose_logs."""
+    days = set(days)
+    if not days:
+        return
+    db.flush()  # make pending log changes visible to the recount
+
+    counts = db.execute(
+        select(DoseLog.scheduled_date, DoseLog.status, func.count())
+        .where(DoseLog.item_id == item.id, DoseLog.scheduled_date.in_(days))
+        .group_by(DoseLog.scheduled_date, DoseLog.status)
+    ).all()
+    by_day: dict[datetime.date, dict[str, int]] = {}
+    for day, status, count in counts:
+        by_day.setdefault(day, {})[status] = count
+
+    existing = {
+        row.date: row
+        for row in db.scalars(
+            select(DailyAdherence).where(
+                DailyAdherence.item_id == item.id, DailyAdherence.date.in_(days)
+            )
+        )
+    }
+
+    for day in days:
+        row = existing.get(day)
+        day_counts = by_day.get(day)
+        if not day_counts:
+            if row is not None:
+                db.delete(row)
+            continue
+        if row is None:
+            row = DailyAdherence(item_id=item.id, date=day, user_id=item.user_id)
+            db.add(row)
+        row.taken = day_counts.get("taken", 0)
+        row.skipped = day_counts.get("skipped", 0)
+        row.expected = _expected_for(item, day)
+
+
+def add_counts(db: Session, item: Item, day: datetime.date, taken: int = 0, skipped: int = 0) -> None:
+    """
+    Move the day's counts by a logged change (+1 for a new log, -1 for a
+    deleted one, both for a status change) in one upsert instead of a recount.
+    """
+    insert_ = dialect_insert(db)
+    stmt = insert_(DailyAdherence).values(
+        item_id=item.id,
+        date=day,
+        user_id=item.user_id,
+        taken=taken,
+        skipped=skipped,
+        expected=_expected_for(item, day),
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["item_id", "date"],
+            set_={"taken": DailyAdherence.taken + taken, "skipped": DailyAdherence.skipped + skipped},
+        )
+    )
+    if taken + skipped < 0:
+        # A log was removed; same as refresh_days, no row for a day without logs
+        db.execute(
+            delete(DailyAdherence).where(
+                DailyAdherence.item_id == item.id,
+                DailyAdherence.date == day,
+                DailyAdherence.taken == 0,
+                DailyAdherence.skipped == 0,
+            )
+        )
+
+
+def refresh_expected(db: Session, item: Item) -> None:
+    """Re-derive `expected` for every rollup row of `item` after a schedule change."""
+    bit = weekday_bit_expr(DailyAdherence.date, db.get_bind().dialect.name)
+    scheduled = case((bit.op("&")(item.schedule_days) != 0, item.doses_per_day), else_=0)
+    db.execute(
+        update(DailyAdherence)
+        .where(DailyAdherence.item_id == item.id)
+        .values(expected=scheduled if item.active else 0)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def rebuild(db: Session, user_id: Optional[int] = None) -> int:
+    """Recompute the rollup from dose_logs (one INSERT ... SELECT). Returns rows written."""
+    clear = delete(DailyAdherence)
+    if user_id is not None:
+        clear = clear.where(DailyAdherence.user_id == user_id)
+    db.execute(clear)
+
+    source = (
+        select(
+            Item.id,
+            DoseLog.scheduled_date,
+            DoseLog.user_id,
+            func.sum(case((DoseLog.status == "taken", 1), else_=0)),
+            func.sum(case((DoseLog.status == "skipped", 1), else_=0)),
+            _expected_expr(DoseLog.scheduled_date, db.get_bind().dialect.name),
+        )
+        .join(Item, Item.id == DoseLog.item_id)
+        .group_by(Item.id, DoseLog.scheduled_date, DoseLog.user_id)
+    )
+    if user_id is not None:
+        source = source.where(DoseLog.user_id == user_id)
+
+    result = db.execute(
+        insert(DailyAdherence).from_select(
+            ["item_id", "date", "user_id", "taken", "skipped", "expected"], source
+        )
+    )
+    return result.rowcount
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the daily_adherence rollup from dose_logs.")
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user")
+    args = parser.parse_args()
+
+    from app.db.session import SessionLocal
+    from app.db.utils import create_tables
+
+    create_tables()
+    with SessionLocal() as db:
+        rows = rebuild(db, args.user_id)
+        db.commit()
+    print(f"daily_adherence rebuilt: {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
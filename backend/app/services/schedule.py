@@ -0,0 +1,103 @@
+"""
+Date math on the Item.schedule_days bitmask.
+
+Mon=1  Tue=2  Wed=4  Thu=8  Fri=16  Sat=32  Sun=64
+Python weekday(): Mon=0 .. Sun=6, so bit = 1 << weekday().
+
+Everything here is O(1) in the length of the date range (except the
+enumeration helper, which is O(scheduled dates returned)).
+"""
+import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import Integer, case, cast, func
+
+ALL_DAYS = 127
+
+WEEKDAY_BITS = {0: 1, 1: 2, 2: 4, 3: 8, 4: 16, 5: 32, 6: 64}
+
+# SQL day-of-week (strftime('%w') / extract(dow)): Sun=0 .. Sat=6
+_SQL_DOW_BITS = {0: 64, 1: 1, 2: 2, 3: 4, 4: 8, 5: 16, 6: 32}
+
+_ONE_DAY = datetime.timedelta(days=1)
+
+
+def is_scheduled(schedule_days: int, target_date: datetime.date) -> bool:
+    bit = WEEKDAY_BITS[target_date.weekday()]
+    return bool(schedule_days & bit)
+
+
+def popcount(schedule_days: int) -> int:
+    """Number of weekdays set in the mask."""
+    return bin(schedule_days & ALL_DAYS).count("1")
+
+
+def _rotate_right(schedule_days: int, weekday: int) -> int:
+    """Re-align the mask so bit 0 is `weekday` (7-bit rotation)."""
+    mask = schedule_days & ALL_DAYS
+    return ((mask >> weekday) | (mask << (7 - weekday))) & ALL_DAYS
+
+
+def count_scheduled_days(schedule_days: int, start: datetime.date, end: datetime.date) -> int:
+    """Scheduled days in [start, end] (inclusive). 0 if end < start."""
+    n_days = (end - start).days + 1
+    if n_days <= 0:
+        return 0
+    full_weeks, remainder = divmod(n_days, 7)
+    # Remainder covers `remainder` consecutive weekdays starting at start.weekday()
+    head = _rotate_right(schedule_days, start.weekday()) & ((1 << remainder) - 1)
+    return full_weeks * popcount(schedule_days) + popcount(head)
+
+
+def next_scheduled_date(
+    schedule_days: int, on_or_after: datetime.date
+) -> Optional[datetime.date]:
+    """First scheduled date >= on_or_after, or None for an empty mask."""
+    rotated = _rotate_right(schedule_days, on_or_after.weekday())
+    if not rotated:
+        return None
+    offset = (rotated & -rotated).bit_length() - 1  # lowest set bit
+    return on_or_after + datetime.timedelta(days=offset)
+
+
+def previous_scheduled_date(
+    schedule_days: int, on_or_before: datetime.date
+) -> Optional[datetime.date]:
+    """Last scheduled date <= on_or_before, or None for an empty mask."""
+    # Bit k of `rotated` is the weekday k days after on_or_before's; looking
+    # backwards means bit 0 (today), then bit 6 (yesterday), bit 5, ...
+    rotated = _rotate_right(schedule_days, on_or_before.weekday())
+    if not rotated:
+        return None
+    if rotated & 1:
+        return on_or_before
+    offset = 7 - (rotated.bit_length() - 1)  # highest set bit
+    return on_or_before - datetime.timedelta(days=offset)
+
+
+def iter_scheduled_dates(
+    schedule_days: int,
+    start: datetime.date,
+    end: datetime.date,
+    reverse: bool = False,
+) -> Iterator[datetime.date]:
+    """Yield scheduled dates in [start, end], skipping unscheduled days outright."""
+    if reverse:
+        day = previous_scheduled_date(schedule_days, end)
+        while day is not None and day >= start:
+            yield day
+            day = previous_scheduled_date(schedule_days, day - _ONE_DAY)
+    else:
+        day = next_scheduled_date(schedule_days, start)
+        while day is not None and day <= end:
+            yield day
+            day = next_scheduled_date(schedule_days, day + _ONE_DAY)
+
+
+def weekday_bit_expr(date_col, dialect_name: str):
+    """SQL counterpart of WEEKDAY_BITS[d.weekday()] for a DATE column."""
+    if dialect_name == "postgresql":
+        dow = cast(func.extract("dow", date_col), Integer)
+    else:  # sqlite
+        dow = cast(func.strftime("%w", date_col), Integer)
+    return case(_SQL_DOW_BITS, value=dow)
@@ -0,0 +1,166 @@
+"""
+Incrementally maintained perfect-day streaks.
+
+A 'perfect day' = every scheduled dose of every active item was taken. Days
+with nothing scheduled neither extend nor break a streak.
+
+StreakState stores the streak evaluated through some past day. Reads only
+evaluate the days after that (normally just today), so cost does not depend on
+how long the user has been tracking. Writes call `mark_changed`:
+
+- change after last_evaluated_date: nothing to do, it will be evaluated later
+- change inside the current run (after last_break_date): roll the state back
+  to the break, the next read re-evaluates just the current run
+- change on or before last_break_date (the historical runs) or any item change:
+  the state is marked stale and the next read recomputes from the start
+
+Today is never persisted: it is still open, so it is evaluated on every read.
+"""
+import datetime
+from typing import Optional
+
+from sqlalchemy import and_, case, func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.daily_adherence import DailyAdherence
+from app.models.item import Item
+from app.models.streak_state import StreakState
+from app.services.schedule import WEEKDAY_BITS, iter_scheduled_dates
+
+_ONE_DAY = datetime.timedelta(days=1)
+
+
+def mark_changed(db: Session, user_id: int, day: datetime.date) -> None:
+    """Record that the perfect/not-perfect status of `day` may have changed (one UPDATE)."""
+    # Within the current run: roll back to the break; before it: mark stale
+    in_run = and_(StreakState.last_break_date.is_not(None), StreakState.last_break_date < day)
+    db.execute(
+        update(StreakState)
+        .where(StreakState.user_id == user_id, StreakState.last_evaluated_date >= day)
+        .values(
+            current_streak=case((in_run, 0), else_=StreakState.current_streak),
+            longest_streak=case((in_run, StreakState.longest_before_run), else_=StreakState.longest_streak),
+            last_evaluated_date=case((in_run, StreakState.last_break_date), else_=None),
+        )
+    )
+
+
+def invalidate(db: Session, user_id: int) -> None:
+    """Item changes apply to the whole history: force a full recompute."""
+    state = db.get(StreakState, user_id)
+    if state is not None:
+        state.last_evaluated_date = None
+
+
+class _Schedule:
+    """Active items of a user reduced to what the day evaluation needs."""
+
+    def __init__(self, items: list[Item]):
+        self.union_mask = 0
+        self.per_weekday = [0] * 7
+        for item in items:
+            self.union_mask |= item.schedule_days
+            for weekday, bit in WEEKDAY_BITS.items():
+                if item.schedule_days & bit:
+                    self.per_weekday[weekday] += 1
+
+    def is_perfect(self, day: datetime.date, completed: dict[datetime.date, int]) -> bool:
+        return completed.get(day, 0) >= self.per_weekday[day.weekday()]
+
+
+def _completed_by_day(
+    db: Session, user_id: int, start: datetime.date, end: datetime.date
+) -> dict[datetime.date, int]:
+    """Number of items with every expected dose taken, per day in [start, end]."""
+    rows = db.execute(
+        select(DailyAdherence.date, func.count())
+        .where(
+            DailyAdherence.user_id == user_id,
+            DailyAdherence.date >= start,
+            DailyAdherence.date <= end,
+            DailyAdherence.expected > 0,
+            DailyAdherence.taken >= DailyAdherence.expected,
+        )
+        .group_by(DailyAdherence.date)
+    ).all()
+    return {day: count for day, count in rows}
+
+
+def _first_completed_day(db: Session, user_id: int) -> Optional[datetime.date]:
+    return db.execute(
+        select(func.min(DailyAdherence.date)).where(
+            DailyAdherence.user_id == user_id,
+            DailyAdherence.expected > 0,
+            DailyAdherence.taken >= DailyAdherence.expected,
+        )
+    ).scalar()
+
+
+def _advance(
+    state: StreakState,
+    schedule: _Schedule,
+    completed: dict[datetime.date, int],
+    start: datetime.date,
+    end: datetime.date,
+) -> None:
+    for day in iter_scheduled_dates(schedule.union_mask, start, end):
+        if schedule.is_perfect(day, completed):
+            state.current_streak += 1
+            state.longest_streak = max(state.longest_streak, state.current_streak)
+        else:
+            state.longest_before_run = state.longest_streak
+            state.current_streak = 0
+            state.last_break_date = day
+    state.last_evaluated_date = end
+
+
+def _reset(state: StreakState) -> None:
+    state.current_streak = 0
+    state.longest_streak = 0
+    state.longest_before_run = 0
+    state.last_break_date = None
+    state.last_evaluated_date = None
+
+
+def get_streaks(
+    db: Session,
+    user_id: int,
+    items: list[Item],
+    as_of: datetime.date,
+) -> tuple[int, int]:
+    """
+    (current_streak, longest_streak) over the user's whole history up to
+    `as_of`. `items` are the user's active items. Updates the persisted state;
+    the caller commits.
+    """
+    schedule = _Schedule(items)
+    through = as_of - _ONE_DAY
+
+    state = db.get(StreakState, user_id)
+    if state is None:
+        state = StreakState(user_id=user_id)
+        _reset(state)
+        db.add(state)
+    elif state.last_evaluated_date is not None and state.last_evaluated_date > through:
+        # Asked about an earlier day than we have evaluated: compute from
+        # scratch without touching the persisted state.
+        state = StreakState(user_id=user_id)
+        _reset(state)
+
+    if state.last_evaluated_date is None:
+        _reset(state)
+        first = _first_completed_day(db, user_id)
+        # Nothing before the first fully taken item-day can be perfect
+        start = first if first is not None and first <= as_of else as_of
+    else:
+        start = state.last_evaluated_date + _ONE_DAY
+
+    completed = _completed_by_day(db, user_id, start, as_of)
+    _advance(state, schedule, completed, start, through)
+
+    # Today is still open: evaluate it without persisting it
+    current, longest = state.current_streak, state.longest_streak
+    if schedule.union_mask & WEEKDAY_BITS[as_of.weekday()]:
+        current = current + 1 if schedule.is_perfect(as_of, completed) else 0
+        longest = max(longest, current)
+    return current, longest
@@ -0,0 +1,133 @@
+"""
+Change feed for offline-first clients.
+
+Writers call `record` / `record_many` in the same transaction as the change,
+so the feed never shows a change that was rolled back. Readers page through
+the feed with `changes_since`, which collapses repeated changes to the same
+row and returns current rows plus tombstones for deletes.
+
+Deleting an item removes its dose logs through ON DELETE CASCADE; only the
+item tombstone is recorded, and clients drop the item's logs with it.
+
+A cursor is the last seq a client has seen, so a user's changes must become
+visible in seq order: a change committed after a higher seq would never be
+read. SQLite runs one write transaction at a time, which gives that order.
+On Postgres, seqs are handed out as the rows are inserted and transactions
+commit in any order, so writers first take a per-user transaction lock
+(`lock_feeds`): the next writer of the same user gets its seq only after the
+previous one committed. dose_events (app/services/events.py), read by seq as
+well, takes the same lock.
+"""
+from typing import Iterable
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.models.dose_log import DoseLog
+from app.models.item import Item
+from app.models.sync_change import SyncChange
+from app.schemas.dose_log import DoseLogOut
+from app.schemas.item import ItemOut
+from app.schemas.sync import SyncPage
+
+ITEM = "item"
+DOSE_LOG = "dose_log"
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# First key of the pg_advisory_xact_lock(int, int) pairs; the second is the user id
+FEED_LOCK_CLASS = 0x5EED
+
+
+def lock_feeds(db: Session, user_ids: Iterable[int]) -> None:
+    """
+    On Postgres, hold the feeds of `user_ids` until the transaction ends;
+    call before adding to them. Each lock is taken once per transaction; a
+    no-op on SQLite, where write transactions never overlap.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    transaction, held = db.info.get("feed_locks", (None, set()))
+    if transaction is not db.get_transaction():
+        transaction, held = db.get_transaction(), set()
+        db.info["feed_locks"] = (transaction, held)
+    for user_id in sorted(set(user_ids) - held):  # one order everywhere: no deadlocks
+        db.execute(select(func.pg_advisory_xact_lock(FEED_LOCK_CLASS, user_id)))
+        held.add(user_id)
+
+
+def record(db: Session, user_id: int, entity: str, entity_id: int, op: str) -> None:
+    lock_feeds(db, [user_id])
+    db.add(SyncChange(user_id=user_id, entity=entity, entity_id=entity_id, op=op))
+
+
+def record_many(db: Session, user_id: int, entity: str, entity_ids: Iterable[int], op: str) -> None:
+    rows = [
+        {"user_id": user_id, "entity": entity, "entity_id": entity_id, "op": op}
+        for entity_id in entity_ids
+    ]
+    if rows:
+        lock_feeds(db, [user_id])
+        db.execute(insert(SyncChange), rows)
+
+
+def current_cursor(db: Session, user_id: int) -> int:
+    return db.execute(
+        select(func.coalesce(func.max(SyncChange.seq), 0)).where(SyncChange.user_id == user_id)
+    ).scalar_one()
+
+
+def changes_since(db: Session, user_id: int, since: int, limit: int) -> SyncPage:
+    """One page of changes after cursor `since`, at most `limit` feed entries."""
+    changes = db.execute(
+        select(SyncChange.seq, SyncChange.entity, SyncChange.entity_id, SyncChange.op)
+        .where(SyncChange.user_id == user_id, SyncChange.seq > since)
+        .order_by(SyncChange.seq)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    # Last change per row wins within the page
+    latest: dict[tuple[str, int], str] = {}
+    for _, entity, entity_id, op in changes:
+        latest[(entity, entity_id)] = op
+
+    upserted = {ITEM: [], DOSE_LOG: []}
+    deleted = {ITEM: [], DOSE_LOG: []}
+    for (entity, entity_id), op in latest.items():
+        (upserted if op == UPSERT else deleted)[entity].append(entity_id)
+
+    items = (
+        db.scalars(select(Item).where(Item.id.in_(upserted[ITEM])).order_by(Item.id)).all()
+        if upserted[ITEM]
+        else []
+    )
+    logs = (
+        db.scalars(select(DoseLog).where(DoseLog.id.in_(upserted[DOSE_LOG])).order_by(DoseLog.id)).all()
+        if upserted[DOSE_LOG]
+        else []
+    )
+    # Rows that no longer exist were deleted by a later change (or by an item
+    # cascade); their tombstone comes with that change.
+
+    return SyncPage(
+        cursor=changes[-1].seq if changes else since,
+        has_more=has_more,
+        items=[ItemOut.model_validate(item) for item in items],
+        dose_logs=[DoseLogOut.model_validate(log) for log in logs],
+        deleted_items=sorted(deleted[ITEM]),
+        deleted_dose_logs=sorted(deleted[DOSE_LOG]),
+    )
+
+
+def backfill(db: Session) -> None:
+    """Seed the feed with an upsert for every existing item and dose log (at setup, no lock)."""
+    for model, entity in ((Item, ITEM), (DoseLog, DOSE_LOG)):
+        db.execute(
+            insert(SyncChange).from_select(
+                ["user_id", "entity", "entity_id", "op"],
+                select(model.user_id, literal(entity), model.id, literal(UPSERT)).order_by(model.id),
+            )
+        )
@@ -0,0 +1,17 @@
+"""
+Backend benchmarks (run from backend/, needs requirements-dev.txt).
+
+    python -m benchmarks.datagen --out bench.db --users 200 --years 2
+    python -m benchmarks.run --db bench.db --out results.json
+    python -m benchmarks.run --db bench.db --baseline results.json
+    python -m benchmarks.serialization --rows 10000,100000
+    python -m benchmarks.replay --events 1000000
+    python -m benchmarks.workers --db bench.db --workers 1,2,4
+
+datagen writes a synthetic SQLite dataset; run measures the hot endpoints
+through the FastAPI TestClient and as direct calls, on a scratch copy of the
+dataset, and writes latency percentiles and throughput as JSON.
+serialization times the ways of turning a large log listing into JSON;
+replay times rebuilding dose_logs and the rollup from the dose event stream;
+workers load tests app.serve over HTTP from one worker to N.
+"""
@@ -0,0 +1,173 @@
+"""
+Synthetic dataset for the benchmarks: users with a mix of items and years of
+dose logs, written straight into a SQLite file.
+
+    python -m benchmarks.datagen --out bench.db [--users 100] [--items 4] [--years 1] [--seed 1]
+
+Shape of the data (seeded, so the same arguments give the same database):
+- each user has a personal adherence rate (mean ~85%) and skip rate (~6%),
+  lower on weekends, plus the odd day where nothing is logged at all
+- items vary in doses_per_day (1-4, mostly 1) and schedule_days (daily,
+  weekdays, weekends, Mon/Wed/Fri, weekly), start at different points of the
+  history, and ~10% were stopped (inactive, no logs after they stopped)
+- about half the items have dose_times
+
+The derived tables (rollup, sync feed, reminders) are then built the same way
+create_tables() fills them for an existing database.
+"""
+import argparse
+import datetime
+import os
+import random
+import time
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+
+from app.db.migrations import migrate
+from app.db.session import set_sqlite_pragmas
+from app.models import Base, DoseLog, Item, User
+
+# bcrypt("benchmark") at cost 4: every generated user can log in
+PASSWORD = "benchmark"
+PASSWORD_HASH = "$2b$04$1FG3QdMOpZP6q6kjoYboauy/3mfE1dDuld1TEeVF5O6QuNNZilGje"
+
+SCHEDULES = [(127, 0.65), (31, 0.12), (96, 0.05), (21, 0.1), (64, 0.08)]  # daily, Mon-Fri, weekend, M/W/F, Sun
+DOSES_PER_DAY = [(1, 0.6), (2, 0.25), (3, 0.1), (4, 0.05)]
+DOSE_TIMES = {1: ["08:00"], 2: ["08:00", "20:00"], 3: ["08:00", "14:00", "20:00"], 4: ["07:00", "12:00", "17:00", "22:00"]}
+SKIP_REASONS = ["Forgot", "Side effects", "Ran out", "Travelling", None]
+
+_INSERT_BATCH = 10_000
+
+
+def _pick(rnd: random.Random, weighted: list[tuple]) -> int:
+    return rnd.choices([value for value, _ in weighted], [weight for _, weight in weighted])[0]
+
+
+def _user_logs(rnd: random.Random, user_id: int, items: list[dict], start: datetime.date, end: datetime.date):
+    adherence = rnd.betavariate(12, 2)
+    skip_rate = rnd.betavariate(1.5, 20)
+    day = start
+    while day <= end:
+        weekend = day.weekday() >= 5
+        if rnd.random() >= 0.03:  # otherwise the whole day was forgotten
+            for item in items:
+                if not (item["start"] <= day <= item["end"]):
+                    continue
+                if not item["schedule_days"] & (1 << day.weekday()):
+                    continue
+                for dose_index, dose_time in enumerate(item["times"], start=1):
+                    r = rnd.random()
+                    p_taken = adherence * (0.92 if weekend else 1.0)
+                    if r < p_taken:
+                        status, reason = "taken", None
+                    elif r < p_taken + skip_rate:
+                        status, reason = "skipped", rnd.choice(SKIP_REASONS)
+                    else:
+                        continue  # missed: never logged
+                    at = datetime.datetime.combine(day, dose_time) + datetime.timedelta(minutes=rnd.gauss(10, 25))
+                    yield {
+                        "user_id": user_id,
+                        "item_id": item["id"],
+                        "scheduled_date": day,
+                        "dose_index": dose_index,
+                        "status": status,
+                        "timestamp": at,
+                        "skip_reason": reason,
+                    }
+        day += datetime.timedelta(days=1)
+
+
+def generate(path: str, users: int = 100, items: int = 4, years: float = 1.0, seed: int = 1) -> dict:
+    """Create `path` (replacing it) and fill it. Returns counts for the report."""
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    Base.metadata.create_all(engine)
+    migrate(engine)
+
+    rnd = random.Random(seed)
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=int(365 * years))
+    n_items = n_logs = 0
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        user_ids = conn.execute(
+            insert(User).returning(User.id),
+            [{"email": f"user{u}@bench.example", "password_hash": PASSWORD_HASH} for u in range(users)],
+        ).scalars().all()
+
+        batch: list[dict] = []
+        for user_id in user_ids:
+            user_items = []
+            for i in range(max(1, round(rnd.gauss(items, 1.5)))):
+                doses = _pick(rnd, DOSES_PER_DAY)
+                item_start = start + datetime.timedelta(days=rnd.randrange(0, max(1, (end - start).days // 2)))
+                active = rnd.random() >= 0.1
+                item_end = end if active else item_start + datetime.timedelta(days=rnd.randrange(30, 365))
+                row = {
+                    "user_id": user_id,
+                    "name": f"Item {i + 1}",
+                    "type": rnd.choice(["medication", "supplement"]),
+                    "doses_per_day": doses,
+                    "schedule_days": _pick(rnd, SCHEDULES),
+                    "active": active,
+                    "dose_times": DOSE_TIMES[doses] if rnd.random() < 0.5 else None,
+                }
+                item_id = conn.execute(insert(Item).returning(Item.id), row).scalar_one()
+                user_items.append(
+                    {
+                        "id": item_id,
+                        "schedule_days": row["schedule_days"],
+                        "start": item_start,
+                        "end": min(item_end, end),
+                        "times": [datetime.time.fromisoformat(t) for t in DOSE_TIMES[doses]],
+                    }
+                )
+            n_items += len(user_items)
+
+            for log in _user_logs(rnd, user_id, user_items, start, end):
+                batch.append(log)
+                if len(batch) >= _INSERT_BATCH:
+                    conn.execute(insert(DoseLog), batch)
+                    n_logs += len(batch)
+                    batch = []
+        if batch:
+            conn.execute(insert(DoseLog), batch)
+            n_logs += len(batch)
+
+    from app.services import events, reminders, rollup, sync
+
+    with Session(engine) as db:
+        rollup.rebuild(db)
+        sync.backfill(db)
+        events.backfill(db)
+        reminders.plan_all(db)
+        db.commit()
+    engine.dispose()
+
+    return {
+        "users": users,
+        "items": n_items,
+        "dose_logs": n_logs,
+        "days": (end - start).days + 1,
+        "seed": seed,
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark database")
+    parser.add_argument("--out", default="bench.db", help="SQLite file to (re)create")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--items", type=int, default=4, help="average items per user")
+    parser.add_argument("--years", type=float, default=1.0, help="history length")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    print(generate(args.out, args.users, args.items, args.years, args.seed))
+
+
+if __name__ == "__main__":
+    main()
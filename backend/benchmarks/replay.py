@@ -0,0 +1,122 @@
+"""
+Time to rebuild all derived state from the dose event stream.
+
+    python -m benchmarks.replay [--events 1000000] [--users 500] [--seed 1]
+
+Writes a synthetic stream to a scratch SQLite database: users with four
+items, one taken/skipped event per dose per day, and a share of undos,
+status flips and reason changes. Then times:
+
+- rebuild: dose_logs replayed from every event, rollup rebuilt
+- snapshot: snapshot_due for every user
+- rebuild from snapshots: the same rebuild, each user starting at their snapshot
+
+and checks the projection against the stream (events.verify).
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+
+from app.db.migrations import migrate
+from app.db.session import set_sqlite_pragmas
+from app.models import Base, DoseEvent, Item, User
+from app.services import events
+
+ITEMS_PER_USER = 4
+_INSERT_BATCH = 50_000
+
+
+def _user_events(rnd: random.Random, user_id: int, item_ids: list[int], days: int, next_log_id) -> list[dict]:
+    start = datetime.date.today() - datetime.timedelta(days=days)
+    rows = []
+    for offset in range(days):
+        day = start + datetime.timedelta(days=offset)
+        at = datetime.datetime.combine(day, datetime.time(8))
+        for item_id in item_ids:
+            log_id = next_log_id()
+            kind = events.TAKEN if rnd.random() < 0.9 else events.SKIPPED
+            base = {"user_id": user_id, "item_id": item_id, "log_id": log_id, "scheduled_date": day, "dose_index": 1}
+            rows.append({**base, "kind": kind, "skip_reason": None, "recorded_at": at})
+            r = rnd.random()
+            if r < 0.03:
+                rows.append({**base, "kind": events.UNDONE, "skip_reason": None, "recorded_at": at})
+            elif r < 0.06:
+                rows.append({**base, "kind": events.SKIPPED, "skip_reason": "Forgot", "recorded_at": at})
+            elif r < 0.08:
+                rows.append({**base, "kind": events.REASON_CHANGED, "skip_reason": "Ran out", "recorded_at": at})
+    return rows
+
+
+def generate(engine, n_events: int, users: int, seed: int) -> int:
+    """Fill the stream with about `n_events` events. Returns the exact count."""
+    rnd = random.Random(seed)
+    days = max(1, round(n_events / users / ITEMS_PER_USER / 1.08))
+    log_ids = iter(range(1, 1 << 62))
+    written = 0
+    with engine.begin() as conn:
+        user_ids = conn.execute(
+            insert(User).returning(User.id),
+            [{"email": f"replay{u}@bench.example", "password_hash": "x"} for u in range(users)],
+        ).scalars().all()
+        batch: list[dict] = []
+        for user_id in user_ids:
+            item_ids = conn.execute(
+                insert(Item).returning(Item.id),
+                [{"user_id": user_id, "name": f"Item {i}", "type": "medication"} for i in range(ITEMS_PER_USER)],
+            ).scalars().all()
+            batch += _user_events(rnd, user_id, list(item_ids), days, lambda: next(log_ids))
+            if len(batch) >= _INSERT_BATCH:
+                conn.execute(insert(DoseEvent), batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            conn.execute(insert(DoseEvent), batch)
+            written += len(batch)
+    return written
+
+
+def _timed(label: str, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<26} {time.perf_counter() - started:8.2f} s   {result}")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark replaying the dose event stream")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as scratch:
+        engine = create_engine(f"sqlite:///{os.path.join(scratch, 'replay.db')}")
+        event.listen(engine, "connect", set_sqlite_pragmas)
+        Base.metadata.create_all(engine)
+        migrate(engine)
+
+        _timed("generate (events)", lambda: generate(engine, args.events, args.users, args.seed))
+        with Session(engine) as db:
+
+            def rebuild():
+                written = events.rebuild(db)
+                db.commit()
+                return f"{written} dose_logs"
+
+            _timed("rebuild", rebuild)
+            _timed("snapshot (users)", lambda: events.snapshot_due(db, min_events=1))
+            _timed("rebuild from snapshots", rebuild)
+            differing = _timed("verify (differing users)", lambda: events.verify(db))
+        engine.dispose()
+    if differing:
+        raise SystemExit("the projection differs from the event stream")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Latency and throughput of the hot endpoints on a benchmark dataset.
+
+    python -m benchmarks.run --db bench.db [--iterations 200] [--out results.json]
+    python -m benchmarks.run --generate --users 200 --years 2     # build bench.db first
+    python -m benchmarks.run --db bench.db --baseline old.json    # compare with an earlier run
+
+Each scenario runs twice: through the FastAPI TestClient (routing, validation,
+serialization) and as a direct call of the handler's session function on a
+fresh Session (the ORM and SQL alone). Writes go to a scratch copy of the
+database, so runs on the same dataset are comparable. The response cache is
+off unless --cache is given; with it, repeated reads measure cache hits.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Iterator
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _summary(durations: list[float], wall: float) -> dict:
+    ordered = sorted(durations)
+    summary = {
+        "n": len(ordered),
+        "ops_per_sec": round(len(ordered) / wall, 1) if wall else 0.0,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+    for p in PERCENTILES:
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        summary[f"p{p}_ms"] = round(ordered[index] * 1000, 3)
+    summary["max_ms"] = round(ordered[-1] * 1000, 3)
+    return summary
+
+
+def _measure(op: Callable[[], object], iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        op()
+    durations = []
+    wall_start = time.perf_counter()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        op()
+        durations.append(time.perf_counter() - started)
+    return _summary(durations, time.perf_counter() - wall_start)
+
+
+def _scenarios(rnd: random.Random, stats_days: list[int]) -> list[tuple[str, Callable, Callable]]:
+    """(name, http(client), direct(session)) per scenario; each call does one operation."""
+    from sqlalchemy import func, select
+
+    from app.db.session import SessionLocal
+    from app.models import DoseLog, Item, User
+    from app.routers import dose_logs
+    from app.schemas.dose_log import DoseLogCreate
+
+    with SessionLocal() as db:
+        user_ids = db.scalars(select(User.id)).all()
+        first_day, last_day = db.execute(
+            select(func.min(DoseLog.scheduled_date), func.max(DoseLog.scheduled_date))
+        ).one()
+        items = db.execute(
+            select(Item.id, Item.user_id, Item.doses_per_day).where(Item.active == True)  # noqa: E712
+        ).all()
+    if not user_ids or first_day is None or not items:
+        sys.exit("The database has no users, logs or active items; run benchmarks.datagen first")
+    history = (last_day - first_day).days
+
+    def user() -> int:
+        return rnd.choice(user_ids)
+
+    def day() -> datetime.date:
+        return first_day + datetime.timedelta(days=rnd.randint(0, history))
+
+    # New doses for create_dose_log: future days, never logged
+    def new_doses() -> Iterator[tuple[int, int, datetime.date, int]]:
+        for offset in itertools.count(1):
+            for item_id, user_id, doses in items:
+                for dose_index in range(1, doses + 1):
+                    yield item_id, user_id, last_day + datetime.timedelta(days=offset), dose_index
+
+    doses = new_doses()
+
+    def direct(fn: Callable, *args):
+        with SessionLocal() as db:
+            return fn(db, *args)
+
+    def http_create(client):
+        item_id, user_id, scheduled, dose_index = next(doses)
+        return client.post(
+            f"/logs/items/{item_id}",
+            params={"user_id": user_id},
+            json={"scheduled_date": scheduled.isoformat(), "dose_index": dose_index},
+        )
+
+    def direct_create():
+        item_id, user_id, scheduled, dose_index = next(doses)
+        payload = DoseLogCreate(scheduled_date=scheduled, dose_index=dose_index)
+        direct(dose_logs._create_dose_log, item_id, payload, user_id)
+
+    scenarios = [
+        (
+            f"get_adherence_stats days={days}",
+            lambda client, days=days: client.get(f"/logs/stats/{user()}", params={"days": days}),
+            lambda days=days: direct(dose_logs._adherence_stats, user(), days),
+        )
+        for days in stats_days
+    ]
+    scenarios += [
+        (
+            "get_daily_schedule",
+            lambda client: client.get(f"/logs/schedule/{user()}", params={"date": day().isoformat()}),
+            lambda: direct(dose_logs._daily_schedule, user(), day()),
+        ),
+        (
+            "list_logs_for_user limit=50",
+            lambda client: client.get(f"/logs/by-user/{user()}", params={"limit": 50}),
+            lambda: direct(
+                lambda db, user_id: dose_logs._logs_page(
+                    db, dose_logs._logs_query(db, user_id, None, None, None, None), 50
+                ),
+                user(),
+            ),
+        ),
+        ("create_dose_log", http_create, direct_create),
+    ]
+    return scenarios
+
+
+def _checked(response):
+    response.raise_for_status()
+    return response
+
+
+def run(iterations: int, warmup: int, stats_days: list[int], use_cache: bool, seed: int) -> dict:
+    """Benchmark the database DATABASE_URL points at."""
+    import sqlalchemy
+    from fastapi.testclient import TestClient
+
+    from app import cache
+    from app.main import app
+
+    if not use_cache:
+        cache.set_backend(cache.MemoryCacheBackend(max_bytes=0))  # stores nothing
+
+    rnd = random.Random(seed)
+    results: dict[str, dict] = {}
+    with TestClient(app) as client:
+        for name, http_op, direct_op in _scenarios(rnd, stats_days):
+            results[f"http {name}"] = _measure(lambda: _checked(http_op(client)), iterations, warmup)
+            results[f"direct {name}"] = _measure(direct_op, iterations, warmup)
+            print(f"{name}: http p50 {results[f'http {name}']['p50_ms']} ms, "
+                  f"direct p50 {results[f'direct {name}']['p50_ms']} ms", file=sys.stderr)
+
+    return {
+        "meta": {
+            "iterations": iterations,
+            "warmup": warmup,
+            "cache": use_cache,
+            "seed": seed,
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict) -> str:
+    """Text table of p50 / p95 / throughput, baseline -> current."""
+    lines = [f"{'scenario':<45} {'p50 ms':>19} {'p95 ms':>19} {'ops/s':>17}"]
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+
+        def cell(key: str, width: int) -> str:
+            ratio = now[key] / before[key] if before[key] else float("nan")
+            return f"{before[key]:>7g} -> {now[key]:<7g}({ratio:.2f}x)".rjust(width)
+
+        lines.append(f"{name:<45} {cell('p50_ms', 19)} {cell('p95_ms', 19)} {cell('ops_per_sec', 17)}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the hot endpoints")
+    parser.add_argument("--db", default="bench.db", help="dataset from benchmarks.datagen")
+    parser.add_argument("--generate", action="store_true", help="(re)generate --db first")
+    parser.add_argument("--users", type=int, default=100, help="with --generate")
+    parser.add_argument("--years", type=float, default=1.0, help="with --generate")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--days", default="7,30,90,365", help="stats windows, comma separated")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache on")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    # Writes go to a copy. Set before anything imports app.db.session, which
+    # builds its engine from the environment.
+    scratch_dir = tempfile.mkdtemp(prefix="bench-")
+    scratch = os.path.join(scratch_dir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{scratch}"
+    os.environ.setdefault("HASH_WORKERS", "0")
+
+    try:
+        if args.generate:
+            from benchmarks.datagen import generate
+
+            print(generate(args.db, users=args.users, years=args.years, seed=args.seed), file=sys.stderr)
+        if not os.path.exists(args.db):
+            sys.exit(f"{args.db} not found; run with --generate or python -m benchmarks.datagen")
+        shutil.copyfile(args.db, scratch)
+
+        stats_days = [int(days) for days in args.days.split(",")]
+        report = run(args.iterations, args.warmup, stats_days, args.cache, args.seed)
+        report["meta"]["database"] = os.path.abspath(args.db)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print(compare(json.load(f), report), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Cost of turning a large dose log listing into JSON, by serialization path.
+
+    python -m benchmarks.serialization [--rows 10000,100000] [--repeat 5]
+
+One user with N logs in a scratch SQLite database; every path builds the same
+JSON array, fetch included:
+
+- orm + response_model: DoseLog entities, validated by a list[DoseLogOut]
+  TypeAdapter (from_attributes) and dumped, as FastAPI does for a handler
+  that returns ORM objects
+- columns + models: column rows, a DoseLogOut per row, then the same
+  response_model validation and dump (list_logs_for_user before the fast path)
+- columns + TypeAdapter: column rows as dicts, validated in one TypeAdapter
+  call and dumped
+- columns + orjson: column rows as dicts, encoded by orjson without
+  validation (app/responses.py, what the endpoint does now)
+
+Prints the median of --repeat runs per path, total and serialization only.
+"""
+import argparse
+import datetime
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.orm import Session
+
+from app.db.migrations import migrate
+from app.db.session import set_sqlite_pragmas
+from app.models import Base, DoseLog, Item, User
+from app.responses import dumps, row_dicts
+from app.schemas.dose_log import DoseLogOut
+from app.services import pagination
+
+LOGS = TypeAdapter(list[DoseLogOut])
+
+
+def _fill(engine, rows: int) -> int:
+    """One user and item with `rows` logs, `rows` days back. Returns the user id."""
+    today = datetime.date.today()
+    with engine.begin() as conn:
+        user_id = conn.execute(
+            insert(User).returning(User.id), {"email": "bench@bench.example", "password_hash": "x"}
+        ).scalar_one()
+        item_id = conn.execute(
+            insert(Item).returning(Item.id),
+            {"user_id": user_id, "name": "Item", "type": "medication", "doses_per_day": 1, "schedule_days": 127},
+        ).scalar_one()
+        conn.execute(
+            insert(DoseLog),
+            [
+                {
+                    "user_id": user_id,
+                    "item_id": item_id,
+                    "scheduled_date": today - datetime.timedelta(days=i),
+                    "dose_index": 1,
+                    "status": "skipped" if i % 9 == 0 else "taken",
+                    "timestamp": datetime.datetime.combine(today, datetime.time(8)) - datetime.timedelta(days=i),
+                    "skip_reason": "Forgot" if i % 9 == 0 else None,
+                }
+                for i in range(rows)
+            ],
+        )
+    return user_id
+
+
+def _paths(db: Session, user_id: int) -> dict[str, tuple[Callable, Callable]]:
+    """name -> (fetch(), serialize(fetched)) per path."""
+    columns = pagination.logs_after(db, user_id)
+    entities = select(DoseLog).where(DoseLog.user_id == user_id).order_by(
+        DoseLog.scheduled_date.desc(), DoseLog.timestamp.desc(), DoseLog.id.desc()
+    )
+
+    def fetch_entities():
+        db.expunge_all()
+        return db.scalars(entities).all()
+
+    def fetch_rows():
+        return db.execute(columns).all()
+
+    return {
+        "orm + response_model": (
+            fetch_entities,
+            lambda logs: LOGS.dump_json(LOGS.validate_python(logs, from_attributes=True)),
+        ),
+        "columns + models": (
+            fetch_rows,
+            lambda rows: LOGS.dump_json(LOGS.validate_python([DoseLogOut(**row._mapping) for row in rows])),
+        ),
+        "columns + TypeAdapter": (
+            fetch_rows,
+            lambda rows: LOGS.dump_json(LOGS.validate_python(row_dicts(rows, DoseLogOut))),
+        ),
+        "columns + orjson": (
+            fetch_rows,
+            lambda rows: dumps(row_dicts(rows, DoseLogOut)),
+        ),
+    }
+
+
+def run(rows: int, repeat: int) -> dict[str, dict]:
+    with tempfile.TemporaryDirectory(prefix="bench-") as scratch:
+        engine = create_engine(f"sqlite:///{os.path.join(scratch, 'serialization.db')}")
+        event.listen(engine, "connect", set_sqlite_pragmas)
+        Base.metadata.create_all(engine)
+        migrate(engine)
+        user_id = _fill(engine, rows)
+
+        results: dict[str, dict] = {}
+        outputs = set()
+        with Session(engine) as db:
+            for name, (fetch, serialize) in _paths(db, user_id).items():
+                totals, encodes = [], []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    fetched = fetch()
+                    fetched_at = time.perf_counter()
+                    body = serialize(fetched)
+                    done = time.perf_counter()
+                    totals.append(done - started)
+                    encodes.append(done - fetched_at)
+                outputs.add(body)
+                results[name] = {
+                    "total_ms": round(statistics.median(totals) * 1000, 1),
+                    "serialize_ms": round(statistics.median(encodes) * 1000, 1),
+                }
+        engine.dispose()
+    if len(outputs) != 1:
+        raise SystemExit("serialization paths disagree on the JSON they produce")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark JSON serialization of large log listings")
+    parser.add_argument("--rows", default="10000,100000", help="row counts, comma separated")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'path':<24} {'total ms':>10} {'serialize ms':>13} {'speedup':>8}")
+    for rows in (int(n) for n in args.rows.split(",")):
+        results = run(rows, args.repeat)
+        baseline = results["orm + response_model"]["total_ms"]
+        for name, result in results.items():
+            speedup = baseline / result["total_ms"] if result["total_ms"] else float("nan")
+            print(f"{rows:>8} {name:<24} {result['total_ms']:>10} {result['serialize_ms']:>13} {speedup:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Throughput of the API over real HTTP, from one worker to N (app.serve).
+
+    python -m benchmarks.workers --db bench.db [--workers 1,2,4] [--seconds 10] [--clients 32]
+
+For each worker count: a scratch copy of the dataset, `python -m app.serve
+--workers N` on a free local port, a short warm-up, then --clients keep-alive
+connections (spread over --client-procs load processes) send a mix of reads
+(stats, schedule, log page) and dose logs for --seconds. Prints requests per
+second, p50/p99 latency, errors and the speedup over the first worker count.
+
+The response cache is off in every run (CACHE_MAX_BYTES=0, as app.serve sets
+for several workers), so each request reaches the database and the runs are
+comparable. The load processes share the machine with the server: scaling
+flattens once workers plus clients outnumber the cores.
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+OK_STATUSES = {200, 201, 409}  # 409: a dose another client logged first
+
+
+def _dataset(db_path: str) -> dict:
+    """Users, active items and the logged date range of the dataset."""
+    from sqlalchemy import create_engine, func, select
+
+    from app.models import DoseLog, Item, User
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.connect() as conn:
+        users = conn.scalars(select(User.id)).all()
+        items = [tuple(row) for row in conn.execute(
+            select(Item.id, Item.user_id, Item.doses_per_day).where(Item.active == True)  # noqa: E712
+        )]
+        first_day, last_day = conn.execute(
+            select(func.min(DoseLog.scheduled_date), func.max(DoseLog.scheduled_date))
+        ).one()
+    engine.dispose()
+    if not users or not items or first_day is None:
+        sys.exit("The database has no users, logs or active items; run benchmarks.datagen first")
+    return {"users": users, "items": items, "first_day": first_day, "last_day": last_day}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+def _client_thread(base_url: str, data: dict, seed: int, until: float, out: list) -> None:
+    """One keep-alive connection sending the request mix until `until`: appends (seconds, ok)."""
+    import httpx
+
+    rnd = random.Random(seed)
+    history = (data["last_day"] - data["first_day"]).days
+    # Dose logs on future days: clients rarely pick the same dose
+    future = data["last_day"] + datetime.timedelta(days=1 + seed % 1000)
+
+    def request(client: httpx.Client):
+        user = rnd.choice(data["users"])
+        pick = rnd.random()
+        if pick < 0.3:
+            return client.get(f"/logs/stats/{user}", params={"days": rnd.choice([7, 30, 90])})
+        if pick < 0.6:
+            day = data["first_day"] + datetime.timedelta(days=rnd.randint(0, history))
+            return client.get(f"/logs/schedule/{user}", params={"date": day.isoformat()})
+        if pick < 0.9:
+            return client.get(f"/logs/by-user/{user}", params={"limit": 50})
+        item_id, user_id, doses = rnd.choice(data["items"])
+        day = future + datetime.timedelta(days=rnd.randint(0, 3650))
+        return client.post(
+            f"/logs/items/{item_id}",
+            params={"user_id": user_id},
+            json={"scheduled_date": day.isoformat(), "dose_index": rnd.randint(1, doses)},
+        )
+
+    with httpx.Client(base_url=base_url, timeout=30.0) as client:
+        while time.monotonic() < until:
+            started = time.perf_counter()
+            try:
+                ok = request(client).status_code in OK_STATUSES
+            except httpx.HTTPError:
+                ok = False
+            out.append((time.perf_counter() - started, ok))
+
+
+def _load_process(base_url: str, data: dict, threads: int, seed: int, seconds: float) -> list:
+    until = time.monotonic() + seconds
+    results: list = []
+    workers = [
+        threading.Thread(target=_client_thread, args=(base_url, data, seed * 1000 + i, until, results))
+        for i in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results
+
+
+def _load(base_url: str, data: dict, clients: int, procs: int, seconds: float, seed: int) -> tuple[list, float]:
+    """(seconds, ok) per request from `clients` connections over `procs` processes, and the wall time."""
+    shares = [clients // procs + (1 if i < clients % procs else 0) for i in range(procs)]
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(procs) as pool:
+        started = time.perf_counter()
+        parts = pool.starmap(
+            _load_process,
+            [(base_url, data, threads, seed + i, seconds) for i, threads in enumerate(shares) if threads],
+        )
+        wall = time.perf_counter() - started
+    return [result for part in parts for result in part], wall
+
+
+def run(db_path: str, workers: int, clients: int, procs: int, seconds: float, warmup: float, seed: int) -> dict:
+    data = _dataset(db_path)
+    with tempfile.TemporaryDirectory(prefix="bench-") as scratch:
+        copy = os.path.join(scratch, "workers.db")
+        shutil.copyfile(db_path, copy)
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{copy}",
+            "CACHE_MAX_BYTES": "0",
+            "REMINDERS_ENABLED": "0",
+        }
+        command = [sys.executable, "-m", "app.serve", "--workers", str(workers),
+                   "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+        server = subprocess.Popen(command, env=env)
+        try:
+            _wait_ready(base_url)
+            if warmup:
+                _load(base_url, data, clients, procs, warmup, seed)
+            results, wall = _load(base_url, data, clients, procs, seconds, seed + 100)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    latencies = sorted(seconds for seconds, ok in results if ok)
+    errors = sum(1 for _, ok in results if not ok)
+    if not latencies:
+        raise SystemExit(f"no successful requests with {workers} workers ({errors} errors)")
+    return {
+        "workers": workers,
+        "requests": len(results),
+        "errors": errors,
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+    }
+
+
+def main() -> None:
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Benchmark API throughput from 1 to N workers")
+    parser.add_argument("--db", default="bench.db", help="dataset from benchmarks.datagen")
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, 2, cores})),
+                        help="worker counts, comma separated")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent connections")
+    parser.add_argument("--client-procs", type=int, default=max(1, cores // 2), help="load generator processes")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of load before measuring")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        sys.exit(f"{args.db} not found; run python -m benchmarks.datagen --out {args.db} first")
+
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'speedup':>8}")
+    baseline = None
+    for workers in (int(n) for n in args.workers.split(",")):
+        result = run(args.db, workers, args.clients, args.client_procs, args.seconds, args.warmup, args.seed)
+        baseline = baseline or result["rps"]
+        print(f"{workers:>7} {result['rps']:>9} {result['p50_ms']:>8} {result['p99_ms']:>8} "
+              f"{result['errors']:>7} {result['rps'] / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Fixtures for the backend tests: a scratch SQLite database per test and a
+TestClient whose requests use it.
+
+    pip install -r requirements-dev.txt && python -m pytest    # from backend/
+"""
+import os
+import tempfile
+
+# Read by the app's modules at import: keep the tests off dev.db and hash in threads
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='tests-'), 'app.db')}")
+os.environ.setdefault("HASH_WORKERS", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app import cache  # noqa: E402
+from app.auth import token_versions  # noqa: E402
+from app.db.database import Database, get_database  # noqa: E402
+from app.db.migrations import migrate  # noqa: E402
+from app.db.session import engine_options, set_sqlite_pragmas  # noqa: E402
+from app.models import Base  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(url, **engine_options(url))
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    Base.metadata.create_all(engine)
+    migrate(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sessions(engine):
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+@pytest.fixture
+def client(sessions):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    async def _get_database():
+        db = Database(sessions())
+        try:
+            yield db
+        finally:
+            await db.close()
+
+    app.dependency_overrides[get_database] = _get_database
+    cache.get_backend().clear()
+    token_versions.clear()  # user ids start over in every test database
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.pop(get_database, None)
+    cache.get_backend().clear()
+
+
+@pytest.fixture
+def user_id(client):
+    return client.post("/users/", json={"email": "test@example.com", "password": "secret123"}).json()["id"]
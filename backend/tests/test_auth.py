@@ -0,0 +1,84 @@
+from app.auth import TokenVersions, password_hasher, token_versions
+from app.models.user import User
+
+
+def _checked_out_while_hashing(monkeypatch, engine, method: str) -> list[int]:
+    """Pool connections checked out each time `method` of the password hasher runs."""
+    seen = []
+    real = getattr(password_hasher, method)
+
+    async def spy(*args):
+        seen.append(engine.pool.checkedout())
+        return await real(*args)
+
+    monkeypatch.setattr(password_hasher, method, spy)
+    return seen
+
+
+def test_login_holds_no_connection_while_verifying(client, engine, user_id, monkeypatch):
+    seen = _checked_out_while_hashing(monkeypatch, engine, "verify")
+
+    response = client.post("/auth/login", json={"email": "test@example.com", "password": "secret123"})
+
+    assert response.status_code == 200
+    assert seen == [0]
+
+
+def test_register_holds_no_connection_while_hashing(client, engine, monkeypatch):
+    seen = _checked_out_while_hashing(monkeypatch, engine, "hash")
+
+    response = client.post("/auth/register", json={"email": "new@example.com", "password": "secret123"})
+    duplicate = client.post("/users/", json={"email": "new@example.com", "password": "secret123"})
+
+    assert response.status_code == 201
+    assert duplicate.status_code == 409
+    assert seen == [0]
+
+
+def test_register_conflicts_when_the_email_is_taken_while_hashing(client, sessions, monkeypatch):
+    real = password_hasher.hash
+
+    async def hash_while_another_registers(plain):
+        with sessions() as other:
+            other.add(User(email="race@example.com", password_hash="x"))
+            other.commit()
+        return await real(plain)
+
+    monkeypatch.setattr(password_hasher, "hash", hash_while_another_registers)
+    response = client.post("/auth/register", json={"email": "race@example.com", "password": "secret123"})
+
+    assert response.status_code == 409
+
+
+def _login(client) -> dict:
+    token = client.post("/auth/login", json={"email": "test@example.com", "password": "secret123"}).json()
+    return {"Authorization": f"Bearer {token['access_token']}"}
+
+
+def test_revoke_bumps_the_stored_version(client, sessions, user_id):
+    headers = _login(client)
+    with sessions() as db:
+        # Bumped meanwhile elsewhere (another worker): the next one builds on it
+        db.get(User, user_id).token_version = 5
+        db.commit()
+    token_versions.set(user_id, 0)
+
+    assert client.post("/auth/revoke", headers=headers).status_code == 204
+
+    with sessions() as db:
+        assert db.get(User, user_id).token_version == 6
+    assert token_versions.get(user_id) == 6
+    assert client.get("/users/me", headers=headers).status_code == 401
+
+
+def test_token_versions_are_bounded_and_never_lowered():
+    versions = TokenVersions(ttl_seconds=60, max_entries=2)
+    versions.set(1, 3)
+    versions.set(1, 2)  # read before the revocation that stored 3
+    versions.set(2, 0)
+    versions.get(1)
+    versions.set(3, 0)
+
+    assert versions.get(1) == 3
+    assert versions.get(2) is None  # least recently used, evicted
+    assert versions.get(3) == 0
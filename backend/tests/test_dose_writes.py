@@ -0,0 +1,61 @@
+import datetime
+
+from sqlalchemy import select
+
+from app.models import DailyAdherence, DoseEvent, SyncChange
+
+DAY = datetime.date(2026, 2, 2)
+
+
+def _bulk(client, user_id: int, entries: list[dict], on_conflict: str = "overwrite") -> list[dict]:
+    response = client.post("/logs/bulk", params={"user_id": user_id}, json={"entries": entries, "on_conflict": on_conflict})
+    assert response.status_code == 200, response.text
+    return response.json()["results"]
+
+
+def test_overwrite_reports_and_records_only_what_changed(client, sessions, user_id):
+    item_id = client.post(
+        "/items/", json={"user_id": user_id, "name": "Twice", "type": "medication", "doses_per_day": 2}
+    ).json()["id"]
+    dose = {"item_id": item_id, "scheduled_date": DAY.isoformat()}
+    first = _bulk(client, user_id, [{**dose, "dose_index": 1}, {**dose, "dose_index": 2, "status": "skipped"}])
+    with sessions() as db:
+        feed_before = len(db.scalars(select(SyncChange.seq)).all())
+
+    results = _bulk(
+        client,
+        user_id,
+        [
+            {**dose, "dose_index": 1},  # unchanged
+            {**dose, "dose_index": 2, "status": "skipped", "skip_reason": "Ran out"},  # reason only
+        ],
+    )
+    with sessions() as db:
+        counts_after_reason = db.execute(select(DailyAdherence.taken, DailyAdherence.skipped)).one()
+    flipped = _bulk(client, user_id, [{**dose, "dose_index": 1, "status": "skipped"}])
+
+    assert [result["status"] for result in first] == ["created", "created"]
+    assert [(result["status"], result["log_id"]) for result in results] == [
+        ("updated", first[0]["log_id"]), ("updated", first[1]["log_id"])
+    ]
+    assert flipped[0]["status"] == "updated"
+    with sessions() as db:
+        kinds = db.execute(select(DoseEvent.dose_index, DoseEvent.kind).order_by(DoseEvent.seq)).all()
+        assert kinds == [(1, "taken"), (2, "skipped"), (2, "reason_changed"), (1, "skipped")]
+        assert len(db.scalars(select(SyncChange.seq)).all()) == feed_before + 2
+        assert tuple(db.execute(select(DailyAdherence.taken, DailyAdherence.skipped)).one()) == (0, 2)
+    logs = {log["dose_index"]: log for log in client.get(f"/logs/by-user/{user_id}").json()}
+    assert logs[2]["skip_reason"] == "Ran out"
+    assert logs[1]["status"] == "skipped"
+    assert tuple(counts_after_reason) == (1, 1)
+
+
+def test_skip_mode_leaves_existing_logs(client, user_id):
+    item_id = client.post("/items/", json={"user_id": user_id, "name": "Daily", "type": "medication"}).json()["id"]
+    entry = {"item_id": item_id, "scheduled_date": DAY.isoformat()}
+    _bulk(client, user_id, [entry], on_conflict="skip")
+
+    results = _bulk(client, user_id, [{**entry, "status": "skipped"}], on_conflict="skip")
+
+    assert results[0]["status"] == "skipped"
+    assert client.get(f"/logs/by-user/{user_id}").json()[0]["status"] == "taken"
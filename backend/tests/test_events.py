@@ -0,0 +1,51 @@
+import datetime
+
+from sqlalchemy import func, select
+
+from app.models import DoseEvent, DoseLog
+from app.services import events
+
+
+def _log_days(client, user_id: int, item_id: int, days: int) -> None:
+    for offset in range(days):
+        day = datetime.date(2026, 1, 1) + datetime.timedelta(days=offset)
+        response = client.post(
+            f"/logs/items/{item_id}", params={"user_id": user_id}, json={"scheduled_date": day.isoformat()}
+        )
+        assert response.status_code == 201
+
+
+def test_snapshot_then_item_delete_replays_without_the_item(client, sessions, user_id):
+    item = {"user_id": user_id, "type": "medication"}
+    kept = client.post("/items/", json={**item, "name": "Kept"}).json()["id"]
+    deleted = client.post("/items/", json={**item, "name": "Deleted"}).json()["id"]
+    _log_days(client, user_id, kept, 3)
+    _log_days(client, user_id, deleted, 3)
+    with sessions() as db:
+        assert events.snapshot(db, user_id) == 6
+        db.commit()
+
+    assert client.delete(f"/items/{deleted}").status_code == 204
+
+    with sessions() as db:
+        # The item's history stays in the stream
+        assert db.scalar(select(func.count()).select_from(DoseEvent).where(DoseEvent.item_id == deleted)) == 3
+        assert events.verify(db) == []
+        assert events.rebuild(db) == 3
+        db.commit()
+        assert set(db.scalars(select(DoseLog.item_id))) == {kept}
+        assert events.verify(db) == []
+
+
+def test_rebuild_reproduces_dose_logs(client, sessions, user_id):
+    item_id = client.post("/items/", json={"user_id": user_id, "name": "A", "type": "medication"}).json()["id"]
+    _log_days(client, user_id, item_id, 4)
+    logs = client.get(f"/logs/by-user/{user_id}").json()
+    client.patch(f"/logs/{logs[0]['id']}", params={"status": "skipped", "skip_reason": "Forgot"})
+    client.delete(f"/logs/{logs[1]['id']}")
+
+    with sessions() as db:
+        before = sorted(tuple(row) for row in db.execute(select(*DoseLog.__table__.c)))
+        assert events.rebuild(db) == 3
+        db.commit()
+        assert sorted(tuple(row) for row in db.execute(select(*DoseLog.__table__.c))) == before
@@ -0,0 +1,42 @@
+import gzip
+
+import pytest
+
+from app.services.export import accepts_gzip
+
+
+@pytest.mark.parametrize(
+    "header, accepted",
+    [
+        ("gzip", True),
+        ("gzip, deflate, br", True),
+        ("deflate, GZIP;q=0.5", True),
+        ("x-gzip", True),
+        ("*", True),
+        ("br;q=1, *;q=0.1", True),
+        ("gzip;q=0", False),
+        ("gzip; q=0.000, identity", False),
+        ("identity", False),
+        ("", False),
+        ("*;q=0", False),
+        ("gzip;q=0, *", False),
+        ("gzip;q=oops", False),
+    ],
+)
+def test_accepts_gzip(header, accepted):
+    assert accepts_gzip(header) is accepted
+
+
+def test_export_is_gzipped_only_when_accepted(client, user_id):
+    item_id = client.post("/items/", json={"user_id": user_id, "name": "Daily", "type": "medication"}).json()["id"]
+    client.post(f"/logs/items/{item_id}", params={"user_id": user_id}, json={"scheduled_date": "2026-01-01"})
+
+    refused = client.get(f"/logs/export/{user_id}", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    # Read the raw body: the client would otherwise decompress it
+    with client.stream("GET", f"/logs/export/{user_id}", headers={"Accept-Encoding": "gzip"}) as accepted:
+        raw = b"".join(accepted.iter_raw())
+
+    assert "content-encoding" not in refused.headers
+    assert len(refused.text.splitlines()) == 2  # CSV header and the log
+    assert accepted.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(raw).decode() == refused.text
@@ -0,0 +1,36 @@
+import datetime
+
+
+def _log_days(client, user_id: int, days: int) -> None:
+    item_id = client.post("/items/", json={"user_id": user_id, "name": "Daily", "type": "medication"}).json()["id"]
+    for offset in range(days):
+        day = datetime.date(2026, 1, 1) + datetime.timedelta(days=offset)
+        client.post(f"/logs/items/{item_id}", params={"user_id": user_id}, json={"scheduled_date": day.isoformat()})
+
+
+def test_without_limit_or_cursor_every_log_is_returned(client, user_id, monkeypatch):
+    from app.services import pagination
+
+    monkeypatch.setattr(pagination, "DEFAULT_PAGE_SIZE", 2)
+    _log_days(client, user_id, 5)
+
+    response = client.get(f"/logs/by-user/{user_id}")
+
+    assert len(response.json()) == 5
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_pages_follow_the_next_cursor(client, user_id):
+    _log_days(client, user_id, 5)
+
+    pages, params = [], {"limit": 2}
+    while True:
+        response = client.get(f"/logs/by-user/{user_id}", params=params)
+        pages.append([log["scheduled_date"] for log in response.json()])
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params = {"limit": 2, "cursor": response.headers["X-Next-Cursor"]}
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    days = [day for page in pages for day in page]
+    assert days == sorted(days, reverse=True) and len(set(days)) == 5
@@ -0,0 +1,157 @@
+"""
+Query plans of the SQL the API sends, on SQLite.
+
+Every endpoint is called once (a few with their optional filters), each
+statement the routers execute is run under EXPLAIN QUERY PLAN, and none may
+read a table with a full scan, of the table or of a whole index. Foreign keys
+need an index starting with their column, or ON DELETE CASCADE scans the
+child table.
+"""
+import datetime
+import re
+from typing import NamedTuple
+
+import pytest
+from sqlalchemy import event
+
+from app.models import Base
+from app.services import reminders
+
+# "SCAN t" reads every row of t; "SCAN t USING INDEX ix" reads every entry of ix.
+# Lookups show up as "SEARCH t USING ...".
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX \w+)?$")
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+class Statement(NamedTuple):
+    endpoint: str
+    sql: str
+    parameters: tuple
+
+
+def _exercise(client, sessions, current: dict) -> None:
+    """Call every endpoint once (a few with their optional filters); current["endpoint"] names the call."""
+
+    def call(method: str, url: str, **kwargs):
+        current["endpoint"] = f"{method} {url}"
+        response = client.request(method, url, **kwargs)
+        assert response.status_code < 400, f"{method} {url} -> {response.status_code}: {response.text}"
+        return response
+
+    today = datetime.date.today()
+    day = today.isoformat()
+    week_ago = (today - datetime.timedelta(days=7)).isoformat()
+
+    credentials = {"email": "plans@example.com", "password": "secret123"}
+    user_id = call("POST", "/auth/register", json=credentials).json()["id"]
+    token = call("POST", "/auth/login", json=credentials).json()["access_token"]
+    call("POST", "/users/", json={"email": "plans2@example.com", "password": "secret123"})
+    call("GET", "/users/me", headers={"Authorization": f"Bearer {token}"})
+    call("GET", f"/users/{user_id}")
+    call("POST", "/auth/revoke", headers={"Authorization": f"Bearer {token}"})
+
+    item = {
+        "user_id": user_id,
+        "name": "Vitamin D",
+        "type": "supplement",
+        "doses_per_day": 2,
+        "dose_times": ["08:00", "20:00"],
+    }
+    item_id = call("POST", "/items/", json=item).json()["id"]
+    other_id = call("POST", "/items/", json={**item, "name": "Iron"}).json()["id"]
+    call("GET", f"/items/by-user/{user_id}")
+    call("GET", f"/items/by-user/{user_id}", params={"active_only": True})
+    call("GET", f"/items/{item_id}")
+    call("PATCH", f"/items/{item_id}", json={"name": "Vitamin D3"})
+    call("PATCH", f"/items/{item_id}", json={"schedule_days": 0b0011111})
+
+    log_id = call(
+        "POST", f"/logs/items/{item_id}", params={"user_id": user_id}, json={"scheduled_date": day}
+    ).json()["id"]
+    call("PATCH", f"/logs/{log_id}", params={"status": "skipped", "skip_reason": "Forgot"})
+    bulk = [
+        {"item_id": item_id, "scheduled_date": week_ago, "dose_index": 1},
+        {"item_id": other_id, "scheduled_date": day, "dose_index": 2, "status": "skipped"},
+    ]
+    owner = {"user_id": user_id}
+    call("POST", "/logs/bulk", params=owner, json={"entries": bulk})
+    call("POST", "/logs/bulk", params=owner, json={"entries": bulk, "on_conflict": "overwrite"})
+
+    page = call("GET", f"/logs/by-user/{user_id}", params={"limit": 1})
+    call("GET", f"/logs/by-user/{user_id}", params={"limit": 1, "cursor": page.headers["X-Next-Cursor"]})
+    call("GET", f"/logs/by-user/{user_id}", params={"start": week_ago, "end": day, "item_id": item_id})
+    call("GET", f"/logs/by-user/{user_id}", params={"format": "ndjson"})
+    call("GET", f"/logs/events/{user_id}", params={"limit": 1})
+    call("GET", f"/logs/events/{user_id}", params={"after": 1, "item_id": item_id})
+    call("GET", f"/logs/export/{user_id}")
+    call("GET", f"/logs/export/{user_id}", params={"kind": "daily", "format": "ndjson"})
+    call("GET", f"/logs/schedule/{user_id}", params={"date": day})
+    call("GET", f"/logs/schedule/{user_id}/range", params={"start": week_ago, "end": day})
+    call("GET", f"/logs/schedule/{user_id}/range", params={"start": week_ago, "end": day, "format": "columnar"})
+    call("GET", f"/logs/stats/{user_id}", params={"days": 30})
+    call("POST", "/logs/stats/cohort", json={"user_ids": [user_id], "days": 30})
+    call("POST", "/logs/stats/cohort", json={"days": 30})
+
+    call("GET", "/sync", params=owner)
+    ops = [
+        {"op": "upsert", "item_id": other_id, "scheduled_date": week_ago},
+        {"op": "delete", "item_id": item_id, "scheduled_date": week_ago},
+        {"op": "delete", "item_id": item_id, "scheduled_date": day, "dose_index": 2},
+    ]
+    call("POST", "/sync/push", params=owner, json={"ops": ops})
+
+    call("DELETE", f"/logs/{log_id}")
+    call("DELETE", f"/items/{other_id}")
+
+    current["endpoint"] = "reminder dispatch"
+    with sessions() as db:
+        reminders.dispatch_due(db)
+
+
+@pytest.fixture
+def statements(engine, sessions, client) -> list[Statement]:
+    """Every statement sent while each endpoint is called, tagged with the endpoint."""
+    recorded: list[Statement] = []
+    current = {"endpoint": ""}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        recorded.append(Statement(current["endpoint"], statement, tuple(parameters or ())))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        _exercise(client, sessions, current)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return recorded
+
+
+def test_no_statement_scans_a_whole_table(engine, statements):
+    table_names = set(Base.metadata.tables)
+    explained: set[str] = set()
+    failures = []
+    with engine.connect() as conn:
+        for statement in statements:
+            if statement.sql in explained or not statement.sql.lstrip().upper().startswith(_EXPLAINABLE):
+                continue
+            explained.add(statement.sql)
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement.sql}", statement.parameters)
+            details = [row[3] for row in rows]
+            if any((match := _FULL_SCAN.match(detail)) and match.group(1) in table_names for detail in details):
+                failures.append(f"{statement.endpoint}\n  {statement.sql}\n    " + "\n    ".join(details))
+
+    assert len(explained) > 50  # the endpoints were all reached
+    assert not failures, "full scans:\n" + "\n".join(failures)
+
+
+def test_foreign_keys_have_an_index():
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        leading = {index.columns[0].name for index in table.indexes}
+        leading |= {constraint.columns[0].name for constraint in table.constraints if constraint.columns}
+        for fk in table.foreign_keys:
+            if fk.parent.name not in leading:
+                missing.append(f"{table.name}.{fk.parent.name} -> {fk.target_fullname}")
+
+    assert not missing
@@ -0,0 +1,101 @@
+import datetime
+
+import pytest
+from sqlalchemy import select
+
+from app.models import DoseLog, DoseReminder, Item
+from app.services import reminders
+
+MORNING = datetime.datetime(2026, 3, 2, 8, 0)
+
+
+def _item(db, user_id: int) -> Item:
+    item = Item(user_id=user_id, name="Twice daily", type="medication", doses_per_day=2, dose_times=["08:00", "20:00"])
+    db.add(item)
+    db.flush()
+    return item
+
+
+def _planned(db, item: Item) -> list[tuple]:
+    return db.execute(
+        select(DoseReminder.scheduled_date, DoseReminder.dose_index, DoseReminder.due_at)
+        .where(DoseReminder.item_id == item.id, DoseReminder.sent_at.is_(None))
+        .order_by(DoseReminder.due_at)
+    ).all()
+
+
+def test_schedule_edit_keeps_an_overdue_unsent_reminder(sessions, user_id, monkeypatch):
+    sink = reminders.MemorySink()
+    monkeypatch.setattr(reminders, "_sink", sink)
+    late = MORNING + datetime.timedelta(minutes=10)  # the 08:00 dose is due, the dispatcher has not run
+    with sessions() as db:
+        item = _item(db, user_id)
+        reminders.plan_item(db, item, MORNING - datetime.timedelta(hours=1))
+        db.commit()
+
+        item.dose_times = ["08:00", "21:00"]
+        reminders.plan_item(db, item, late)
+        db.commit()
+
+        assert _planned(db, item)[0] == (MORNING.date(), 1, MORNING)
+        assert (MORNING.date(), 2, datetime.datetime(2026, 3, 2, 21, 0)) in _planned(db, item)
+        assert reminders.dispatch_due(db, late) == 1
+    assert [(reminder.dose_index, reminder.due_at) for reminder in sink.sent] == [(1, MORNING)]
+
+
+def test_schedule_edit_does_not_replan_logged_or_long_overdue_doses(sessions, user_id):
+    with sessions() as db:
+        item = _item(db, user_id)
+        db.add(DoseLog(user_id=user_id, item_id=item.id, scheduled_date=MORNING.date(), dose_index=1, status="taken"))
+        db.flush()
+        reminders.plan_item(db, item, MORNING + datetime.timedelta(minutes=10))
+        past_grace = MORNING + datetime.timedelta(minutes=reminders.REMINDER_GRACE_MINUTES + 1)
+        second = _item(db, user_id)
+        reminders.plan_item(db, second, past_grace)
+        db.commit()
+
+        assert (MORNING.date(), 1) not in [row[:2] for row in _planned(db, item)]
+        assert (MORNING.date(), 1) not in [row[:2] for row in _planned(db, second)]
+
+
+class _FailingSink(reminders.ReminderSink):
+    def send(self, batch: list) -> None:
+        raise ConnectionError("push service down")
+
+
+def test_sink_is_called_after_the_claim_is_committed(engine, sessions, user_id, monkeypatch):
+    held = []
+
+    class Sink(reminders.MemorySink):
+        def send(self, batch: list) -> None:
+            held.append(engine.pool.checkedout())
+            super().send(batch)
+
+    sink = Sink()
+    monkeypatch.setattr(reminders, "_sink", sink)
+    late = MORNING + datetime.timedelta(minutes=10)
+    with sessions() as db:
+        reminders.plan_item(db, _item(db, user_id), MORNING - datetime.timedelta(hours=1))
+        db.commit()
+
+        assert reminders.dispatch_due(db, late) == 1
+    assert held == [0]
+    assert len(sink.sent) == 1
+
+
+def test_failed_delivery_releases_the_claim(sessions, user_id, monkeypatch):
+    late = MORNING + datetime.timedelta(minutes=10)
+    with sessions() as db:
+        item = _item(db, user_id)
+        reminders.plan_item(db, item, MORNING - datetime.timedelta(hours=1))
+        db.commit()
+
+        monkeypatch.setattr(reminders, "_sink", _FailingSink())
+        with pytest.raises(ConnectionError):
+            reminders.dispatch_due(db, late)
+        assert _planned(db, item)[0] == (MORNING.date(), 1, MORNING)
+
+        sink = reminders.MemorySink()
+        monkeypatch.setattr(reminders, "_sink", sink)
+        assert reminders.dispatch_due(db, late + datetime.timedelta(minutes=1)) == 1
+    assert [(reminder.dose_index, reminder.due_at) for reminder in sink.sent] == [(1, MORNING)]
@@ -0,0 +1,81 @@
+"""
+Startup time of the API process, measured in fresh interpreters against a
+scratch SQLite database that is already set up (the usual restart).
+
+- import: `import app.main`, cumulative, under `python -X importtime`
+- startup: import plus the app's startup hook (schema check, pool warm-up),
+  i.e. until the process could accept requests
+
+The best of RUNS is held to STARTUP_IMPORT_BUDGET_MS / STARTUP_BUDGET_MS.
+Modules in DEFERRED are imported on first use (password hashing, tokens,
+cohort stats): an eager import fails the test even on a machine fast enough
+to stay within budget.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+STARTUP_IMPORT_BUDGET_MS = float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", "1500"))
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", "1800"))
+RUNS = 3
+
+DEFERRED = ("bcrypt", "jose", "cryptography", "numpy")
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+_IMPORT = "import sys, app.main; print(' '.join(sys.modules))"
+_STARTUP = """
+import asyncio, time
+started = time.perf_counter()
+from app.main import app
+
+async def start():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+print((asyncio.run(start()) - started) * 1000)
+"""
+
+
+def _run(code: str, env: dict, importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", code]
+    result = subprocess.run(command, env=env, cwd=BACKEND, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result
+
+
+def _cumulative_ms(stderr: str, module: str) -> float:
+    """`module`'s cumulative import time from -X importtime output."""
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and line.rsplit("|", 1)[-1].strip() == module:
+            return int(line.split("|")[1]) / 1000
+    raise AssertionError(f"{module} not in the -X importtime output")
+
+
+@pytest.fixture(scope="module")
+def env(tmp_path_factory) -> dict:
+    database = tmp_path_factory.mktemp("startup") / "startup.db"
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{database}", "REMINDERS_ENABLED": "0"}
+    _run(_STARTUP, env)  # sets the database up; later starts find it current
+    return env
+
+
+def test_heavy_modules_are_imported_on_first_use(env):
+    modules = _run(_IMPORT, env).stdout.split()
+
+    assert sorted({name.split(".")[0] for name in modules} & set(DEFERRED)) == []
+
+
+def test_import_within_budget(env):
+    import_ms = min(_cumulative_ms(_run(_IMPORT, env, importtime=True).stderr, "app.main") for _ in range(RUNS))
+
+    assert import_ms <= STARTUP_IMPORT_BUDGET_MS
+
+
+def test_startup_within_budget(env):
+    startup_ms = min(float(_run(_STARTUP, env).stdout) for _ in range(RUNS))
+
+    assert startup_ms <= STARTUP_BUDGET_MS
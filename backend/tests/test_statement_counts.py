@@ -0,0 +1,76 @@
+"""
+Statement budget of the hot write path, POST /logs/items/{item_id}, on
+SQLite: everything that reaches the database (each statement plus COMMIT and
+ROLLBACK) is counted per case and must stay within the case's budget.
+"""
+import datetime
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+TODAY = datetime.date.today()
+
+
+@contextmanager
+def _counting(engine):
+    statements: list[str] = []
+
+    def statement(conn, cursor, sql, parameters, context, executemany):
+        statements.append(" ".join(sql.split()))
+
+    listeners = [
+        ("before_cursor_execute", statement),
+        ("commit", lambda conn: statements.append("COMMIT")),
+        ("rollback", lambda conn: statements.append("ROLLBACK")),
+    ]
+    for name, fn in listeners:
+        event.listen(engine, name, fn)
+    try:
+        yield statements
+    finally:
+        for name, fn in listeners:
+            event.remove(engine, name, fn)
+
+
+@pytest.fixture
+def items(client, user_id) -> dict[str, int]:
+    """An item without and one with dose_times, each with a week of perfect days evaluated by a stats read."""
+    item = {"user_id": user_id, "name": "Vitamin D", "type": "supplement"}
+    ids = {
+        "plain": client.post("/items/", json=item).json()["id"],
+        "timed": client.post("/items/", json={**item, "name": "Iron", "dose_times": ["23:59"]}).json()["id"],
+    }
+    for days_ago in range(1, 8):
+        for item_id in ids.values():
+            _log(client, user_id, item_id, TODAY - datetime.timedelta(days=days_ago))
+    client.get(f"/logs/stats/{user_id}", params={"days": 7})
+    return ids
+
+
+def _log(client, user_id: int, item_id: int, day: datetime.date):
+    return client.post(f"/logs/items/{item_id}", params={"user_id": user_id}, json={"scheduled_date": day.isoformat()})
+
+
+@pytest.mark.parametrize(
+    "item, days_ago, logged_before, budget, expected_status",
+    [
+        # item lookup, INSERT ... ON CONFLICT DO NOTHING RETURNING, dose_events INSERT,
+        # rollup upsert, streak UPDATE, sync_changes INSERT, COMMIT
+        pytest.param("plain", 0, False, 7, 201, id="new dose"),
+        pytest.param("timed", 0, False, 8, 201, id="new dose, item with dose_times (+ reminder DELETE)"),
+        pytest.param("plain", 10, False, 7, 201, id="dose in already evaluated streak history"),
+        # item lookup, INSERT, ROLLBACK
+        pytest.param("plain", 0, True, 3, 409, id="duplicate dose"),
+    ],
+)
+def test_log_dose_statement_budget(client, engine, user_id, items, item, days_ago, logged_before, budget, expected_status):
+    day = TODAY - datetime.timedelta(days=days_ago)
+    if logged_before:
+        _log(client, user_id, items[item], day)
+
+    with _counting(engine) as statements:
+        response = _log(client, user_id, items[item], day)
+
+    assert response.status_code == expected_status
+    assert len(statements) <= budget, "\n".join(statements)
@@ -0,0 +1,19 @@
+import datetime
+import json
+
+
+def test_streamed_bodies_read_through_the_request_session(client, user_id):
+    # The bodies query lazily, after the handler returned: the request's
+    # session must still be open while they are sent
+    item_id = client.post("/items/", json={"user_id": user_id, "name": "Daily", "type": "medication"}).json()["id"]
+    for offset in range(3):
+        day = datetime.date(2026, 1, 1) + datetime.timedelta(days=offset)
+        client.post(f"/logs/items/{item_id}", params={"user_id": user_id}, json={"scheduled_date": day.isoformat()})
+
+    export = client.get(f"/logs/export/{user_id}", params={"format": "ndjson"})
+    cohort = client.post("/logs/stats/cohort", json={"user_ids": [user_id], "days": 7})
+
+    assert export.status_code == 200
+    assert len(export.text.splitlines()) == 3
+    assert cohort.status_code == 200
+    assert [json.loads(line)["user_id"] for line in cohort.text.splitlines()] == [user_id]
@@ -0,0 +1,29 @@
+from app.services import sync
+
+
+def test_feed_locks_are_taken_once_per_transaction_in_user_order(engine, sessions, monkeypatch):
+    # Postgres only: the statements are recorded, not run
+    monkeypatch.setattr(engine.dialect, "name", "postgresql")
+    with sessions() as db:
+        db.connection()  # begin
+        locked = []
+        monkeypatch.setattr(db, "execute", lambda stmt: locked.append(stmt.selected_columns[0].clauses))
+
+        sync.lock_feeds(db, [7, 3, 7])
+        sync.lock_feeds(db, [3])
+        db.rollback()
+        db.connection()
+        sync.lock_feeds(db, [3])
+
+    assert [[arg.value for arg in args] for args in locked] == [
+        [sync.FEED_LOCK_CLASS, 3], [sync.FEED_LOCK_CLASS, 7], [sync.FEED_LOCK_CLASS, 3]
+    ]
+
+
+def test_feed_locks_are_skipped_on_sqlite(sessions, monkeypatch):
+    with sessions() as db:
+        executed = []
+        monkeypatch.setattr(db, "execute", executed.append)
+        sync.lock_feeds(db, [1])
+
+    assert executed == []